@@ -0,0 +1,401 @@
+"""
+Локальный fake GitHub API для нагрузочных тестов монитора
+
+Отвечает на те запросы, которые делает modules/github_monitor.py:
+- GET  /repos/{owner}/{name}/git/matching-refs/heads/{prefix}
+- GET  /repos/{owner}/{name}/branches
+- GET  /repos/{owner}/{name}/compare/{base}...{head}
+- GET  /repos/{owner}/{name}/commits?sha=...
+- POST /graphql (снимок веток refs/heads/claude/*)
+
+Ответы несут ETag (If-None-Match -> 304) и заголовки X-RateLimit-*,
+каждый запрос считается в статистике по маршрутам.
+
+Ветки и коммиты задаются сценарием (FakeRepo в коде или HTTP):
+    POST /_fake/push   {"branch": "claude/...", "message": "checkpoint 1"}
+    POST /_fake/delete {"branch": "claude/..."}
+    GET  /_fake/stats
+
+Режимы:
+    py -3.12 benchmarks/fake_github.py --branches 200
+    py -3.12 benchmarks/fake_github.py --record fixtures/   (прокси на api.github.com, ответы сохраняются)
+    py -3.12 benchmarks/fake_github.py --replay fixtures/   (только сохранённые ответы)
+
+Монитор направляется на сервер через GITHUB_API_URL=http://127.0.0.1:8765
+(и GITHUB_REQUEST_SPACING=false — паузы PyGithub нужны только против api.github.com)
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlsplit
+
+DEFAULT_PORT = 8765
+UPSTREAM_URL = "https://api.github.com"
+RATE_LIMIT = 5000
+BASE_BRANCH = "main"
+
+# Заголовки, которые уходят на настоящий GitHub при записи
+_FORWARD_HEADERS = ("authorization", "accept", "content-type", "user-agent")
+# Заголовки ответа, которые сохраняются в фикстуре
+_RECORD_HEADERS = ("x-ratelimit-limit", "x-ratelimit-remaining", "x-ratelimit-reset",
+                   "x-ratelimit-resource", "link")
+
+
+class FakeRepo:
+    """
+    Состояние репозитория: ветки и линейная история коммитов.
+    Ветка создаётся от текущей головы BASE_BRANCH при первом push.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.commits = {}   # sha -> {"sha", "message", "date", "parent"}
+        self.branches = {}  # ветка -> SHA головы
+        self._counter = 0
+        self.branches[BASE_BRANCH] = self._commit(None, "Initial commit")
+
+    def _commit(self, parent, message, date=None):
+        self._counter += 1
+        sha = hashlib.sha1(f"{self._counter}:{message}".encode()).hexdigest()
+        date = date or datetime.now(timezone.utc)
+        self.commits[sha] = {
+            "sha": sha,
+            "message": message,
+            "date": date.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "parent": parent,
+        }
+        return sha
+
+    def push(self, branch, message, date=None):
+        """Добавить коммит в ветку (ветка создаётся, если её нет); вернуть SHA"""
+        with self._lock:
+            parent = self.branches.get(branch) or self.branches[BASE_BRANCH]
+            sha = self._commit(parent, message, date)
+            self.branches[branch] = sha
+            return sha
+
+    def delete(self, branch):
+        with self._lock:
+            self.branches.pop(branch, None)
+
+    def resolve(self, ref):
+        """Ветка или SHA -> SHA (или None)"""
+        ref = unquote(ref)
+        return self.branches.get(ref) or (ref if ref in self.commits else None)
+
+    def history(self, sha):
+        """Коммиты от sha к корню (новые первыми)"""
+        while sha:
+            commit = self.commits[sha]
+            yield commit
+            sha = commit["parent"]
+
+
+def _rest_commit(commit):
+    """Коммит в формате REST API"""
+    return {
+        "sha": commit["sha"],
+        "commit": {
+            "message": commit["message"],
+            "author": {"name": "fake", "date": commit["date"]},
+        },
+    }
+
+
+class FakeGitHub(ThreadingHTTPServer):
+    """
+    HTTP-сервер fake GitHub.
+
+    Args:
+        address: (host, port); порт 0 — любой свободный
+        repo: FakeRepo (для режима "fake")
+        record_dir: сохранять ответы upstream в эту папку (режим "record")
+        replay_dir: отвечать только сохранёнными ответами (режим "replay")
+        latency: искусственная задержка каждого ответа, секунд
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", DEFAULT_PORT), repo=None,
+                 record_dir=None, replay_dir=None, upstream=UPSTREAM_URL, latency=0.0):
+        super().__init__(address, _Handler)
+        self.repo = repo or FakeRepo()
+        self.record_dir = Path(record_dir) if record_dir else None
+        self.replay_dir = Path(replay_dir) if replay_dir else None
+        self.upstream = upstream.rstrip("/")
+        self.latency = latency
+        self.stats = Counter()
+        self.remaining = {"core": RATE_LIMIT, "graphql": RATE_LIMIT}
+        self._stats_lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """Запустить в фоновом потоке"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def count(self, route, resource, spent):
+        with self._stats_lock:
+            self.stats[route] += 1
+            self.stats["total"] += 1
+            if spent:
+                self.remaining[resource] -= 1
+            else:
+                self.stats["not_modified"] += 1
+            return self.remaining[resource]
+
+    def snapshot_stats(self):
+        with self._stats_lock:
+            return dict(self.stats)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, как у настоящего API
+    disable_nagle_algorithm = True  # иначе каждый keep-alive ответ ждёт ~40 мс (delayed ACK)
+
+    def log_message(self, format, *args):
+        pass
+
+    # === Ответ ===
+
+    def _send(self, status, data=None, route="other", resource="core", headers=None):
+        body = json.dumps(data).encode() if data is not None else b""
+        etag = '"%s"' % hashlib.sha1(body).hexdigest() if status == 200 else None
+        not_modified = etag is not None and self.headers.get("If-None-Match") == etag
+        if not_modified:
+            status, body = 304, b""
+
+        remaining = self.server.count(route, resource, spent=not not_modified)
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("X-RateLimit-Limit", str(RATE_LIMIT))
+        self.send_header("X-RateLimit-Remaining", str(max(remaining, 0)))
+        self.send_header("X-RateLimit-Reset", str(int(time.time()) + 3600))
+        self.send_header("X-RateLimit-Resource", resource)
+        if etag:
+            self.send_header("ETag", etag)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return self.rfile.read(length) if length else b""
+
+    # === Запросы ===
+
+    def do_GET(self):
+        self._dispatch("GET", b"")
+
+    def do_POST(self):
+        self._dispatch("POST", self._body())
+
+    def _dispatch(self, method, body):
+        url = urlsplit(self.path)
+        if url.path.startswith("/_fake/"):
+            return self._control(method, url.path, body)
+        if self.server.replay_dir:
+            return self._replay(method, body)
+        if self.server.record_dir:
+            return self._record(method, body)
+
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        repo = self.server.repo
+        if method == "POST" and url.path == "/graphql":
+            return self._graphql(json.loads(body))
+
+        match = re.match(r"^/repos/[^/]+/[^/]+/(.+)$", url.path)
+        if not match or method != "GET":
+            return self._send(404, {"message": "Not Found"})
+        endpoint = match.group(1)
+
+        if endpoint.startswith("git/matching-refs/heads/"):
+            prefix = unquote(endpoint.removeprefix("git/matching-refs/heads/"))
+            refs = [{"ref": f"refs/heads/{branch}", "object": {"sha": sha, "type": "commit"}}
+                    for branch, sha in sorted(repo.branches.items()) if branch.startswith(prefix)]
+            return self._send(200, refs, route="matching-refs")
+
+        if endpoint == "branches":
+            names = sorted(repo.branches.items())
+            return self._send(200, [{"name": branch, "commit": {"sha": sha}}
+                                    for branch, sha in _page(names, query)], route="branches")
+
+        if endpoint.startswith("branches/"):
+            branch = unquote(endpoint.removeprefix("branches/"))
+            if branch not in repo.branches:
+                return self._send(404, {"message": "Branch not found"}, route="branch")
+            commit = repo.commits[repo.branches[branch]]
+            return self._send(200, {"name": branch, "commit": _rest_commit(commit)}, route="branch")
+
+        if endpoint.startswith("compare/"):
+            base, _, head = endpoint.removeprefix("compare/").partition("...")
+            base_sha, head_sha = repo.resolve(base), repo.resolve(head)
+            if not base_sha or not head_sha:
+                return self._send(404, {"message": "Not Found"}, route="compare")
+            ancestors = {commit["sha"] for commit in repo.history(base_sha)}
+            commits = []
+            for commit in repo.history(head_sha):
+                if commit["sha"] in ancestors:
+                    break
+                commits.append(_rest_commit(commit))
+            commits.reverse()  # как в GitHub: старые первыми
+            return self._send(200, {"total_commits": len(commits), "commits": commits}, route="compare")
+
+        if endpoint == "commits":
+            head_sha = repo.resolve(query.get("sha", BASE_BRANCH))
+            if not head_sha:
+                return self._send(404, {"message": "Not Found"}, route="commits")
+            history = [_rest_commit(commit) for commit in repo.history(head_sha)]
+            return self._send(200, _page(history, query), route="commits")
+
+        return self._send(404, {"message": "Not Found"})
+
+    def _graphql(self, request):
+        """Снимок веток: refs(refPrefix: "refs/heads/claude/") с пагинацией по курсору"""
+        variables = request.get("variables", {})
+        repo = self.server.repo
+        branches = sorted(branch for branch in repo.branches if branch.startswith("claude/"))
+        start = int(variables.get("cursor") or 0)
+        end = start + int(variables.get("pageSize", 100))
+
+        nodes = []
+        for branch in branches[start:end]:
+            commit = repo.commits[repo.branches[branch]]
+            nodes.append({
+                "name": branch.removeprefix("claude/"),
+                "target": {"oid": commit["sha"], "message": commit["message"],
+                           "author": {"date": commit["date"]}},
+            })
+        refs = {
+            "pageInfo": {"hasNextPage": end < len(branches), "endCursor": str(end)},
+            "nodes": nodes,
+        }
+        return self._send(200, {"data": {"repository": {"refs": refs}}}, route="graphql", resource="graphql")
+
+    def _control(self, method, path, body):
+        """Управление сценарием (не считается в статистике запросов)"""
+        data = json.loads(body) if body else {}
+        repo = self.server.repo
+        if path == "/_fake/stats":
+            result = {"stats": self.server.snapshot_stats(), "branches": len(repo.branches)}
+        elif path == "/_fake/push" and method == "POST":
+            result = {"sha": repo.push(data["branch"], data.get("message", "update"))}
+        elif path == "/_fake/delete" and method == "POST":
+            repo.delete(data["branch"])
+            result = {"deleted": data["branch"]}
+        else:
+            result = None
+
+        body = json.dumps(result).encode()
+        self.send_response(200 if result is not None else 404)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    # === Запись / повтор ===
+
+    def _fixture_path(self, directory, method, body):
+        key = hashlib.sha1(f"{method} {self.path}\n".encode() + body).hexdigest()[:16]
+        return directory / f"{key}.json"
+
+    def _record(self, method, body):
+        """Переслать запрос на настоящий GitHub и сохранить ответ"""
+        headers = {name: value for name, value in self.headers.items()
+                   if name.lower() in _FORWARD_HEADERS}
+        request = urllib.request.Request(self.server.upstream + self.path,
+                                         data=body or None, method=method, headers=headers)
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                status, raw, response_headers = response.status, response.read(), response.headers
+        except urllib.error.HTTPError as e:
+            status, raw, response_headers = e.code, e.read(), e.headers
+
+        self.server.record_dir.mkdir(parents=True, exist_ok=True)
+        fixture = {
+            "method": method,
+            "path": self.path,
+            "request": body.decode() if body else None,
+            "status": status,
+            "headers": {name: response_headers[name] for name in _RECORD_HEADERS
+                        if response_headers.get(name)},
+            "body": json.loads(raw) if raw else None,
+        }
+        self._fixture_path(self.server.record_dir, method, body).write_text(
+            json.dumps(fixture, ensure_ascii=False, indent=1), encoding="utf-8"
+        )
+        self._send_fixture(fixture)
+
+    def _replay(self, method, body):
+        path = self._fixture_path(self.server.replay_dir, method, body)
+        if not path.exists():
+            print(f"[FakeGitHub] No fixture for {method} {self.path}")
+            return self._send(404, {"message": "No recorded response"}, route="missing")
+        self._send_fixture(json.loads(path.read_text(encoding="utf-8")))
+
+    def _send_fixture(self, fixture):
+        route = "graphql" if fixture["path"].startswith("/graphql") else "recorded"
+        headers = {"Link": fixture["headers"]["link"]} if "link" in fixture["headers"] else None
+        self._send(fixture["status"], fixture["body"], route=route,
+                   resource="graphql" if route == "graphql" else "core", headers=headers)
+
+
+def _page(items, query):
+    per_page = int(query.get("per_page", 30))
+    page = int(query.get("page", 1))
+    return items[(page - 1) * per_page:page * per_page]
+
+
+def branch_name(book, module, task_type, n=0):
+    """Имя ветки задачи в формате, который создаёт Claude Code"""
+    return f"claude/add-{book.split()[0].lower()}-module-{module}-{task_type}-{n:05x}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake GitHub API для нагрузочных тестов монитора")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--branches", type=int, default=0,
+                        help="создать столько веток claude/* с одним коммитом")
+    parser.add_argument("--latency", type=float, default=0.0, help="задержка ответа, секунд")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--record", metavar="DIR", help="проксировать на GitHub и сохранять ответы")
+    mode.add_argument("--replay", metavar="DIR", help="отвечать сохранёнными ответами")
+    parser.add_argument("--upstream", default=UPSTREAM_URL)
+    args = parser.parse_args()
+
+    repo = FakeRepo()
+    for n in range(args.branches):
+        repo.push(f"claude/add-fake-module-{n}-glossary-{n:05x}", "Start")
+
+    server = FakeGitHub((args.host, args.port), repo, record_dir=args.record,
+                        replay_dir=args.replay, upstream=args.upstream, latency=args.latency)
+    mode_name = "record" if args.record else "replay" if args.replay else "fake"
+    print(f"[FakeGitHub] {mode_name} mode on {server.url} (GITHUB_API_URL={server.url})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""
+Нагрузочный тест монитора веток на fake GitHub (benchmarks/fake_github.py)
+
+Поднимает fake-сервер с сотнями веток claude/*, заводит активные задачи
+во временной базе и прогоняет циклы background_monitor.run_monitor_cycle:
+- первый цикл — привязка веток к задачам;
+- дальше в каждом цикле часть веток получает новые коммиты
+  (checkpoint'ы, иногда завершение), иногда появляются новые ветки;
+- в конце — обновление экрана статуса (кнопка "Обновить").
+
+Для каждого прохода записывается число запросов (по маршрутам API),
+ответов 304 и задержка прохода.
+
+Запуск:
+    py -3.12 benchmarks/monitor_load_test.py --branches 300 --cycles 10
+    py -3.12 benchmarks/monitor_load_test.py --mode rest --latency 0.05
+    py -3.12 benchmarks/monitor_load_test.py --digest   # уведомления одной сводкой в конце
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.fake_github import FakeGitHub, FakeRepo, branch_name
+
+DEFAULT_BRANCHES = 200
+DEFAULT_CYCLES = 10
+ACTIVITY_SHARE = 0.2     # доля веток задач с новым коммитом за цикл
+COMPLETE_SHARE = 0.1     # доля новых коммитов, завершающих задачу
+NEW_BRANCHES = 2         # новых служебных веток за цикл
+ADMIN_ID = 1
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+
+class RecordingBot:
+    """Вместо Telegram: сообщения только считаются"""
+
+    def __init__(self):
+        self.sent = 0
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent += 1
+
+
+def _configure(server, mode, workdir, digest):
+    """Направить монитор и хранилище на fake-сервер и временную базу (до импорта модулей)"""
+    os.environ["GITHUB_API_URL"] = server.url
+    os.environ["GITHUB_REQUEST_SPACING"] = "false"  # паузы PyGithub нужны только против api.github.com
+    os.environ["GITHUB_TOKEN"] = os.environ.get("GITHUB_TOKEN") or "fake-token"
+    os.environ["GITHUB_MONITOR_MODE"] = mode
+    os.environ["MONITOR_BACKEND"] = "github"
+    os.environ["WEBHOOK_ENABLED"] = "false"
+    os.environ["DIGEST_ENABLED"] = "true" if digest else "false"
+
+    from modules import task_storage
+    task_storage.close()
+    task_storage.TASKS_FILE = str(Path(workdir) / "tasks.json")
+    task_storage.DB_FILE = str(Path(workdir) / "tasks.db")
+    task_storage.ARCHIVE_DIR = str(Path(workdir) / "archive")
+
+    from modules import monitor_state, telegram_outbox
+    monitor_state.STATE_FILE = str(Path(workdir) / "monitor_state.json")
+    telegram_outbox.OUTBOX_FILE = str(Path(workdir) / "outbox.json")
+
+
+def populate(repo, branches):
+    """
+    Создать задачи по модулям из конфига и ветки к ним; остальные ветки — служебные.
+
+    Returns:
+        list: ветки задач
+    """
+    from modules import task_storage
+    from projects.cfa.config import BOOKS
+
+    modules = [(book["name"], module)
+               for book in BOOKS.values() for module in range(1, book["modules"] + 1)]
+    task_branches = []
+    with task_storage.batch() as tx:
+        for n in range(min(branches, len(modules) * 2)):
+            book, module = modules[n // 2]
+            task_type = "glossary" if n % 2 == 0 else "tests"
+            tx.create_task(task_type, book, module, f"load-{n // 2}")
+            branch = branch_name(book, module, task_type, n)
+            repo.push(branch, "Start work")
+            task_branches.append(branch)
+
+    for n in range(len(task_branches), branches):
+        repo.push(f"claude/fix-load-{n:05x}", "Service change")
+    return task_branches
+
+
+def simulate_activity(repo, task_branches, rnd, cycle):
+    """Новые коммиты в части веток задач и несколько новых веток"""
+    pushed = 0
+    for branch in rnd.sample(task_branches, int(len(task_branches) * ACTIVITY_SHARE)):
+        if rnd.random() < COMPLETE_SHARE:
+            repo.push(branch, "Content complete")
+        else:
+            repo.push(branch, f"checkpoint {cycle}: progress")
+        pushed += 1
+    for n in range(NEW_BRANCHES):
+        repo.push(f"claude/update-load-{cycle}-{n}", "New service branch")
+    return pushed
+
+
+async def _measure(server, coroutine):
+    before = server.snapshot_stats()
+    log = io.StringIO()  # монитор печатает каждый шаг — в замер это не должно попадать
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(log):
+        await coroutine
+    seconds = time.perf_counter() - start
+
+    after = server.snapshot_stats()
+    requests = {route: after[route] - before.get(route, 0)
+                for route in after if after[route] != before.get(route, 0)}
+    return {"seconds": round(seconds, 3), "requests": requests}
+
+
+async def _refresh_status(bot):
+    """Кнопка "Обновить" на экране статуса (ответы в чат только считаются)"""
+    from modules import telegram_bot
+
+    class Message:
+        async def reply_text(self, text, **kwargs):
+            await bot.send_message(ADMIN_ID, text)
+
+    class Update:
+        message = Message()
+
+    telegram_bot.user_state[ADMIN_ID] = {"state": None}
+    await telegram_bot.refresh_and_show_status(Update(), ADMIN_ID)
+
+
+async def run(args):
+    rnd = random.Random(args.seed)
+    repo = FakeRepo()
+    server = FakeGitHub(("127.0.0.1", 0), repo, latency=args.latency).start()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        _configure(server, args.mode, workdir, args.digest)
+        from modules import background_monitor, task_storage
+        from modules.telegram_outbox import outbox
+
+        task_branches = populate(repo, args.branches)
+        bot = RecordingBot()
+        passes = []
+
+        for cycle in range(args.cycles + 1):
+            pushed = simulate_activity(repo, task_branches, rnd, cycle) if cycle else 0
+            queued = outbox.get_stats()["queued"]
+            # Все задачи в каждом цикле — адаптивное расписание здесь не замеряется
+            cycle_run = background_monitor.run_monitor_cycle(bot, ADMIN_ID, check_all=True)
+            result = await _measure(server, cycle_run)
+            result.update(name="link" if cycle == 0 else f"cycle {cycle}",
+                          pushed=pushed, messages=outbox.get_stats()["queued"] - queued)
+            passes.append(result)
+
+        if args.digest:
+            queued = outbox.get_stats()["queued"]
+            with contextlib.redirect_stdout(io.StringIO()):
+                background_monitor.flush_digest(bot, ADMIN_ID)
+            passes.append({"name": "digest", "seconds": 0.0, "requests": {}, "pushed": 0,
+                           "messages": outbox.get_stats()["queued"] - queued})
+
+        try:
+            result = await _measure(server, _refresh_status(bot))
+            result.update(name="status refresh", pushed=0, messages=0)
+            passes.append(result)
+        except ImportError as e:
+            print(f"Status refresh skipped: {e}")
+
+        outbox_stats = outbox.get_stats()
+        task_storage.close()
+
+    server.shutdown()
+    return {
+        "label": args.label,
+        "mode": args.mode,
+        "branches": args.branches,
+        "task_branches": len(task_branches),
+        "latency": args.latency,
+        "digest": args.digest,
+        "passes": passes,
+        "outbox": outbox_stats,
+    }
+
+
+def print_results(results):
+    print(f"\n=== {results['branches']} branches ({results['task_branches']} with tasks), "
+          f"mode {results['mode']}, latency {results['latency'] * 1000:.0f} ms"
+          f"{', digest' if results['digest'] else ''} ===")
+    print(f"{'pass':16} {'seconds':>8} {'requests':>9} {'304':>6} {'pushed':>7} {'messages':>9}  routes")
+    for result in results["passes"]:
+        requests = dict(result["requests"])
+        total = requests.pop("total", 0)
+        not_modified = requests.pop("not_modified", 0)
+        routes = ", ".join(f"{route} {count}" for route, count in sorted(requests.items()))
+        print(f"{result['name']:16} {result['seconds']:>8.3f} {total:>9} {not_modified:>6} "
+              f"{result['pushed']:>7} {result['messages']:>9}  {routes}")
+    outbox = results["outbox"]
+    print(f"Notifications: {outbox['queued']} queued, {outbox['coalesced']} merged into module messages, "
+          f"{outbox['sent']} sent, {outbox['pending']} still waiting for the rate limit")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест монитора веток на fake GitHub")
+    parser.add_argument("--branches", type=int, default=DEFAULT_BRANCHES, help="веток claude/*")
+    parser.add_argument("--cycles", type=int, default=DEFAULT_CYCLES, help="циклов после привязки")
+    parser.add_argument("--mode", choices=("snapshot", "rest"), default="snapshot",
+                        help="GITHUB_MONITOR_MODE")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="задержка каждого ответа fake-сервера, секунд")
+    parser.add_argument("--digest", action="store_true", help="DIGEST_ENABLED: уведомления сводкой")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--label", default="monitor")
+    parser.add_argument("--output", help="куда сохранить JSON (по умолчанию benchmarks/results/)")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print_results(results)
+
+    output = Path(args.output) if args.output else \
+        RESULTS_DIR / f"monitor-{args.label}-{args.mode}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    print(f"\nSaved to {output}")
+
+
+if __name__ == "__main__":
+    main()
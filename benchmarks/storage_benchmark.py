@@ -0,0 +1,357 @@
+"""
+Бенчмарк хранилища задач (modules/task_storage.py)
+
+Для каждого размера синтетической популяции (задачи по всем книгам
+из projects/cfa/config.py) создаётся отдельная база во временной папке,
+после чего каждая публичная функция хранилища вызывается N раз.
+
+Для каждой функции записывается:
+- p50 / p99 задержки (мс)
+- байт записано на операцию (/proc/self/io, иначе — прирост размера файлов)
+- пиковая память (tracemalloc, отдельный короткий проход)
+
+Запуск:
+    py -3.12 benchmarks/storage_benchmark.py --sizes 100 10000 100000
+    py -3.12 benchmarks/storage_benchmark.py --compare before.json after.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from modules import task_storage
+from projects.cfa.config import BOOKS
+
+DEFAULT_SIZES = [100, 10_000, 100_000]
+DEFAULT_CALLS = 200
+MEMORY_CALLS = 20      # вызовов в проходе с tracemalloc (он сильно замедляет код)
+CHUNK_SIZE = 1000      # задач в одной транзакции при заполнении базы
+
+# Доли задач в популяции (остальное — in_progress без ветки)
+COMPLETED_SHARE = 0.7
+READY_SHARE = 0.1
+LINKED_SHARE = 0.1
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+
+# === Популяция ===
+
+def _modules():
+    """Все (книга, модуль) из конфига проекта"""
+    return [(book["name"], module)
+            for book in BOOKS.values()
+            for module in range(1, book["modules"] + 1)]
+
+
+def _branch_name(book, module, task_type, n):
+    book_lower = book.split()[0].lower()
+    return f"claude/add-{book_lower}-module-{module}-{task_type}-{n:05x}"
+
+
+def _create_tasks(count, start=0):
+    """Создать count задач (парами glossary/tests по модулям), вернуть [(task_id, book, module, type, n)]"""
+    modules = _modules()
+    created = []
+    for chunk_start in range(start, start + count, CHUNK_SIZE):
+        chunk_end = min(chunk_start + CHUNK_SIZE, start + count)
+        with task_storage.batch() as tx:
+            for n in range(chunk_start, chunk_end):
+                book, module = modules[(n // 2) % len(modules)]
+                task_type = "glossary" if n % 2 == 0 else "tests"
+                task_id = tx.create_task(task_type, book, module, f"bench-{n // 2}")
+                created.append((task_id, book, module, task_type, n))
+    return created
+
+
+def populate(size):
+    """
+    Заполнить пустую базу size задачами:
+    часть завершена (в архиве), часть готова к merge, часть с веткой
+    """
+    tasks = _create_tasks(size)
+    completed = int(size * COMPLETED_SHARE)
+    ready = int(size * READY_SHARE)
+    linked = int(size * LINKED_SHARE)
+
+    for chunk_start in range(0, completed + ready + linked, CHUNK_SIZE):
+        chunk = tasks[chunk_start:min(chunk_start + CHUNK_SIZE, completed + ready + linked)]
+        with task_storage.batch() as tx:
+            for i, (task_id, book, module, task_type, n) in enumerate(chunk, chunk_start):
+                tx.update_task_branch(task_id, _branch_name(book, module, task_type, n))
+                if i < completed + ready:
+                    tx.add_checkpoint(task_id, "content")
+                    tx.mark_task_completed(task_id)
+                if i < completed:
+                    tx.complete_task(task_id)
+    return tasks
+
+
+# === Измерения ===
+
+def _written_bytes():
+    """
+    Сколько байт процесс передал в write() (Linux: /proc/self/io).
+    На других системах — суммарный размер файлов базы и архива.
+    """
+    try:
+        with open("/proc/self/io") as f:
+            for line in f:
+                if line.startswith("wchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return _storage_bytes()
+
+
+def _storage_bytes():
+    paths = [Path(task_storage.DB_FILE + suffix) for suffix in ("", "-wal", "-shm")]
+    paths += Path(task_storage.ARCHIVE_DIR).glob("*")
+    return sum(path.stat().st_size for path in paths if path.exists())
+
+
+def _percentile(samples, percent):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def measure(func, args_list):
+    """
+    Вызвать func для каждого набора аргументов.
+
+    Returns:
+        dict: calls, p50_ms, p99_ms, bytes_per_op, peak_kb
+    """
+    timings = []
+    written_before = _written_bytes()
+    for args in args_list:
+        start = time.perf_counter()
+        func(*args)
+        timings.append((time.perf_counter() - start) * 1000)
+    written = _written_bytes() - written_before
+
+    return {
+        "calls": len(timings),
+        "p50_ms": round(_percentile(timings, 50), 4),
+        "p99_ms": round(_percentile(timings, 99), 4),
+        "bytes_per_op": round(max(written, 0) / len(timings), 1),
+    }
+
+
+def measure_memory(func, args_list):
+    """Пиковая память (КБ) сверх уже занятой во время вызовов func"""
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        for args in args_list:
+            func(*args)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return round((peak - baseline) / 1024, 1)
+
+
+# === Сценарии ===
+
+def _cases(tasks):
+    """
+    Сценарии (имя, функция, подготовка аргументов).
+    Подготовка вызывается вне замера и возвращает список наборов аргументов.
+    Записи, которые "расходуют" задачу, получают свежие задачи.
+    """
+    rnd = random.Random(42)
+    modules = _modules()
+    active = {t.task_id: t for t in task_storage.get_active_tasks()}
+    active_ids = list(active)
+    linked = [t for t in active.values() if t.branch]
+    archived = [task_id for task_id, *_ in tasks if task_id not in active]
+    next_n = [len(tasks)]  # номер следующей синтетической задачи
+    today = date.today()
+
+    def sample(items, count):
+        return [rnd.choice(items) for _ in range(count)] if items else []
+
+    def fresh(count, **state):
+        created = _create_tasks(count, start=next_n[0])
+        next_n[0] += count
+        with task_storage.batch() as tx:
+            for task_id, book, module, task_type, n in created:
+                if state.get("branch"):
+                    tx.update_task_branch(task_id, _branch_name(book, module, task_type, n))
+                if state.get("ready"):
+                    tx.mark_task_completed(task_id)
+        return [(task_id,) for task_id, *_ in created]
+
+    return [
+        # Запись
+        ("create_task", task_storage.create_task,
+         lambda n: [("glossary",) + modules[i % len(modules)] + (None,) for i in range(n)]),
+        ("create_module_tasks", task_storage.create_module_tasks,
+         lambda n: sample(modules, n)),
+        ("update_task_branch", task_storage.update_task_branch,
+         lambda n: [(task_id, f"claude/bench-{i}") for i, (task_id,) in enumerate(fresh(n))]),
+        ("add_checkpoint", task_storage.add_checkpoint,
+         lambda n: [(task_id, "bench") for task_id in sample(active_ids, n)]),
+        ("update_task_status", task_storage.update_task_status,
+         lambda n: [(task_id, task_storage.TaskStatus.IN_PROGRESS) for (task_id,) in fresh(n)]),
+        ("mark_task_completed", task_storage.mark_task_completed,
+         lambda n: fresh(n, branch=True)),
+        ("complete_task", task_storage.complete_task,
+         lambda n: fresh(n, branch=True, ready=True)),
+        ("remove_task", task_storage.remove_task,
+         lambda n: fresh(n)),
+        # Чтение
+        ("get_revision", task_storage.get_revision, lambda n: [()] * n),
+        ("get_active_tasks", task_storage.get_active_tasks, lambda n: [()] * n),
+        ("get_ready_to_merge_tasks", task_storage.get_ready_to_merge_tasks, lambda n: [()] * n),
+        ("get_completed_tasks_today", task_storage.get_completed_tasks_today, lambda n: [()] * n),
+        ("get_completed_tasks", task_storage.get_completed_tasks,
+         lambda n: [(today.replace(day=1), today)] * n),
+        ("get_task_by_id[active]", task_storage.get_task_by_id,
+         lambda n: [(task_id,) for task_id in sample(active_ids, n)]),
+        ("get_task_by_id[archived]", task_storage.get_task_by_id,
+         lambda n: [(task_id,) for task_id in sample(archived, n)]),
+        ("get_task_by_branch", task_storage.get_task_by_branch,
+         lambda n: [(t.branch,) for t in sample(linked, n)]),
+        ("get_tasks_by_module_id", task_storage.get_tasks_by_module_id,
+         lambda n: [(f"bench-{rnd.randrange(len(tasks) // 2 or 1)}",) for _ in range(n)]),
+        ("get_module_tasks", task_storage.get_module_tasks, lambda n: sample(modules, n)),
+        ("is_module_ready", task_storage.is_module_ready, lambda n: sample(modules, n)),
+        ("get_task_history", task_storage.get_task_history,
+         lambda n: [(task_id,) for task_id, *_ in sample(tasks, n)]),
+        ("get_lifecycle_stats", task_storage.get_lifecycle_stats, lambda n: [()] * n),
+        ("get_average_completion_time", task_storage.get_average_completion_time, lambda n: [()] * n),
+    ]
+
+
+def run_size(size, calls, workdir):
+    """Замерить все функции на популяции из size задач"""
+    base = Path(workdir) / f"size-{size}"
+    task_storage.close()
+    task_storage.TASKS_FILE = str(base / "tasks.json")
+    task_storage.DB_FILE = str(base / "tasks.db")
+    task_storage.ARCHIVE_DIR = str(base / "archive")
+
+    result = {"functions": {}}
+    log = io.StringIO()  # хранилище печатает каждую операцию — в замер это не должно попадать
+    with contextlib.redirect_stdout(log):
+        start = time.perf_counter()
+        tasks = populate(size)
+        result["populate_seconds"] = round(time.perf_counter() - start, 2)
+        task_storage.compact()
+        result["storage_bytes"] = _storage_bytes()
+
+        for name, func, prepare in _cases(tasks):
+            stats = measure(func, prepare(calls))
+            stats["peak_kb"] = measure_memory(func, prepare(min(calls, MEMORY_CALLS)))
+            result["functions"][name] = stats
+            log.seek(0)
+            log.truncate()
+
+        stats = measure(task_storage.clear_all_tasks, [()])
+        result["functions"]["clear_all_tasks"] = stats
+
+    task_storage.close()
+    return result
+
+
+# === Отчёт ===
+
+def print_results(results):
+    for size, result in results["sizes"].items():
+        print(f"\n=== {size} tasks (populate {result['populate_seconds']}s, "
+              f"storage {result['storage_bytes'] / 1024 / 1024:.1f} MB) ===")
+        print(f"{'function':32} {'p50 ms':>10} {'p99 ms':>10} {'bytes/op':>10} {'peak KB':>10}")
+        for name, stats in result["functions"].items():
+            print(f"{name:32} {stats['p50_ms']:>10.3f} {stats['p99_ms']:>10.3f} "
+                  f"{stats['bytes_per_op']:>10.0f} {stats.get('peak_kb', 0):>10.1f}")
+
+
+def compare(before_path, after_path, threshold):
+    """
+    Сравнить два файла результатов.
+
+    Returns:
+        int: число функций, у которых p50 или p99 выросли больше чем в threshold раз
+    """
+    before = json.loads(Path(before_path).read_text(encoding="utf-8"))
+    after = json.loads(Path(after_path).read_text(encoding="utf-8"))
+    print(f"{before.get('label')} -> {after.get('label')} (regression threshold x{threshold})")
+
+    regressions = 0
+    for size, result in after["sizes"].items():
+        old_result = before["sizes"].get(size)
+        if not old_result:
+            continue
+        print(f"\n=== {size} tasks ===")
+        print(f"{'function':32} {'p50':>16} {'p99':>16} {'bytes/op':>16}")
+        for name, stats in result["functions"].items():
+            old = old_result["functions"].get(name)
+            if not old:
+                continue
+            ratios = {key: stats[key] / old[key] if old[key] else 1.0
+                      for key in ("p50_ms", "p99_ms", "bytes_per_op")}
+            slower = ratios["p50_ms"] > threshold or ratios["p99_ms"] > threshold
+            regressions += slower
+            print(f"{name:32} {'x%.2f' % ratios['p50_ms']:>16} {'x%.2f' % ratios['p99_ms']:>16} "
+                  f"{'x%.2f' % ratios['bytes_per_op']:>16}{'  <-- REGRESSION' if slower else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк modules/task_storage.py")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="размеры популяции задач")
+    parser.add_argument("--calls", type=int, default=DEFAULT_CALLS,
+                        help="вызовов каждой функции на размер")
+    parser.add_argument("--label", default="sqlite",
+                        help="метка результатов (например, имя бэкенда хранилища)")
+    parser.add_argument("--output", help="куда сохранить JSON (по умолчанию benchmarks/results/)")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"),
+                        help="сравнить два файла результатов вместо запуска")
+    parser.add_argument("--threshold", type=float, default=1.2,
+                        help="во сколько раз медленнее считается регрессией")
+    args = parser.parse_args()
+
+    if args.compare:
+        regressions = compare(*args.compare, args.threshold)
+        print(f"\nRegressions: {regressions}")
+        sys.exit(1 if regressions else 0)
+
+    results = {
+        "label": args.label,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "calls": args.calls,
+        "sizes": {},
+    }
+    with tempfile.TemporaryDirectory(prefix="task-storage-bench-") as workdir:
+        for size in args.sizes:
+            print(f"[Benchmark] {size} tasks...")
+            results["sizes"][str(size)] = run_size(size, args.calls, workdir)
+
+    print_results(results)
+
+    output = Path(args.output) if args.output else \
+        RESULTS_DIR / f"{args.label}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"\n[Benchmark] Results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,7 +7,9 @@ import asyncio
 import logging
 from modules.telegram_bot import create_bot
 from modules.background_monitor import background_monitor_loop
-from config import TELEGRAM_ADMIN_ID
+from modules.webhook_server import run_webhook_server
+from modules.telegram_outbox import outbox
+from config import TELEGRAM_ADMIN_ID, WEBHOOK_ENABLED
 
 # Настройка логирования
 logging.basicConfig(
@@ -16,6 +18,28 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Фоновые задачи бота: ссылки держатся, чтобы задачи не собрал GC,
+# а падение (например, занятый порт webhook) не потерялось молча
+_background_tasks = set()
+
+
+def start_background_task(coroutine, name):
+    task = asyncio.create_task(coroutine, name=name)
+    _background_tasks.add(task)
+    task.add_done_callback(_on_background_task_done)
+    return task
+
+
+def _on_background_task_done(task):
+    _background_tasks.discard(task)
+    if task.cancelled():
+        return
+    error = task.exception()
+    if error:
+        logger.error("%s stopped with an error", task.get_name(), exc_info=error)
+    else:
+        print(f"[Bot] {task.get_name()} stopped")
+
 
 def main():
     print("=" * 50)
@@ -33,11 +57,25 @@ def main():
         
         # Добавляем фоновый мониторинг через post_init
         async def post_init(application):
-            asyncio.create_task(
-                background_monitor_loop(application.bot, int(TELEGRAM_ADMIN_ID))
+            # Очередь уведомлений: досылает сохранённые с прошлого запуска
+            outbox.start(application.bot)
+            start_background_task(
+                background_monitor_loop(application.bot, int(TELEGRAM_ADMIN_ID)),
+                "Background monitor"
             )
+            # События GitHub в реальном времени (опрос становится редкой сверкой)
+            if WEBHOOK_ENABLED:
+                start_background_task(
+                    run_webhook_server(application.bot, int(TELEGRAM_ADMIN_ID)),
+                    "Webhook server"
+                )
         
+        # Несохранённые изменения очереди уведомлений — на диск перед выходом
+        async def post_shutdown(application):
+            outbox.flush()
+
         app.post_init = post_init
+        app.post_shutdown = post_shutdown
     else:
         print("WARNING: TELEGRAM_ADMIN_ID not set, notifications disabled")
 
@@ -9,12 +9,45 @@ TELEGRAM_ADMIN_ID = os.getenv("TELEGRAM_ADMIN_ID")
 
 # === GITHUB ===
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
+# Адрес GitHub API; для нагрузочных тестов — локальный fake-сервер
+# (benchmarks/fake_github.py, например http://127.0.0.1:8765)
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")
+# Паузы PyGithub между запросами (0.25 с, для POST — 1 с). Для api.github.com
+# их не отключать: без них параллельные проверки упираются во вторичные лимиты
+# GitHub. "false" — только для fake-сервера в нагрузочных тестах
+GITHUB_REQUEST_SPACING = os.getenv("GITHUB_REQUEST_SPACING", "true").lower() == "true"
+# Как монитор опрашивает GitHub:
+# "snapshot" — один GraphQL-запрос за цикл на все ветки claude/*
+# "rest"     — отдельные REST-запросы на каждую ветку
+GITHUB_MONITOR_MODE = os.getenv("GITHUB_MONITOR_MODE", "snapshot")
+# Откуда монитор берёт ветки и коммиты:
+# "github" — GitHub API (modules/github_monitor.py)
+# "git"    — локальный клон REPO_PATH: git ls-remote + узкий fetch (modules/git_monitor.py)
+MONITOR_BACKEND = os.getenv("MONITOR_BACKEND", "github")
+
+# === WEBHOOK GITHUB ===
+# Локальный приёмник событий push/create/delete (в настройках репозитория:
+# Webhooks -> Payload URL http(s)://<адрес>:<порт><путь>, Content type application/json)
+WEBHOOK_ENABLED = os.getenv("WEBHOOK_ENABLED", "false").lower() == "true"
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "127.0.0.1")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8090"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/github")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+WEBHOOK_RECORD_DIR = os.getenv("WEBHOOK_RECORD_DIR")  # сохранять события для повтора (replay)
+WEBHOOK_FALLBACK_POLL_SECONDS = 300  # опрос GitHub остаётся как редкая сверка
 
 # === ТАЙМАУТЫ ===
 TASK_TIMEOUT_MINUTES = 60
 CHECK_INTERVAL_SECONDS = 300
 HEARTBEAT_INTERVAL_SECONDS = 600
 
+# === СВОДКА УВЕДОМЛЕНИЙ ===
+# Вместо отдельного сообщения на каждое событие (новая ветка, привязка, checkpoint,
+# завершение) монитор раз в DIGEST_WINDOW_SECONDS присылает одну сводку по книгам
+# и модулям. Срочное (ошибки в коммитах, зависшие задачи) приходит сразу
+DIGEST_ENABLED = os.getenv("DIGEST_ENABLED", "false").lower() == "true"
+DIGEST_WINDOW_SECONDS = int(os.getenv("DIGEST_WINDOW_SECONDS", "900"))
+
 # === PYAUTOGUI ===
 PYAUTOGUI_PAUSE = 0.5
 FAILSAFE = True
@@ -0,0 +1,113 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from modules.branch_monitor import monitor as backend
+from modules import github_monitor
+from modules.github_monitor import POOL_SIZE
+
+# Одновременных запросов к GitHub — по одному на соединение пула клиента
+MAX_CONCURRENT_REQUESTS = POOL_SIZE
+
+
+class AsyncBranchMonitor:
+    """
+    Асинхронный фасад над бэкендом мониторинга веток (modules/branch_monitor.py).
+
+    Запросы к GitHub / git идут в пуле потоков, event loop бота не блокируется.
+    Проверки разных веток выполняются параллельно, но не больше
+    MAX_CONCURRENT_REQUESTS одновременно — клиент и его пул соединений общие.
+
+    Функции бэкенда без сетевых запросов (parse_commit_message, get_cache_stats, ...)
+    вызываются как обычно, без await. Разбор имён веток (branch_key, task_key)
+    общий для бэкендов — он берётся из github_monitor.
+
+    Пример:
+        branches = await monitor.get_claude_branches()
+        heads = await monitor.gather("get_branch_head", [task.branch for task in tasks])
+    """
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(
+            max_workers=MAX_CONCURRENT_REQUESTS, thread_name_prefix="BranchMonitor"
+        )
+        self._semaphore = None
+
+    branch_key = staticmethod(github_monitor.branch_key)
+    task_key = staticmethod(github_monitor.task_key)
+
+    def __getattr__(self, name):
+        return getattr(backend, name)
+
+    async def _run(self, func, *args):
+        """
+        Выполнить функцию бэкенда в пуле потоков.
+        Контекст копируется — приоритет rate_limit.caller() действует и в потоке.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        context = contextvars.copy_context()
+        # Ожидающие в очереди не занимают поток — их можно отменить до запроса
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(context.run, func, *args))
+
+    async def gather(self, name, branches, *args):
+        """
+        Вызвать функцию бэкенда для каждой ветки параллельно
+
+        Args:
+            name: имя метода фасада (например, "get_last_commit_info")
+            branches: ветки
+            *args: дополнительные аргументы метода
+
+        Returns:
+            dict: {ветка: результат}; при ошибке по ветке — None
+        """
+        branches = list(dict.fromkeys(branches))
+        method = getattr(self, name)
+        results = await asyncio.gather(*(method(branch, *args) for branch in branches),
+                                       return_exceptions=True)
+
+        gathered = {}
+        for branch, result in zip(branches, results):
+            if isinstance(result, Exception):
+                print(f"[AsyncMonitor] {name}({branch}) failed: {result}")
+                result = None
+            gathered[branch] = result
+        return gathered
+
+    # === Запросы к GitHub / git ===
+
+    async def get_claude_branches(self):
+        return await self._run(backend.get_claude_branches)
+
+    async def find_branch_for_task(self, task_type, book, module, branches):
+        # Из нескольких подходящих веток выбирается свежая — по дате головы (может быть запрос)
+        return await self._run(backend.find_branch_for_task, task_type, book, module, branches)
+
+    async def get_branch_head(self, branch):
+        return await self._run(backend.get_branch_head, branch)
+
+    async def read_new_commits(self, branch, head_sha=None):
+        return await self._run(lambda: list(backend.read_new_commits(branch, head_sha)))
+
+    async def get_branch_commits(self, branch):
+        return await self._run(backend.get_branch_commits, branch)
+
+    async def get_latest_branch_event(self, branch):
+        return await self._run(backend.get_latest_branch_event, branch)
+
+    async def get_all_branch_checkpoints(self, branch):
+        return await self._run(backend.get_all_branch_checkpoints, branch)
+
+    async def check_branch_completed(self, branch):
+        return await self._run(backend.check_branch_completed, branch)
+
+    async def get_last_commit_info(self, branch):
+        return await self._run(backend.get_last_commit_info, branch)
+
+
+# Общий экземпляр для бота и фонового монитора
+monitor = AsyncBranchMonitor()
@@ -0,0 +1,175 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from modules import task_storage
+
+
+class AsyncTaskStore:
+    """
+    Асинхронный фасад над task_storage для использования внутри event loop.
+
+    Вся работа с диском идёт в отдельном потоке, event loop бота не блокируется.
+    Записи, пришедшие почти одновременно (из разных хендлеров и монитора),
+    склеиваются в одну транзакцию.
+
+    Пример:
+        tasks = await store.get_active_tasks()
+        await store.mark_task_completed(task_id)
+    """
+
+    def __init__(self):
+        # Один поток — операции выполняются строго по очереди
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="TaskStorage")
+        self._pending = []  # (имя метода TaskBatch, args, future)
+        self._flusher = None
+
+    async def _run(self, func, *args):
+        """Выполнить функцию task_storage в потоке хранилища"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args))
+
+    async def _read(self, func, *args):
+        # Чтение видит все записи, запрошенные до него
+        if self._flusher and not self._flusher.done():
+            await asyncio.shield(self._flusher)
+        return await self._run(func, *args)
+
+    def _write(self, name, *args):
+        """Поставить запись в очередь; ближайший flush запишет всю очередь одной транзакцией"""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((name, args, future))
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush())
+        return future
+
+    async def _flush(self):
+        while self._pending:
+            # Даём соседним корутинам шанс добавить свои записи в эту же пачку
+            await asyncio.sleep(0)
+            pending, self._pending = self._pending, []
+
+            tx = task_storage.TaskBatch()
+            for name, args, _ in pending:
+                getattr(tx, name)(*args)
+
+            try:
+                await self._run(tx.commit)
+            except Exception as e:
+                if len(pending) == 1:
+                    print(f"[AsyncStorage] Failed to write: {e}")
+                    self._resolve(pending[0][2], error=e)
+                    continue
+                # Пачка откатилась целиком — каждая операция повторяется отдельно,
+                # ошибку получает только тот, чья запись не прошла
+                print(f"[AsyncStorage] Failed to write {len(pending)} operations ({e}), retrying one by one")
+                for name, args, future in pending:
+                    try:
+                        self._resolve(future, await self._run(self._commit_one, name, args))
+                    except Exception as error:
+                        self._resolve(future, error=error)
+                continue
+
+            if len(pending) > 1:
+                print(f"[AsyncStorage] Coalesced {len(pending)} writes into one transaction")
+            for (_, _, future), result in zip(pending, tx.results):
+                self._resolve(future, result)
+
+    @staticmethod
+    def _commit_one(name, args):
+        tx = task_storage.TaskBatch()
+        getattr(tx, name)(*args)
+        tx.commit()
+        return tx.results[0]
+
+    @staticmethod
+    def _resolve(future, result=None, error=None):
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    @asynccontextmanager
+    async def batch(self):
+        """
+        Асинхронный вариант task_storage.batch(): операции копятся в памяти,
+        а коммит выполняется в потоке хранилища.
+        """
+        tx = task_storage.TaskBatch()
+        yield tx
+        if tx.operations:
+            await self._read(tx.commit)
+
+    # === Запись ===
+
+    async def create_task(self, task_type, book, module, module_id=None):
+        return await self._write("create_task", task_type, book, module, module_id)
+
+    async def update_task_status(self, task_id, status):
+        return await self._write("update_task_status", task_id, status)
+
+    async def update_task_branch(self, task_id, branch):
+        return await self._write("update_task_branch", task_id, branch)
+
+    async def add_checkpoint(self, task_id, checkpoint_name):
+        return await self._write("add_checkpoint", task_id, checkpoint_name)
+
+    async def mark_task_completed(self, task_id):
+        return await self._write("mark_task_completed", task_id)
+
+    async def complete_task(self, task_id):
+        return await self._write("complete_task", task_id)
+
+    async def remove_task(self, task_id):
+        return await self._write("remove_task", task_id)
+
+    async def create_module_tasks(self, book, module):
+        return await self._read(task_storage.create_module_tasks, book, module)
+
+    async def clear_all_tasks(self):
+        return await self._read(task_storage.clear_all_tasks)
+
+    # === Чтение ===
+
+    async def get_active_tasks(self):
+        return await self._read(task_storage.get_active_tasks)
+
+    async def get_completed_tasks_today(self):
+        return await self._read(task_storage.get_completed_tasks_today)
+
+    async def get_completed_tasks(self, start, end=None):
+        return await self._read(task_storage.get_completed_tasks, start, end)
+
+    async def get_task_by_id(self, task_id):
+        return await self._read(task_storage.get_task_by_id, task_id)
+
+    async def get_task_by_branch(self, branch):
+        return await self._read(task_storage.get_task_by_branch, branch)
+
+    async def get_tasks_by_module_id(self, module_id):
+        return await self._read(task_storage.get_tasks_by_module_id, module_id)
+
+    async def get_ready_to_merge_tasks(self):
+        return await self._read(task_storage.get_ready_to_merge_tasks)
+
+    async def get_module_tasks(self, book, module):
+        return await self._read(task_storage.get_module_tasks, book, module)
+
+    async def is_module_ready(self, book, module):
+        return await self._read(task_storage.is_module_ready, book, module)
+
+    async def get_task_history(self, task_id):
+        return await self._read(task_storage.get_task_history, task_id)
+
+    async def get_lifecycle_stats(self, book=None, until=None):
+        return await self._read(task_storage.get_lifecycle_stats, book, until)
+
+    async def get_average_completion_time(self, book=None):
+        return await self._read(task_storage.get_average_completion_time, book)
+
+
+# Общий экземпляр для бота и фонового монитора
+store = AsyncTaskStore()
@@ -1,125 +1,324 @@
 import asyncio
-from datetime import datetime
+import time
+from collections import deque
 from modules import task_storage
-from modules import github_monitor
+from modules.async_storage import store
+from modules.telegram_outbox import outbox
+from modules.async_monitor import monitor
+from modules import monitor_digest, monitor_state, rate_limit
+from config import (
+    WEBHOOK_ENABLED, WEBHOOK_FALLBACK_POLL_SECONDS, CHECK_INTERVAL_SECONDS, HEARTBEAT_INTERVAL_SECONDS,
+    DIGEST_ENABLED, DIGEST_WINDOW_SECONDS
+)
+
+# Расписание опроса: ветка со свежим коммитом проверяется каждые POLL_INTERVAL_SECONDS,
+# без изменений — пауза удваивается до CHECK_INTERVAL_SECONDS. Без активных задач
+# ищутся только новые ветки, раз в HEARTBEAT_INTERVAL_SECONDS
+POLL_INTERVAL_SECONDS = 10  # обычная пауза; при нехватке квоты GitHub растягивается
+MAX_PARALLEL_CHECKS = 10          # задач, проверяемых одновременно
+TASK_CHECK_TIMEOUT_SECONDS = 30   # дольше проверка одной задачи не ждётся
+CYCLE_HISTORY = 100               # длительностей последних циклов для статистики
+
+_cycle_durations = deque(maxlen=CYCLE_HISTORY)
+_cycle_stats = {"skipped": 0, "timeouts": 0}
+
+# task_id -> {"sha": голова ветки при прошлой проверке, "delay": пауза, "due": время следующей проверки}
+_schedule = {}
+_wake = asyncio.Event()  # новая работа запущена — не ждать конца паузы
 
-# Кэш для уведомлений (чтобы не дублировать)
-_notified_tasks = set()
-_known_branches = set()  # Кэш известных веток
-_last_commit_sha = {}  # Кэш последних коммитов для отслеживания checkpoint'ов
 
 async def background_monitor_loop(bot, admin_id):
     """
-    Фоновый мониторинг активных задач и новых веток
-    Проверка каждые 2 минуты
+    Фоновый мониторинг активных задач и новых веток.
+    Пауза между циклами — по расписанию задач (см. next_poll_delay)
 
     Args:
         bot: экземпляр Telegram Bot
         admin_id: Telegram ID администратора для уведомлений
     """
-    print("[BackgroundMonitor] Started background monitoring (check every 10 seconds)")
-
+    # С webhook'ами события приходят сразу, опрос только сверяет пропущенное
+    poll_seconds = WEBHOOK_FALLBACK_POLL_SECONDS if WEBHOOK_ENABLED else POLL_INTERVAL_SECONDS
+    print(f"[BackgroundMonitor] Started background monitoring (check every {poll_seconds} seconds)")
+
+    cycle = None
+    digest = None
+    if DIGEST_ENABLED:
+        print(f"[BackgroundMonitor] Digest mode: summary every {DIGEST_WINDOW_SECONDS} seconds")
+        digest = asyncio.create_task(digest_loop(bot, admin_id))
+    try:
+        while True:
+            try:
+                # По расписанию задач; реже — если квоты GitHub API не хватит до сброса
+                interval = max(next_poll_delay(poll_seconds), rate_limit.next_poll_interval(poll_seconds))
+                try:
+                    await asyncio.wait_for(_wake.wait(), interval)
+                    print("[BackgroundMonitor] Woken up: new work launched")
+                except asyncio.TimeoutError:
+                    pass
+                _wake.clear()
+
+                # Цикл идёт в фоне: следующий не запускается, пока не закончен предыдущий
+                if cycle and not cycle.done():
+                    _cycle_stats["skipped"] += 1
+                    print("[BackgroundMonitor] Previous cycle still running, skipping this one")
+                    continue
+                cycle = asyncio.create_task(timed_monitor_cycle(bot, admin_id, interval))
+                # Расписание обновляет сам цикл — ждём его, но не дольше обычной паузы
+                await asyncio.wait({cycle}, timeout=poll_seconds)
+            except Exception as e:
+                print(f"[BackgroundMonitor] Loop error: {e}")
+                await asyncio.sleep(120)
+    finally:
+        if cycle:
+            cycle.cancel()
+        if digest:
+            digest.cancel()
+            flush_digest(bot, admin_id)  # накопленное не теряется: очередь отправки сохраняется на диск
+
+
+async def digest_loop(bot, admin_id):
+    """Раз в DIGEST_WINDOW_SECONDS отправлять сводку накопленных событий"""
     while True:
+        await asyncio.sleep(DIGEST_WINDOW_SECONDS)
         try:
-            await asyncio.sleep(10)  # Проверка каждые 10 секунд
+            flush_digest(bot, admin_id)
+        except Exception as e:
+            print(f"[BackgroundMonitor] Digest error: {e}")
 
-            # Получаем все ветки Claude с GitHub
-            try:
-                all_branches = github_monitor.get_claude_branches()
-                print(f"[BackgroundMonitor] Found {len(all_branches)} Claude branches on GitHub")
-            except Exception as e:
-                print(f"[BackgroundMonitor] Error getting branches: {e}")
-                all_branches = []
 
-            # Проверяем новые ветки
-            await check_new_branches(bot, admin_id, all_branches)
+def flush_digest(bot, admin_id):
+    """Поставить сводку в очередь отправки (если за окно были события)"""
+    messages = monitor_digest.take_messages()
+    for message in messages:
+        outbox.send(bot, admin_id, message)
+    if messages:
+        print(f"[BackgroundMonitor] Queued digest ({len(messages)} messages)")
 
-            # Проверяем активные задачи
-            active_tasks = task_storage.get_active_tasks()
 
-            if not active_tasks:
-                print("[BackgroundMonitor] No active tasks to monitor")
-                continue
+def wake_monitor():
+    """Запустить цикл мониторинга сразу (вызывается при запуске новых задач)"""
+    _wake.set()
 
-            print(f"[BackgroundMonitor] Checking {len(active_tasks)} active tasks...")
 
-            for task in active_tasks:
-                task_id = task["task_id"]
-                branch = task.get("branch")
+def next_poll_delay(base_seconds):
+    """
+    Пауза до следующего цикла: до ближайшей проверки по расписанию задач,
+    но не меньше base_seconds и не больше CHECK_INTERVAL_SECONDS.
+    Без активных задач — HEARTBEAT_INTERVAL_SECONDS (только поиск новых веток).
+    """
+    if not _schedule:
+        return max(HEARTBEAT_INTERVAL_SECONDS, base_seconds)
+    due = min(entry["due"] for entry in _schedule.values())
+    return min(max(due - time.time(), base_seconds), max(CHECK_INTERVAL_SECONDS, base_seconds))
 
-                # Пропускаем уже завершённые
-                if task.get("status") == "ready_to_merge":
-                    continue
 
-                # Если нет ветки — пытаемся найти
-                if not branch and all_branches:
-                    found_branch = github_monitor.find_branch_for_task(
-                        task["type"],
-                        task["book"],
-                        task["module"],
-                        all_branches
-                    )
-                    if found_branch:
-                        task_storage.update_task_branch(task_id, found_branch)
-                        branch = found_branch
-                        task["branch"] = found_branch  # Обновляем локальный объект
-                        task["branch_linked_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")  # Обновляем локальный объект
-                        await send_branch_linked_notification(bot, admin_id, task, branch)
-
-                # Если ветки всё еще нет — пропускаем
-                if not branch:
-                    continue
+def _is_due(task_id, head_sha=None):
+    """Пора ли проверять задачу: по расписанию или голова ветки уже сдвинулась"""
+    entry = _schedule.get(task_id)
+    if entry is None or time.time() >= entry["due"]:
+        return True
+    return head_sha is not None and head_sha != entry["sha"]
+
+
+def _reschedule(task_id, head_sha, max_delay=CHECK_INTERVAL_SECONDS):
+    """Свежий коммит — снова частый опрос; без изменений — пауза удваивается до max_delay"""
+    entry = _schedule.get(task_id)
+    if entry is None or head_sha != entry["sha"]:
+        delay = POLL_INTERVAL_SECONDS
+    else:
+        delay = min(entry["delay"] * 2, max_delay)
+    _schedule[task_id] = {"sha": head_sha, "delay": delay, "due": time.time() + delay}
+
+
+async def timed_monitor_cycle(bot, admin_id, interval):
+    """Цикл мониторинга с замером длительности (см. get_cycle_stats)"""
+    start = time.monotonic()
+    try:
+        await run_monitor_cycle(bot, admin_id)
+    except Exception as e:
+        print(f"[BackgroundMonitor] Cycle error: {e}")
+    finally:
+        duration = time.monotonic() - start
+        _cycle_durations.append(duration)
+        if duration > interval:
+            print(f"[BackgroundMonitor] Cycle took {duration:.1f}s, longer than the {interval:.0f}s interval")
+        else:
+            print(f"[BackgroundMonitor] Cycle finished in {duration:.1f}s")
+
+
+def get_cycle_stats():
+    """
+    Статистика циклов мониторинга (для экрана статуса)
+
+    Returns:
+        dict: {"cycles", "last", "p50", "max" (секунды или None),
+               "skipped": пропущено циклов, "timeouts": проверок задач по таймауту}
+    """
+    durations = sorted(_cycle_durations)
+    return {
+        "cycles": len(durations),
+        "last": _cycle_durations[-1] if durations else None,
+        "p50": durations[len(durations) // 2] if durations else None,
+        "max": durations[-1] if durations else None,
+        **_cycle_stats,
+    }
+
+
+async def run_monitor_cycle(bot, admin_id, check_all=False):
+    """
+    Один цикл мониторинга: новые ветки, привязка, коммиты, завершение, активность
+    (вызывается из background_monitor_loop; отдельно — в нагрузочном тесте)
 
+    Args:
+        check_all: проверить все задачи, не глядя на расписание
+    """
+    # Получаем все ветки Claude с GitHub
+    try:
+        all_branches = await monitor.get_claude_branches()
+        print(f"[BackgroundMonitor] Found {len(all_branches)} Claude branches on GitHub")
+    except Exception as e:
+        print(f"[BackgroundMonitor] Error getting branches: {e}")
+        all_branches = []
+
+    # Проверяем новые ветки
+    await check_new_branches(bot, admin_id, all_branches)
+
+    # Проверяем активные задачи
+    active_tasks = await store.get_active_tasks()
+
+    # Задачи, ушедшие из активных (merge, удаление), — из расписания и из
+    # отправленных уведомлений
+    active_ids = {task.task_id for task in active_tasks}
+    for task_id in [task_id for task_id in _schedule if check_all or task_id not in active_ids]:
+        del _schedule[task_id]
+    monitor_state.retain_tasks(active_ids)
+
+    if not active_tasks:
+        monitor_state.save()
+        print("[BackgroundMonitor] No active tasks to monitor")
+        return
+
+    print(f"[BackgroundMonitor] Checking {len(active_tasks)} active tasks...")
+
+    # Задачи, завершённые в этом цикле (проверка модуля — после записи)
+    completed_in_cycle = []
+
+    # Все изменения цикла пишутся одной транзакцией; задачи разбирают
+    # MAX_PARALLEL_CHECKS обработчиков (запросы к GitHub ограничивает async_monitor)
+    async with store.batch() as tx:
+        pending = iter(active_tasks)
+
+        async def worker():
+            for task in pending:
                 try:
-                    # Проверяем новые коммиты и checkpoint'ы
-                    await check_branch_updates(bot, admin_id, task, branch)
+                    await asyncio.wait_for(
+                        check_task(bot, admin_id, tx, task, all_branches, completed_in_cycle),
+                        TASK_CHECK_TIMEOUT_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    _cycle_stats["timeouts"] += 1
+                    print(f"[BackgroundMonitor] Check of task {task.task_id} timed out "
+                          f"after {TASK_CHECK_TIMEOUT_SECONDS}s")
 
-                    # Проверяем завершение
-                    if github_monitor.check_branch_completed(branch):
-                        task_storage.mark_task_completed(task_id)
+        await asyncio.gather(*(worker() for _ in range(min(MAX_PARALLEL_CHECKS, len(active_tasks)))))
 
-                        # Отправляем уведомление о завершении
-                        completion_key = f"{task_id}_completed"
-                        if completion_key not in _notified_tasks:
-                            await send_completion_notification(bot, admin_id, task)
-                            _notified_tasks.add(completion_key)
+    # Проверяем, готов ли весь модуль (уже после записи статусов)
+    for task in completed_in_cycle:
+        if await store.is_module_ready(task.book, task.module):
+            await send_module_ready_notification(bot, admin_id, task)
 
-                            # Проверяем, готов ли весь модуль
-                            if task_storage.is_module_ready(task["book"], task["module"]):
-                                await send_module_ready_notification(bot, admin_id, task)
-                        continue
+    monitor_state.save()
 
-                    # Проверяем активность
-                    last_commit = github_monitor.get_last_commit_info(branch)
 
-                    if last_commit:
-                        # Сначала проверяем — сколько времени прошло с привязки ветки
-                        branch_linked_at = task.get("branch_linked_at")
+async def check_task(bot, admin_id, tx, task, all_branches, completed_in_cycle):
+    """
+    Проверить одну активную задачу: привязка ветки, новые коммиты,
+    завершение, активность
 
-                        if branch_linked_at:
-                            from datetime import datetime
-                            linked_time = datetime.strptime(branch_linked_at, "%Y-%m-%d %H:%M:%S")
-                            mins_since_linked = int((datetime.now() - linked_time).total_seconds() / 60)
+    Args:
+        tx: пачка изменений цикла (store.batch())
+        all_branches: ветки Claude на GitHub
+        completed_in_cycle: сюда добавляется задача, если она завершилась
+    """
+    task_id = task.task_id
+    branch = task.branch
+
+    # Пропускаем уже завершённые (их ветки больше не опрашиваются)
+    if task.status == task_storage.TaskStatus.READY_TO_MERGE:
+        _schedule.pop(task_id, None)
+        return
+
+    try:
+        # Если нет ветки — пытаемся найти
+        if not branch and all_branches:
+            found_branch = await monitor.find_branch_for_task(
+                task.type,
+                task.book,
+                task.module,
+                all_branches
+            )
+            if found_branch:
+                tx.update_task_branch(task_id, found_branch)
+                branch = found_branch
+                task.branch = found_branch  # Обновляем локальный объект
+                task.branch_linked_at = int(time.time())  # Обновляем локальный объект
+                await send_branch_linked_notification(bot, admin_id, task, branch)
+
+        # Если ветки всё еще нет — пропускаем; поиск ветки не замедляется:
+        # работа только началась, ветка вот-вот появится
+        if not branch:
+            _reschedule(task_id, None, max_delay=POLL_INTERVAL_SECONDS)
+            return
 
-                            # Если ветка привязана менее 20 минут назад — не считаем зависшей
-                            if mins_since_linked < 20:
-                                continue
+        # Не пора — пока голова ветки (если она известна без запроса) не сдвинулась
+        if not _is_due(task_id, monitor.known_head_sha(branch)):
+            return
+
+        # Проверяем новые коммиты и checkpoint'ы
+        head_sha = await check_branch_updates(bot, admin_id, task, branch)
+        if head_sha is None:
+            # Проверка не удалась — считаем, что изменений нет (без частого опроса при ошибках)
+            head_sha = _schedule.get(task_id, {}).get("sha")
+        _reschedule(task_id, head_sha)
+
+        # Проверяем завершение
+        if await monitor.check_branch_completed(branch):
+            tx.mark_task_completed(task_id)
+            _schedule.pop(task_id, None)
+
+            # Отправляем уведомление о завершении
+            completion_key = f"{task_id}_completed"
+            if not monitor_state.is_notified(completion_key):
+                await send_completion_notification(bot, admin_id, task)
+                monitor_state.mark_notified(completion_key, task_id)
+                completed_in_cycle.append(task)
+            return
 
-                        mins_ago = last_commit["minutes_ago"]
+        # Проверяем активность
+        last_commit = await monitor.get_last_commit_info(branch)
 
-                        # Если > 15 минут без коммитов — предупреждаем (один раз)
-                        if mins_ago > 15:
-                            inactive_key = f"{task_id}_inactive"
-                            if inactive_key not in _notified_tasks:
-                                await send_inactive_warning(bot, admin_id, task, mins_ago)
-                                _notified_tasks.add(inactive_key)
+        if last_commit:
+            # Сначала проверяем — сколько времени прошло с привязки ветки
+            branch_linked_at = task.branch_linked_at
 
-                except Exception as e:
-                    print(f"[BackgroundMonitor] Error checking task {task_id}: {e}")
+            if branch_linked_at:
+                mins_since_linked = int((time.time() - branch_linked_at) / 60)
 
-        except Exception as e:
-            print(f"[BackgroundMonitor] Loop error: {e}")
-            await asyncio.sleep(120)
+                # Если ветка привязана менее 20 минут назад — не считаем зависшей
+                if mins_since_linked < 20:
+                    return
+
+            mins_ago = last_commit["minutes_ago"]
+
+            # Если > 15 минут без коммитов — предупреждаем (один раз)
+            if mins_ago > 15:
+                inactive_key = f"{task_id}_inactive"
+                if not monitor_state.is_notified(inactive_key):
+                    await send_inactive_warning(bot, admin_id, task, mins_ago)
+                    monitor_state.mark_notified(inactive_key, task_id)
+
+    except Exception as e:
+        print(f"[BackgroundMonitor] Error checking task {task_id}: {e}")
 
 
 def is_content_branch(branch_name):
@@ -146,15 +345,18 @@ async def check_new_branches(bot, admin_id, all_branches):
     """
     Проверить новые ветки и отправить уведомления
     """
-    global _known_branches
+    # Пустой список — скорее ошибка запроса: известные ветки не затираем
+    if not all_branches:
+        return
 
-    # Инициализация при первом запуске
-    if not _known_branches:
-        _known_branches = set(all_branches)
+    # Инициализация при самом первом запуске (дальше список хранится в monitor_state)
+    known_branches = monitor_state.get_known_branches()
+    if not known_branches:
+        monitor_state.set_known_branches(all_branches)
         return
 
     # Находим новые ветки
-    new_branches = set(all_branches) - _known_branches
+    new_branches = set(all_branches) - known_branches
 
     for branch in new_branches:
         print(f"[BackgroundMonitor] New branch detected: {branch}")
@@ -165,103 +367,215 @@ async def check_new_branches(bot, admin_id, all_branches):
         else:
             print(f"[BackgroundMonitor] Skipping notification for service branch: {branch}")
 
-    # Обновляем кэш
-    _known_branches = set(all_branches)
+    # Обновляем список известных веток
+    monitor_state.set_known_branches(all_branches)
 
 
 async def check_branch_updates(bot, admin_id, task, branch):
     """
     Проверить обновления в ветке (новые коммиты, checkpoint'ы)
-    """
-    global _last_commit_sha
 
+    Returns:
+        str: SHA головы ветки или None
+    """
     try:
-        commits = github_monitor.get_branch_commits(branch)
-        if not commits:
+        # Голова ветки — в режиме snapshot она уже есть в снимке
+        head = await monitor.get_branch_head(branch)
+        if not head:
             return
 
-        last_commit = commits[0]
-        last_sha = last_commit["sha"]
-        task_id = task["task_id"]
+        # Все коммиты с прошлой проверки (их могло прийти несколько);
+        # пока голова не сдвинулась, запросов к API нет
+        commits = await monitor.read_new_commits(branch, head["sha"])
+        await notify_commit_events(bot, admin_id, task, branch, commits)
+        return head["sha"]
 
-        # Если это первая проверка для этой ветки
-        if branch not in _last_commit_sha:
-            _last_commit_sha[branch] = last_sha
-            return
+    except Exception as e:
+        print(f"[BackgroundMonitor] Error checking branch updates: {e}")
 
-        # Если коммит изменился — проверяем на checkpoint
-        if _last_commit_sha[branch] != last_sha:
-            print(f"[BackgroundMonitor] New commit in {branch}: {last_commit['message'][:50]}")
 
-            # Проверяем на checkpoint
-            event = github_monitor.parse_commit_message(last_commit["message"])
-            if event and event["type"] == "checkpoint":
-                checkpoint_key = f"{task_id}_{event['checkpoint_name']}"
-                if checkpoint_key not in _notified_tasks:
-                    await send_checkpoint_notification(bot, admin_id, task, event)
-                    _notified_tasks.add(checkpoint_key)
+async def notify_commit_events(bot, admin_id, task, branch, commits):
+    """
+    Уведомить о checkpoint'ах и ошибках в новых коммитах ветки
+    (тип события — по правилам COMMIT_RULES)
 
-            # Обновляем кэш
-            _last_commit_sha[branch] = last_sha
+    Args:
+        commits: новые коммиты (dict с sha, message), новые первыми
+    """
+    for commit in commits:
+        print(f"[BackgroundMonitor] New commit in {branch}: {commit['message'][:50]}")
 
-    except Exception as e:
-        print(f"[BackgroundMonitor] Error checking branch updates: {e}")
+        # Проверяем на checkpoint
+        event = monitor.parse_commit_message(commit["message"], commit["sha"])
+        if event and event["type"] == "checkpoint":
+            checkpoint_key = f"{task.task_id}_{event['checkpoint_name']}"
+            if not monitor_state.is_notified(checkpoint_key):
+                await send_checkpoint_notification(bot, admin_id, task, event)
+                monitor_state.mark_notified(checkpoint_key, task.task_id)
+
+        # Коммит сообщает об ошибке — предупреждаем (один раз на коммит)
+        elif event and event["type"] == "failure":
+            failure_key = f"{task.task_id}_failure_{commit['sha']}"
+            if not monitor_state.is_notified(failure_key):
+                await send_failure_warning(bot, admin_id, task, commit)
+                monitor_state.mark_notified(failure_key, task.task_id)
+
+
+# === События webhook (modules/webhook_server.py) ===
+
+async def link_branch(bot, admin_id, branch):
+    """
+    Привязать новую ветку к активной задаче без ветки (как в цикле опроса)
+
+    Returns:
+        Task: привязанная задача или None
+    """
+    for task in await store.get_active_tasks():
+        if task.branch:
+            continue
+        if monitor.branch_key(branch) == monitor.task_key(task.type, task.book, task.module):
+            await store.update_task_branch(task.task_id, branch)
+            task.branch = branch
+            task.branch_linked_at = int(time.time())
+            await send_branch_linked_notification(bot, admin_id, task, branch)
+            return task
+    return None
+
+
+async def handle_branch_created(bot, admin_id, branch):
+    """Событие create: новая ветка — уведомление и привязка к задаче"""
+    if not monitor_state.get_known_branches():
+        # Опрос ещё не запускался — без списка веток новая ветка приняла бы его за инициализацию
+        await check_new_branches(bot, admin_id, set(await monitor.get_claude_branches()) - {branch})
+    await check_new_branches(bot, admin_id, monitor_state.get_known_branches() | {branch})
+    await link_branch(bot, admin_id, branch)
+    monitor_state.save()
+
+
+async def handle_branch_deleted(branch):
+    """Событие delete: ветка удалена"""
+    monitor_state.set_known_branches(monitor_state.get_known_branches() - {branch})
+    monitor_state.save()
+    monitor.forget_branch(branch)
+
+
+async def handle_push(bot, admin_id, branch, commits):
+    """
+    Событие push: checkpoint'ы и завершение — те же проверки, что в цикле опроса
+
+    Args:
+        branch: ветка
+        commits: новые коммиты (dict с sha, message, time), новые первыми
+    """
+    if not commits:
+        return
+
+    monitor.note_branch_head(branch, commits[0])
+    if branch not in monitor_state.get_known_branches():
+        await handle_branch_created(bot, admin_id, branch)
+
+    task = await store.get_task_by_branch(branch)
+    if not task or task.status != task_storage.TaskStatus.IN_PROGRESS:
+        return
+
+    await notify_commit_events(bot, admin_id, task, branch, commits)
+
+    # Завершение определяется по последнему коммиту
+    pattern = monitor.find_completion_pattern(commits[0]["message"], commits[0]["sha"])
+    if not pattern:
+        monitor_state.save()
+        return
+
+    print(f"[BackgroundMonitor] Branch {branch} is COMPLETED (found '{pattern}' in pushed commit)")
+    await store.mark_task_completed(task.task_id)
+    completion_key = f"{task.task_id}_completed"
+    if not monitor_state.is_notified(completion_key):
+        await send_completion_notification(bot, admin_id, task)
+        monitor_state.mark_notified(completion_key, task.task_id)
+        monitor_state.save()
+        if await store.is_module_ready(task.book, task.module):
+            await send_module_ready_notification(bot, admin_id, task)
+
+
+def _module_key(task):
+    """Ключ склейки уведомлений: все события одного модуля уходят одним сообщением"""
+    return f"{task.book}_{task.module}"
+
+
+def _notify(bot, admin_id, task, message, digest_line):
+    """
+    Уведомление о плановом событии задачи: в режиме сводки — строка digest_line
+    в сводку модуля, иначе — сообщение message сразу в очередь отправки
+    """
+    if DIGEST_ENABLED:
+        monitor_digest.add(task.book, task.module, digest_line)
+    else:
+        outbox.send(bot, admin_id, message, key=_module_key(task))
 
 
 async def send_completion_notification(bot, admin_id, task):
     """Отправить уведомление о завершении задачи"""
-    type_emoji = "📖" if task["type"] == "glossary" else "📝"
-    type_name = "Глоссарий" if task["type"] == "glossary" else "Тесты"
+    type_emoji = "📖" if task.type == "glossary" else "📝"
+    type_name = "Глоссарий" if task.type == "glossary" else "Тесты"
 
     message = (
         f"✅ *Задача завершена!*\n\n"
         f"{type_emoji} {type_name}\n"
-        f"📚 {task['book']} Module {task['module']}\n\n"
+        f"📚 {task.book} Module {task.module}\n\n"
         f"Готово к merge!"
     )
 
-    try:
-        await bot.send_message(chat_id=admin_id, text=message, parse_mode="Markdown")
-        print(f"[BackgroundMonitor] Sent completion notification for {task['task_id']}")
-    except Exception as e:
-        print(f"[BackgroundMonitor] Failed to send notification: {e}")
+    _notify(bot, admin_id, task, message, f"{type_emoji} {type_name}: ✅ завершена, готово к merge")
+    print(f"[BackgroundMonitor] Queued completion notification for {task.task_id}")
 
 
 async def send_module_ready_notification(bot, admin_id, task):
     """Отправить уведомление о готовности всего модуля"""
     message = (
         f"🎉 *Модуль полностью готов!*\n\n"
-        f"📚 {task['book']} Module {task['module']}\n\n"
+        f"📚 {task.book} Module {task.module}\n\n"
         f"✅ Glossary готов\n"
         f"✅ Tests готовы\n\n"
         f"Можно делать merge!"
     )
 
-    try:
-        await bot.send_message(chat_id=admin_id, text=message, parse_mode="Markdown")
-        print(f"[BackgroundMonitor] Sent module ready notification")
-    except Exception as e:
-        print(f"[BackgroundMonitor] Failed to send notification: {e}")
+    _notify(bot, admin_id, task, message, "🎉 Модуль полностью готов, можно делать merge")
+    print(f"[BackgroundMonitor] Queued module ready notification")
 
 
 async def send_inactive_warning(bot, admin_id, task, minutes):
     """Отправить предупреждение об отсутствии активности"""
-    type_emoji = "📖" if task["type"] == "glossary" else "📝"
-    type_name = "Глоссарий" if task["type"] == "glossary" else "Тесты"
+    type_emoji = "📖" if task.type == "glossary" else "📝"
+    type_name = "Глоссарий" if task.type == "glossary" else "Тесты"
 
     message = (
         f"⚠️ *Возможно зависла*\n\n"
         f"{type_emoji} {type_name}\n"
-        f"📚 {task['book']} Module {task['module']}\n\n"
+        f"📚 {task.book} Module {task.module}\n\n"
         f"Последний коммит: {minutes} мин назад\n"
         f"Проверь вкладку Claude Code"
     )
 
-    try:
-        await bot.send_message(chat_id=admin_id, text=message, parse_mode="Markdown")
-        print(f"[BackgroundMonitor] Sent inactive warning for {task['task_id']}")
-    except Exception as e:
-        print(f"[BackgroundMonitor] Failed to send notification: {e}")
+    outbox.send(bot, admin_id, message, key=_module_key(task))
+    print(f"[BackgroundMonitor] Queued inactive warning for {task.task_id}")
+
+
+async def send_failure_warning(bot, admin_id, task, commit):
+    """Отправить предупреждение о коммите с ошибкой"""
+    type_emoji = "📖" if task.type == "glossary" else "📝"
+    type_name = "Глоссарий" if task.type == "glossary" else "Тесты"
+    first_line = commit["message"].splitlines()[0][:80]
+
+    message = (
+        f"❌ *Ошибка в работе*\n\n"
+        f"{type_emoji} {type_name}\n"
+        f"📚 {task.book} Module {task.module}\n\n"
+        f"Коммит: {first_line}\n"
+        f"Проверь вкладку Claude Code"
+    )
+
+    outbox.send(bot, admin_id, message, key=_module_key(task))
+    print(f"[BackgroundMonitor] Queued failure warning for {task.task_id}")
 
 
 async def send_new_branch_notification(bot, admin_id, branch):
@@ -274,49 +588,43 @@ async def send_new_branch_notification(bot, admin_id, branch):
         f"Claude Code начал работу"
     )
 
-    try:
-        await bot.send_message(chat_id=admin_id, text=message, parse_mode="Markdown")
-        print(f"[BackgroundMonitor] Sent new branch notification: {branch}")
-    except Exception as e:
-        print(f"[BackgroundMonitor] Failed to send notification: {e}")
+    if DIGEST_ENABLED:
+        monitor_digest.add_branch(branch)
+    else:
+        outbox.send(bot, admin_id, message)
+    print(f"[BackgroundMonitor] Queued new branch notification: {branch}")
 
 
 async def send_branch_linked_notification(bot, admin_id, task, branch):
     """Отправить уведомление о привязке ветки к задаче"""
-    type_emoji = "📖" if task["type"] == "glossary" else "📝"
-    type_name = "Глоссарий" if task["type"] == "glossary" else "Тесты"
+    type_emoji = "📖" if task.type == "glossary" else "📝"
+    type_name = "Глоссарий" if task.type == "glossary" else "Тесты"
     branch_short = branch.replace("claude/", "")
 
     message = (
         f"🔗 *Ветка привязана к задаче!*\n\n"
         f"{type_emoji} {type_name}\n"
-        f"📚 {task['book']} Module {task['module']}\n"
+        f"📚 {task.book} Module {task.module}\n"
         f"🌿 `{branch_short}`"
     )
 
-    try:
-        await bot.send_message(chat_id=admin_id, text=message, parse_mode="Markdown")
-        print(f"[BackgroundMonitor] Sent branch linked notification for {task['task_id']}")
-    except Exception as e:
-        print(f"[BackgroundMonitor] Failed to send notification: {e}")
+    _notify(bot, admin_id, task, message, f"{type_emoji} {type_name}: 🔗 ветка `{branch_short}`")
+    print(f"[BackgroundMonitor] Queued branch linked notification for {task.task_id}")
 
 
 async def send_checkpoint_notification(bot, admin_id, task, event):
     """Отправить уведомление о достижении checkpoint'а"""
-    type_emoji = "📖" if task["type"] == "glossary" else "📝"
-    type_name = "Глоссарий" if task["type"] == "glossary" else "Тесты"
+    type_emoji = "📖" if task.type == "glossary" else "📝"
+    type_name = "Глоссарий" if task.type == "glossary" else "Тесты"
     checkpoint_name = event.get("checkpoint_name", "Unknown")
 
     message = (
         f"🎯 *Checkpoint достигнут!*\n\n"
         f"{type_emoji} {type_name}\n"
-        f"📚 {task['book']} Module {task['module']}\n"
+        f"📚 {task.book} Module {task.module}\n"
         f"✅ {checkpoint_name.title()}\n\n"
         f"Работа продолжается..."
     )
 
-    try:
-        await bot.send_message(chat_id=admin_id, text=message, parse_mode="Markdown")
-        print(f"[BackgroundMonitor] Sent checkpoint notification: {checkpoint_name}")
-    except Exception as e:
-        print(f"[BackgroundMonitor] Failed to send notification: {e}")
+    _notify(bot, admin_id, task, message, f"{type_emoji} {type_name}: 🎯 {checkpoint_name.title()}")
+    print(f"[BackgroundMonitor] Queued checkpoint notification: {checkpoint_name}")
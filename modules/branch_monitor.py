@@ -0,0 +1,11 @@
+"""
+Бэкенд мониторинга веток, выбранный в config.py (MONITOR_BACKEND).
+Оба бэкенда реализуют один интерфейс — см. modules/github_monitor.py.
+"""
+
+from config import MONITOR_BACKEND
+
+if MONITOR_BACKEND == "git":
+    from modules import git_monitor as monitor
+else:
+    from modules import github_monitor as monitor
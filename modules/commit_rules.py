@@ -0,0 +1,117 @@
+"""
+Классификация коммитов по правилам из конфига проекта (COMMIT_RULES)
+
+Все правила собраны в одно регулярное выражение: каждое — отдельная
+lookahead-альтернатива от начала сообщения, поэтому одна проверка
+соблюдает порядок правил. Результат кэшируется по SHA коммита —
+каждый коммит классифицируется один раз, сколько бы проверок его ни смотрели.
+"""
+
+import re
+import sys
+import threading
+
+from projects.cfa.config import COMMIT_RULES
+
+CACHE_MAX_ENTRIES = 5000
+
+# Сообщения с ожидаемым типом — проверка правил: python -m modules.commit_rules
+EXAMPLES = [
+    ("Content complete", "complete"),
+    ("Глоссарий готов", "complete"),
+    ("Исправлена ошибка, глоссарий готов", "complete"),
+    ("Fix failed build; tests complete", "complete"),
+    ("Failed: build broken", "failure"),
+    ("Ошибка: не найден файл модуля", "failure"),
+    ("Не удалось сгенерировать тесты", "failure"),
+    ("checkpoint 2: terms extracted", "checkpoint"),
+    ("checkpoint 2: исправлена ошибка в терминах", "checkpoint"),
+    ("checkpoint 1: fix failed parsing", "checkpoint"),
+    ("Исправлена ошибка в тестах", None),
+    ("Start work", None),
+]
+
+_rules = []       # [(тип, номер группы правила)]
+_pattern = None   # общее выражение
+_cache = {}       # sha -> результат classify, в порядке добавления
+_cache_lock = threading.Lock()
+
+
+def load_rules(rules=COMMIT_RULES):
+    """
+    Скомпилировать правила в одно выражение (кэш сбрасывается)
+
+    Args:
+        rules: [(тип события, регулярное выражение)]
+    """
+    global _pattern
+    alternatives = []
+    _rules.clear()
+    group = 1
+    for event_type, expression in rules:
+        _rules.append((event_type, group))
+        alternatives.append(f"(?=.*?({expression}))")
+        group += 1 + re.compile(expression).groups
+    _pattern = re.compile("^(?:" + "|".join(alternatives) + ")", re.IGNORECASE | re.DOTALL)
+    _cache.clear()
+
+
+def classify(message, sha=None):
+    """
+    Определить тип события коммита
+
+    Args:
+        message: сообщение коммита
+        sha: SHA коммита — если указан, результат берётся из кэша / кладётся в кэш
+
+    Returns:
+        dict: {"type", "match", "checkpoint_name", "checkpoint_num"} или None
+    """
+    if sha and sha in _cache:
+        result = _cache[sha]
+        return dict(result) if result else None
+    if _pattern is None:
+        load_rules()
+
+    result = None
+    match = _pattern.match(message)
+    if match:
+        for event_type, group in _rules:
+            if match.group(group) is not None:
+                result = {"type": event_type, "match": match.group(group),
+                          "checkpoint_name": None, "checkpoint_num": None}
+                if event_type == "checkpoint":
+                    result["checkpoint_num"] = int(match.group(group + 1))
+                    result["checkpoint_name"] = f"checkpoint {result['checkpoint_num']}"
+                break
+
+    if sha:
+        with _cache_lock:
+            _cache[sha] = result
+            if len(_cache) > CACHE_MAX_ENTRIES:
+                del _cache[next(iter(_cache))]
+    return dict(result) if result else None
+
+
+def check_examples(examples=EXAMPLES):
+    """
+    Проверить правила на примерах
+
+    Returns:
+        list: [(сообщение, ожидаемый тип, полученный тип)] — расхождения
+    """
+    mismatches = []
+    for message, expected in examples:
+        result = classify(message)
+        actual = result["type"] if result else None
+        if actual != expected:
+            mismatches.append((message, expected, actual))
+    return mismatches
+
+
+if __name__ == "__main__":
+    mismatches = check_examples()
+    for message, expected, actual in mismatches:
+        print(f"[CommitRules] {message!r}: expected {expected}, got {actual}")
+    print(f"[CommitRules] {len(EXAMPLES) - len(mismatches)}/{len(EXAMPLES)} examples passed")
+    sys.exit(1 if mismatches else 0)
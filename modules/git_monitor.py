@@ -0,0 +1,331 @@
+"""
+Мониторинг веток через локальный клон (REPO_PATH) вместо GitHub API
+
+Головы всех веток claude/* берутся одним `git ls-remote`, изменившиеся
+ветки подтягиваются узким fetch'ем, а сообщения и даты коммитов читаются
+из локального хранилища объектов. Один сетевой запрос за цикл, квота API
+не расходуется.
+
+Интерфейс повторяет github_monitor (выбор — MONITOR_BACKEND в config.py).
+"""
+
+import subprocess
+import time
+from datetime import datetime
+
+from modules import github_monitor
+from modules.git_operations import REPO_LOCK
+from modules.github_monitor import (
+    BASE_BRANCH, SNAPSHOT_MAX_AGE_SECONDS,
+    find_completion_pattern, parse_commit_message
+)
+from projects.cfa.config import REPO_PATH
+
+CLONE_PATH = REPO_PATH
+REMOTE = "origin"
+BRANCH_PREFIX = "claude/"
+MAX_COMMITS = 100  # не глубже при чтении истории ветки
+
+# Разделители полей/записей в выводе git log
+_FIELD = "\x00"
+_RECORD = "\x1e"
+_LOG_FORMAT = "--format=%H%x00%aI%x00%B%x1e"
+
+_heads = {"time": 0, "branches": None}  # branch -> SHA головы по последнему ls-remote
+_last_seen_sha = {}  # branch -> SHA последнего прочитанного коммита (read_new_commits)
+_local_commits = set()  # SHA, уже найденные в локальном клоне (объекты git не удаляются)
+MAX_LOCAL_COMMITS = 10000
+_fetch_stats = {"hits": 0, "misses": 0}  # циклы без fetch / с fetch
+# ls-remote и fetch — не больше одного одновременно; блокировка общая со слиянием
+# модулей (modules/git_operations.py), которое работает в том же клоне
+_heads_lock = REPO_LOCK
+
+
+def _run_git(args, input=None):
+    """
+    Выполнить git в клоне. Вывод декодируется как UTF-8 (а не кодовой
+    страницей системы) — иначе сообщения на кириллице не совпадут с COMMIT_RULES
+    """
+    return subprocess.run(
+        ["git"] + list(args),
+        cwd=CLONE_PATH,
+        input=input,
+        capture_output=True,
+        encoding="utf-8",
+        errors="replace"
+    )
+
+
+def _git(*args, input=None):
+    """Выполнить git в клоне; при ошибке — RuntimeError с выводом git"""
+    result = _run_git(args, input)
+    if result.returncode != 0:
+        raise RuntimeError(f"git {args[0]} failed: {result.stderr.strip()}")
+    return result.stdout
+
+
+def _missing_commits(shas):
+    """
+    Какие из коммитов отсутствуют в локальном клоне.
+    Все проверяются одним `git cat-file --batch-check`; уже найденные — без git.
+    """
+    unknown = [sha for sha in dict.fromkeys(shas) if sha not in _local_commits]
+    if not unknown:
+        return set()
+    output = _git("cat-file", "--batch-check", input="".join(f"{sha}^{{commit}}\n" for sha in unknown))
+    missing = set()
+    for sha, line in zip(unknown, output.splitlines()):
+        if line.endswith(" missing") or line.endswith(" ambiguous"):
+            missing.add(sha)
+    if len(_local_commits) > MAX_LOCAL_COMMITS:
+        _local_commits.clear()
+    _local_commits.update(sha for sha in unknown if sha not in missing)
+    return missing
+
+
+def _has_commit(sha):
+    return not _missing_commits([sha])
+
+
+def refresh_heads():
+    """
+    Получить головы всех веток claude/* одним ls-remote и докачать
+    только те коммиты, которых ещё нет в локальном клоне.
+
+    Returns:
+        dict: {ветка: SHA головы}
+    """
+    with _heads_lock:
+        output = _git("ls-remote", REMOTE, f"refs/heads/{BRANCH_PREFIX}*")
+        branches = {}
+        for line in output.splitlines():
+            sha, ref = line.split("\t")
+            branches[ref.removeprefix("refs/heads/")] = sha
+
+        missing_shas = _missing_commits(branches.values())
+        missing = [branch for branch, sha in branches.items() if sha in missing_shas]
+        if missing:
+            # Узкий fetch: только изменившиеся ветки и база (для отсечения её истории)
+            refspecs = [f"+refs/heads/{branch}:refs/remotes/{REMOTE}/{branch}"
+                        for branch in missing + [BASE_BRANCH]]
+            _git("fetch", "--no-tags", REMOTE, *refspecs)
+            _fetch_stats["misses"] += 1
+            print(f"[GitMonitor] Fetched {len(missing)} updated branches")
+        else:
+            _fetch_stats["hits"] += 1
+
+        _heads["time"] = time.time()
+        _heads["branches"] = branches
+        for branch in set(_last_seen_sha).difference(branches):
+            del _last_seen_sha[branch]
+        return branches
+
+
+def _branch_heads():
+    """Головы веток (ls-remote повторяется, если данные устарели)"""
+    with _heads_lock:
+        if _heads["branches"] is None or time.time() - _heads["time"] > SNAPSHOT_MAX_AGE_SECONDS:
+            refresh_heads()
+        return _heads["branches"]
+
+
+def get_cache_stats():
+    """
+    Статистика в формате github_monitor.get_cache_stats
+
+    Returns:
+        dict: {"hits": циклов без fetch, "misses": циклов с fetch, "entries": известных веток}
+    """
+    return {**_fetch_stats, "entries": len(_heads["branches"] or {})}
+
+
+def get_claude_branches():
+    """
+    Получить список веток Claude (claude/*)
+
+    Returns:
+        list: список названий веток, начинающихся с 'claude/'
+    """
+    try:
+        branches = list(refresh_heads())
+        print(f"[GitMonitor] Found {len(branches)} Claude branches")
+        return branches
+    except Exception as e:
+        print(f"[GitMonitor] Error getting branches: {e}")
+        return []
+
+
+def _read_log(*revisions, limit=MAX_COMMITS):
+    """Коммиты из git log (новые первыми): [{sha, message, time}]"""
+    output = _git("log", f"--max-count={limit}", _LOG_FORMAT, *revisions, "--")
+    commits = []
+    for record in output.split(_RECORD):
+        record = record.strip("\n")
+        if not record:
+            continue
+        sha, date, message = record.split(_FIELD, 2)
+        commits.append({"sha": sha, "message": message.strip(), "time": datetime.fromisoformat(date)})
+    return commits
+
+
+def _commit_dict(commit):
+    return {
+        "sha": commit["sha"],
+        "message": commit["message"],
+        "date": commit["time"].strftime("%Y-%m-%d %H:%M:%S")
+    }
+
+
+def get_branch_head(branch_name):
+    """
+    Последний коммит ветки
+
+    Returns:
+        dict: {"sha", "message", "time"} (time — aware datetime) или None
+    """
+    try:
+        sha = _branch_heads().get(branch_name)
+        if not sha:
+            return None
+        if not _has_commit(sha):
+            refresh_heads()
+        return _read_log(sha, limit=1)[0]
+    except Exception as e:
+        print(f"[GitMonitor] Error getting head of {branch_name}: {e}")
+        return None
+
+
+def iter_branch_commits(branch_name, since_sha=None, head_sha=None):
+    """
+    Коммиты ветки без истории BASE_BRANCH (или только новее since_sha), новые первыми
+
+    Yields:
+        dict: коммит {sha, message, date}
+    """
+    head = head_sha or _branch_heads().get(branch_name)
+    if not head:
+        return
+    if not _has_commit(head):
+        refresh_heads()
+    exclude = since_sha if since_sha and _has_commit(since_sha) else f"{REMOTE}/{BASE_BRANCH}"
+    for commit in _read_log(head, f"^{exclude}"):
+        yield _commit_dict(commit)
+
+
+def read_new_commits(branch_name, head_sha=None):
+    """
+    Коммиты, появившиеся в ветке с прошлого вызова (новые первыми).
+    Первый вызов для ветки только запоминает её голову и ничего не возвращает.
+
+    Yields:
+        dict: коммит {sha, message, date}
+    """
+    if head_sha is None:
+        head = get_branch_head(branch_name)
+        if not head:
+            return
+        head_sha = head["sha"]
+
+    last_seen = _last_seen_sha.get(branch_name)
+    _last_seen_sha[branch_name] = head_sha
+    if last_seen is None or last_seen == head_sha:
+        return
+
+    yield from iter_branch_commits(branch_name, since_sha=last_seen, head_sha=head_sha)
+
+
+def note_branch_head(branch_name, head):
+    """Запомнить голову ветки, известную из webhook push"""
+    _last_seen_sha[branch_name] = head["sha"]
+    if _heads["branches"] is not None:
+        _heads["branches"][branch_name] = head["sha"]
+
+
+def known_head_sha(branch_name):
+    """SHA головы ветки по последнему ls-remote — без запроса (None, если неизвестна)"""
+    return (_heads["branches"] or {}).get(branch_name)
+
+
+def forget_branch(branch_name):
+    """Ветка удалена — убрать её из известных голов"""
+    _last_seen_sha.pop(branch_name, None)
+    if _heads["branches"] is not None:
+        _heads["branches"].pop(branch_name, None)
+
+
+def _iter_commits_logged(branch_name):
+    try:
+        yield from iter_branch_commits(branch_name)
+    except Exception as e:
+        print(f"[GitMonitor] Error getting commits for {branch_name}: {e}")
+
+
+def find_branch_for_task(task_type, book, module, branches):
+    """Ветка задачи — см. github_monitor; из нескольких берётся ветка с самым свежим коммитом клона"""
+    return github_monitor.find_branch_for_task(task_type, book, module, branches, get_head=get_branch_head)
+
+
+def get_branch_commits(branch_name):
+    """
+    Получить список коммитов ветки (только её собственные, без истории BASE_BRANCH)
+
+    Returns:
+        list: список коммитов (dict с полями: sha, message, date)
+    """
+    commit_list = list(_iter_commits_logged(branch_name))
+    print(f"[GitMonitor] Found {len(commit_list)} commits in branch {branch_name}")
+    return commit_list
+
+
+def get_latest_branch_event(branch_name):
+    """Последнее событие (checkpoint/complete) ветки — см. github_monitor"""
+    for commit in _iter_commits_logged(branch_name):
+        event = parse_commit_message(commit["message"], commit["sha"])
+        if event:
+            event["date"] = commit["date"]
+            return event
+    return None
+
+
+def get_all_branch_checkpoints(branch_name):
+    """Все checkpoint'ы ветки — см. github_monitor"""
+    checkpoints = [
+        {"name": event["checkpoint_name"], "date": commit["date"]}
+        for commit in _iter_commits_logged(branch_name)
+        if (event := parse_commit_message(commit["message"], commit["sha"])) and event["type"] == "checkpoint"
+    ]
+    checkpoints.sort(key=lambda x: int(x["name"].split()[-1]))
+    return checkpoints
+
+
+def check_branch_completed(branch_name):
+    """Проверить по последнему коммиту, завершена ли задача в ветке"""
+    head = get_branch_head(branch_name)
+    if not head:
+        return False
+
+    pattern = find_completion_pattern(head["message"], head["sha"])
+    if pattern:
+        print(f"[GitMonitor] Branch {branch_name} is COMPLETED (found '{pattern}' in last commit)")
+        return True
+    return False
+
+
+def get_last_commit_info(branch_name):
+    """
+    Информация о последнем коммите ветки
+
+    Returns:
+        dict: {"message", "time", "minutes_ago"} или None
+    """
+    head = get_branch_head(branch_name)
+    if not head:
+        return None
+
+    minutes_ago = int((datetime.now(head["time"].tzinfo) - head["time"]).total_seconds() / 60)
+    return {
+        "message": head["message"],
+        "time": head["time"],
+        "minutes_ago": minutes_ago
+    }
+
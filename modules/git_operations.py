@@ -1,6 +1,10 @@
 import subprocess
+import threading
 from projects.cfa.config import REPO_PATH
 
+# Одна операция с клоном REPO_PATH за раз: слияние модуля и fetch монитора веток
+REPO_LOCK = threading.RLock()
+
 def run_git_command(args, repo_path=REPO_PATH):
     """Выполнить git команду в папке проекта"""
     result = subprocess.run(
@@ -95,52 +99,57 @@ def merge_module_branches(glossary_branch, tests_branch, repo_path=REPO_PATH):
     if not tests_branch.startswith("origin/"):
         tests_branch = f"origin/{tests_branch}"
 
-    try:
-        # 1. Fetch
-        print("[Git] Fetching origin...")
-        git_fetch()
-
-        # 2. Checkout main и pull
-        print("[Git] Checkout main...")
-        checkout_result = git_checkout("main")
-        if checkout_result.returncode != 0:
-            return {"success": False, "message": f"Checkout main failed: {checkout_result.stderr}"}
-
-        pull_result = git_pull()
-        if pull_result.returncode != 0:
-            return {"success": False, "message": f"Pull failed: {pull_result.stderr}"}
-
-        # 3. Merge glossary (первым, обычно без конфликтов)
-        print(f"[Git] Merging glossary: {glossary_branch}...")
-        glossary_result = git_merge(glossary_branch, f"Merge {glossary_branch}")
-        if glossary_result.returncode != 0:
-            # Попробуем с -X theirs
-            glossary_result = git_merge_theirs(glossary_branch)
+    # Клон общий с монитором веток (MONITOR_BACKEND=git): его fetch не должен
+    # менять origin/* посреди слияния
+    with REPO_LOCK:
+        try:
+            # 1. Fetch
+            print("[Git] Fetching origin...")
+            fetch_result = git_fetch()
+            if fetch_result.returncode != 0:
+                return {"success": False, "message": f"Fetch failed: {fetch_result.stderr}"}
+
+            # 2. Checkout main и pull
+            print("[Git] Checkout main...")
+            checkout_result = git_checkout("main")
+            if checkout_result.returncode != 0:
+                return {"success": False, "message": f"Checkout main failed: {checkout_result.stderr}"}
+
+            pull_result = git_pull()
+            if pull_result.returncode != 0:
+                return {"success": False, "message": f"Pull failed: {pull_result.stderr}"}
+
+            # 3. Merge glossary (первым, обычно без конфликтов)
+            print(f"[Git] Merging glossary: {glossary_branch}...")
+            glossary_result = git_merge(glossary_branch, f"Merge {glossary_branch}")
             if glossary_result.returncode != 0:
-                return {"success": False, "message": f"Merge glossary failed: {glossary_result.stderr}"}
-        results.append(f"✅ Glossary merged")
-
-        # 4. Merge tests с -X theirs (автоматическое разрешение конфликтов)
-        print(f"[Git] Merging tests: {tests_branch}...")
-        tests_result = git_merge_theirs(tests_branch)
-        if tests_result.returncode != 0:
-            return {"success": False, "message": f"Merge tests failed: {tests_result.stderr}"}
-        results.append(f"✅ Tests merged")
-
-        # 5. Push
-        print("[Git] Pushing to origin...")
-        push_result = git_push()
-        if push_result.returncode != 0:
-            return {"success": False, "message": f"Push failed: {push_result.stderr}"}
-        results.append(f"✅ Pushed to main")
-
-        # 6. Удалить ветки
-        print("[Git] Deleting branches...")
-        git_delete_branch_remote(glossary_branch)
-        git_delete_branch_remote(tests_branch)
-        results.append(f"✅ Branches deleted")
-
-        return {"success": True, "message": "\n".join(results)}
-
-    except Exception as e:
-        return {"success": False, "message": f"Error: {str(e)}"}
\ No newline at end of file
+                # Попробуем с -X theirs
+                glossary_result = git_merge_theirs(glossary_branch)
+                if glossary_result.returncode != 0:
+                    return {"success": False, "message": f"Merge glossary failed: {glossary_result.stderr}"}
+            results.append(f"✅ Glossary merged")
+
+            # 4. Merge tests с -X theirs (автоматическое разрешение конфликтов)
+            print(f"[Git] Merging tests: {tests_branch}...")
+            tests_result = git_merge_theirs(tests_branch)
+            if tests_result.returncode != 0:
+                return {"success": False, "message": f"Merge tests failed: {tests_result.stderr}"}
+            results.append(f"✅ Tests merged")
+
+            # 5. Push
+            print("[Git] Pushing to origin...")
+            push_result = git_push()
+            if push_result.returncode != 0:
+                return {"success": False, "message": f"Push failed: {push_result.stderr}"}
+            results.append(f"✅ Pushed to main")
+
+            # 6. Удалить ветки
+            print("[Git] Deleting branches...")
+            git_delete_branch_remote(glossary_branch)
+            git_delete_branch_remote(tests_branch)
+            results.append(f"✅ Branches deleted")
+
+            return {"success": True, "message": "\n".join(results)}
+
+        except Exception as e:
+            return {"success": False, "message": f"Error: {str(e)}"}
\ No newline at end of file
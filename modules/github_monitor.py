@@ -1,111 +1,420 @@
+import json
 import os
 import re
+import threading
+import time
 from datetime import datetime, timezone
-from github import Github
-from config import GITHUB_TOKEN
+from urllib.parse import quote
+import requests
+from github import Auth, BadCredentialsException, Github, GithubException
+from config import GITHUB_TOKEN, GITHUB_API_URL, GITHUB_MONITOR_MODE, GITHUB_REQUEST_SPACING
+from modules import commit_rules, rate_limit
 
 # Репозиторий для мониторинга
 REPO_NAME = "Svyatoyotec98/CFA-LVL-I-TRAINER"
 
+# Клиент живёт всё время работы бота: keep-alive соединения переиспользуются
+POOL_SIZE = 8                  # соединений в пуле (= параллельных проверок, modules/async_monitor.py)
+REQUEST_TIMEOUT_SECONDS = 15
+# Паузы PyGithub между запросами остаются по умолчанию; отключаются только
+# GITHUB_REQUEST_SPACING=false (fake-сервер нагрузочных тестов)
+
+# Режим "snapshot": один постраничный GraphQL-запрос за цикл отдаёт все ветки
+# claude/* с их последним коммитом, проверки по веткам отвечаются из снимка
+SNAPSHOT_MAX_AGE_SECONDS = 60  # старше — снимок перезапрашивается
+SNAPSHOT_PAGE_SIZE = 100
+
+_SNAPSHOT_QUERY = """
+query($owner: String!, $name: String!, $cursor: String, $pageSize: Int!) {
+  repository(owner: $owner, name: $name) {
+    refs(refPrefix: "refs/heads/claude/", first: $pageSize, after: $cursor) {
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        name
+        target { ... on Commit { oid message author { date } } }
+      }
+    }
+  }
+}
+"""
+
+# Кэш ответов REST: запросы уходят с If-None-Match / If-Modified-Since,
+# ответ 304 отдаётся из кэша и не расходует лимит запросов GitHub
+CACHE_MAX_ENTRIES = 500
+PAGE_SIZE = 100
+
+# Чтение коммитов: только коммиты самой ветки (сравнение с BASE_BRANCH),
+# без истории основной ветки под ней
+BASE_BRANCH = "main"
+COMMIT_PAGE_SIZE = 30   # если сравнение недоступно — коммиты читаются страницами
+MAX_COMMIT_PAGES = 3    # и не глубже этого
+
+_client = None
+_repo = None
+_client_lock = threading.Lock()
+_snapshot = {"time": 0, "branches": None}  # branch -> {"sha", "message", "time"}
+_snapshot_lock = threading.RLock()  # параллельные проверки не обновляют снимок одновременно
+
+_http_cache = {}  # (url, параметры) -> {"etag", "last_modified", "data"}, в порядке использования
+_cache_lock = threading.Lock()
+_cache_stats = {"hits": 0, "misses": 0}
+
+_last_seen_sha = {}  # branch -> SHA последнего прочитанного коммита (read_new_commits)
+
 def _get_github_client():
-    """Получить клиент GitHub API"""
-    if not GITHUB_TOKEN:
-        raise ValueError("GITHUB_TOKEN not found in environment variables")
-    return Github(GITHUB_TOKEN)
+    """Получить клиент GitHub API (создаётся один раз, при первом обращении)"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            if not GITHUB_TOKEN:
+                raise ValueError("GITHUB_TOKEN not found in environment variables")
+            spacing = {} if GITHUB_REQUEST_SPACING else {
+                "seconds_between_requests": None,
+                "seconds_between_writes": None,
+            }
+            _client = Github(
+                base_url=GITHUB_API_URL,
+                auth=Auth.Token(GITHUB_TOKEN),
+                pool_size=POOL_SIZE,
+                timeout=REQUEST_TIMEOUT_SECONDS,
+                **spacing
+            )
+            print("[GitHubMonitor] GitHub client created")
+        return _client
 
 def _get_repo():
-    """Получить репозиторий"""
+    """
+    Получить репозиторий.
+    lazy=True — без запроса GET /repos/...: ссылка нужна только для построения URL.
+    """
+    global _repo
     client = _get_github_client()
-    return client.get_repo(REPO_NAME)
+    with _client_lock:
+        if _repo is None:
+            _repo = client.get_repo(REPO_NAME, lazy=True)
+        return _repo
+
+def reset_client():
+    """Забыть клиент и репозиторий — следующий вызов создаст их заново"""
+    global _client, _repo
+    with _client_lock:
+        _client = None
+        _repo = None
+
+def _reset_on_error(error):
+    """После ошибки авторизации или сети клиент пересоздаётся при следующем вызове"""
+    auth_error = isinstance(error, BadCredentialsException) or \
+        (isinstance(error, GithubException) and error.status == 401)
+    if auth_error or isinstance(error, requests.exceptions.RequestException):
+        print(f"[GitHubMonitor] Resetting GitHub client after {type(error).__name__}")
+        reset_client()
+
+def _cached_get(url, parameters=None):
+    """
+    GET-запрос к REST API через кэш условных запросов.
+
+    Args:
+        url: путь API (например, /repos/owner/name/branches)
+        parameters: query-параметры
+
+    Returns:
+        разобранный JSON ответа
+    """
+    key = (url, tuple(sorted((parameters or {}).items())))
+    with _cache_lock:
+        entry = _http_cache.get(key)
+
+    headers = {}
+    if entry and entry["etag"]:
+        headers["If-None-Match"] = entry["etag"]
+    if entry and entry["last_modified"]:
+        headers["If-Modified-Since"] = entry["last_modified"]
+
+    rate_limit.check("core")
+    status, response_headers, body = _get_repo()._requester.requestJson(
+        "GET", url, parameters=parameters, headers=headers
+    )
+    rate_limit.record(response_headers, counted=status != 304)
+
+    with _cache_lock:
+        if status == 304 and entry:
+            _cache_stats["hits"] += 1
+            _http_cache[key] = _http_cache.pop(key, entry)  # свежие записи — в конец
+            return entry["data"]
+
+        _cache_stats["misses"] += 1
+        data = json.loads(body) if body else None
+        if status >= 400:
+            raise GithubException(status, data, response_headers)
+
+        etag = response_headers.get("etag")
+        last_modified = response_headers.get("last-modified")
+        if etag or last_modified:
+            _http_cache.pop(key, None)
+            _http_cache[key] = {"etag": etag, "last_modified": last_modified, "data": data}
+            while len(_http_cache) > CACHE_MAX_ENTRIES:
+                del _http_cache[next(iter(_http_cache))]
+        return data
+
+def _cached_get_all(url, parameters=None):
+    """Все страницы списка (каждая страница кэшируется отдельно)"""
+    items = []
+    page = 1
+    while True:
+        data = _cached_get(url, {**(parameters or {}), "per_page": PAGE_SIZE, "page": page})
+        items += data
+        if len(data) < PAGE_SIZE:
+            return items
+        page += 1
+
+def get_cache_stats():
+    """
+    Статистика кэша условных запросов
+
+    Returns:
+        dict: {"hits": ответов 304 из кэша, "misses": полных ответов, "entries": записей в кэше}
+    """
+    with _cache_lock:
+        return {**_cache_stats, "entries": len(_http_cache)}
+
+def _parse_date(value):
+    """ISO-время GitHub ("2026-01-21T16:52:16Z") в aware datetime"""
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+def refresh_snapshot():
+    """
+    Запросить снимок всех веток claude/* одним GraphQL-запросом (с пагинацией).
+    Если ни одна ветка не изменилась, GraphQL не вызывается.
+
+    Returns:
+        dict: {ветка: {"sha", "message", "time"}}
+    """
+    with _snapshot_lock:
+        # Дешёвая проверка: список ссылок claude/* с ETag. Ответ 304 — ни одна
+        # ветка не появилась, не исчезла и не сдвинулась, старый снимок актуален
+        matching = _cached_get(f"/repos/{REPO_NAME}/git/matching-refs/heads/claude/")
+        heads = {ref["ref"].removeprefix("refs/heads/"): ref["object"]["sha"] for ref in matching}
+        branches = _snapshot["branches"]
+        if branches is not None and heads == {branch: head["sha"] for branch, head in branches.items()}:
+            _snapshot["time"] = time.time()
+            return branches
+
+        owner, name = REPO_NAME.split("/")
+        requester = _get_repo()._requester
+        branches = {}
+        cursor = None
+
+        while True:
+            rate_limit.check("graphql")
+            response_headers, data = requester.requestJsonAndCheck("POST", "/graphql", input={
+                "query": _SNAPSHOT_QUERY,
+                "variables": {"owner": owner, "name": name, "cursor": cursor, "pageSize": SNAPSHOT_PAGE_SIZE}
+            })
+            rate_limit.record(response_headers)
+            if data.get("errors"):
+                raise GithubException(200, data["errors"], None)
+
+            refs = data["data"]["repository"]["refs"]
+            for node in refs["nodes"]:
+                commit = node["target"]
+                branches["claude/" + node["name"]] = {
+                    "sha": commit["oid"],
+                    "message": commit["message"],
+                    "time": _parse_date(commit["author"]["date"])
+                }
+
+            if not refs["pageInfo"]["hasNextPage"]:
+                break
+            cursor = refs["pageInfo"]["endCursor"]
+
+        _snapshot["time"] = time.time()
+        _snapshot["branches"] = branches
+        _prune_last_seen(branches)
+        print(f"[GitHubMonitor] Snapshot: {len(branches)} Claude branches")
+        return branches
+
+def _snapshot_branches():
+    """Ветки из снимка (перезапрашивается, если устарел)"""
+    with _snapshot_lock:
+        if _snapshot["branches"] is None or time.time() - _snapshot["time"] > SNAPSHOT_MAX_AGE_SECONDS:
+            refresh_snapshot()
+        return _snapshot["branches"]
 
 def get_claude_branches():
     """
-    Получить список веток Claude (claude/*)
+    Получить список веток Claude (claude/*).
+    В режиме snapshot заодно обновляет снимок для проверок этого цикла.
 
     Returns:
         list: список названий веток, начинающихся с 'claude/'
     """
+    if GITHUB_MONITOR_MODE == "snapshot":
+        try:
+            return list(refresh_snapshot())
+        except Exception as e:
+            _reset_on_error(e)
+            print(f"[GitHubMonitor] Error getting branch snapshot: {e}")
+            return []
+
     try:
-        repo = _get_repo()
-        branches = repo.get_branches()
+        branches = _cached_get_all(f"/repos/{REPO_NAME}/branches")
 
         claude_branches = [
-            branch.name for branch in branches
-            if branch.name.startswith("claude/")
+            branch["name"] for branch in branches
+            if branch["name"].startswith("claude/")
         ]
+        _prune_last_seen(claude_branches)
 
         print(f"[GitHubMonitor] Found {len(claude_branches)} Claude branches")
         return claude_branches
 
     except Exception as e:
+        _reset_on_error(e)
         print(f"[GitHubMonitor] Error getting branches: {e}")
         return []
 
-def get_branch_commits(branch_name):
+def _commit_dict(commit):
+    """Коммит из ответа REST API в dict {sha, message, date}"""
+    return {
+        "sha": commit["sha"],
+        "message": commit["commit"]["message"],
+        "date": _parse_date(commit["commit"]["author"]["date"]).strftime("%Y-%m-%d %H:%M:%S")
+    }
+
+def iter_branch_commits(branch_name, since_sha=None, head_sha=None):
     """
-    Получить список коммитов для ветки
+    Лениво перебрать коммиты ветки, новые первыми.
+
+    Один запрос compare {since_sha или BASE_BRANCH}...{ветка} отдаёт только
+    коммиты, которых нет в базе, поэтому цена не растёт с возрастом репозитория.
+    Если сравнение невозможно (база не найдена, слишком много коммитов) —
+    коммиты читаются страницами по COMMIT_PAGE_SIZE до since_sha,
+    не глубже MAX_COMMIT_PAGES страниц.
 
     Args:
         branch_name: название ветки
+        since_sha: вернуть только коммиты новее этого
+        head_sha: читать до этого коммита (по умолчанию — текущая голова ветки)
 
-    Returns:
-        list: список коммитов (dict с полями: sha, message, date)
+    Yields:
+        dict: коммит {sha, message, date}
     """
+    head = head_sha or quote(branch_name)
     try:
-        repo = _get_repo()
-        commits = repo.get_commits(sha=branch_name)
-
-        commit_list = []
+        data = _cached_get(f"/repos/{REPO_NAME}/compare/{since_sha or quote(BASE_BRANCH)}...{head}")
+    except GithubException as e:
+        if e.status != 404:
+            raise
+        data = None
+
+    if data is not None and data["total_commits"] == len(data["commits"]):
+        for commit in reversed(data["commits"]):
+            yield _commit_dict(commit)
+        return
+
+    for page in range(1, MAX_COMMIT_PAGES + 1):
+        commits = _cached_get(f"/repos/{REPO_NAME}/commits",
+                              {"sha": head_sha or branch_name, "per_page": COMMIT_PAGE_SIZE, "page": page})
         for commit in commits:
-            commit_list.append({
-                "sha": commit.sha,
-                "message": commit.commit.message,
-                "date": commit.commit.author.date.strftime("%Y-%m-%d %H:%M:%S")
-            })
+            if commit["sha"] == since_sha:
+                return
+            yield _commit_dict(commit)
+        if len(commits) < COMMIT_PAGE_SIZE:
+            return
+
+def read_new_commits(branch_name, head_sha=None):
+    """
+    Коммиты, появившиеся в ветке с прошлого вызова (новые первыми).
+    Первый вызов для ветки только запоминает её голову и ничего не возвращает.
+
+    Args:
+        branch_name: название ветки
+        head_sha: текущая голова, если уже известна (например, из снимка) —
+                  тогда без изменений в ветке запросов к API нет совсем
+
+    Yields:
+        dict: коммит {sha, message, date}
+    """
+    if head_sha is None:
+        head = get_branch_head(branch_name)
+        if not head:
+            return
+        head_sha = head["sha"]
+
+    last_seen = _last_seen_sha.get(branch_name)
+    _last_seen_sha[branch_name] = head_sha
+    if last_seen is None or last_seen == head_sha:
+        return
 
-        print(f"[GitHubMonitor] Found {len(commit_list)} commits in branch {branch_name}")
-        return commit_list
+    yield from iter_branch_commits(branch_name, since_sha=last_seen, head_sha=head_sha)
 
+def note_branch_head(branch_name, head):
+    """
+    Запомнить голову ветки, известную без опроса (из webhook push):
+    снимок и read_new_commits не вернут уже обработанные коммиты повторно.
+
+    Args:
+        branch_name: название ветки
+        head: {"sha", "message", "time"}
+    """
+    _last_seen_sha[branch_name] = head["sha"]
+    if _snapshot["branches"] is not None:
+        _snapshot["branches"][branch_name] = head
+
+def _prune_last_seen(branches):
+    """Забыть прочитанные головы веток, которых больше нет"""
+    for branch in set(_last_seen_sha).difference(branches):
+        del _last_seen_sha[branch]
+
+def known_head_sha(branch_name):
+    """SHA головы ветки из последнего снимка — без запроса к API (None, если неизвестна)"""
+    branches = _snapshot["branches"]
+    head = branches.get(branch_name) if branches else None
+    return head["sha"] if head else None
+
+def forget_branch(branch_name):
+    """Ветка удалена (webhook delete) — убрать её из снимка и истории чтения"""
+    _last_seen_sha.pop(branch_name, None)
+    if _snapshot["branches"] is not None:
+        _snapshot["branches"].pop(branch_name, None)
+
+def _iter_commits_logged(branch_name):
+    """iter_branch_commits с логированием ошибок вместо исключения"""
+    try:
+        yield from iter_branch_commits(branch_name)
     except Exception as e:
+        _reset_on_error(e)
         print(f"[GitHubMonitor] Error getting commits for {branch_name}: {e}")
-        return []
 
-def parse_commit_message(message):
+def get_branch_commits(branch_name):
     """
-    Парсить сообщение коммита для определения типа события
-
-    Паттерны:
-    - "checkpoint 1", "checkpoint 2" -> checkpoint
-    - "complete" в сообщении -> complete
+    Получить список коммитов ветки (только её собственные, без истории BASE_BRANCH)
 
     Args:
-        message: сообщение коммита
+        branch_name: название ветки
 
     Returns:
-        dict: {"type": "checkpoint/complete", "checkpoint_name": "...", "checkpoint_num": N}
-              или None если не распознано
+        list: список коммитов (dict с полями: sha, message, date)
     """
-    message_lower = message.lower()
+    commit_list = list(_iter_commits_logged(branch_name))
+    print(f"[GitHubMonitor] Found {len(commit_list)} commits in branch {branch_name}")
+    return commit_list
 
-    # Проверка на complete
-    if "complete" in message_lower:
-        return {
-            "type": "complete",
-            "checkpoint_name": None,
-            "checkpoint_num": None
-        }
+def parse_commit_message(message, sha=None):
+    """
+    Определить тип события коммита по правилам COMMIT_RULES
+    (см. modules/commit_rules.py)
 
-    # Проверка на checkpoint
-    checkpoint_match = re.search(r'checkpoint\s+(\d+)', message_lower)
-    if checkpoint_match:
-        checkpoint_num = int(checkpoint_match.group(1))
-        return {
-            "type": "checkpoint",
-            "checkpoint_name": f"checkpoint {checkpoint_num}",
-            "checkpoint_num": checkpoint_num
-        }
+    Args:
+        message: сообщение коммита
+        sha: SHA коммита — повторная проверка того же коммита берётся из кэша
 
-    return None
+    Returns:
+        dict: {"type": "checkpoint/complete/failure/...", "match": "...",
+               "checkpoint_name": "...", "checkpoint_num": N}
+              или None если не распознано
+    """
+    return commit_rules.classify(message, sha)
 
 def get_latest_branch_event(branch_name):
     """
@@ -118,10 +427,9 @@ def get_latest_branch_event(branch_name):
         dict: {"type": "checkpoint/complete", "checkpoint_name": "...", "date": "..."}
               или None если событий нет
     """
-    commits = get_branch_commits(branch_name)
-
-    for commit in commits:
-        event = parse_commit_message(commit["message"])
+    # Генератор: чтение останавливается на первом найденном событии
+    for commit in _iter_commits_logged(branch_name):
+        event = parse_commit_message(commit["message"], commit["sha"])
         if event:
             event["date"] = commit["date"]
             return event
@@ -138,11 +446,10 @@ def get_all_branch_checkpoints(branch_name):
     Returns:
         list: список checkpoint'ов [{"name": "checkpoint 1", "date": "..."}]
     """
-    commits = get_branch_commits(branch_name)
     checkpoints = []
 
-    for commit in commits:
-        event = parse_commit_message(commit["message"])
+    for commit in _iter_commits_logged(branch_name):
+        event = parse_commit_message(commit["message"], commit["sha"])
         if event and event["type"] == "checkpoint":
             checkpoints.append({
                 "name": event["checkpoint_name"],
@@ -153,41 +460,67 @@ def get_all_branch_checkpoints(branch_name):
     checkpoints.sort(key=lambda x: int(re.search(r'\d+', x["name"]).group()))
     return checkpoints
 
+def get_branch_head(branch_name):
+    """
+    Последний коммит ветки.
+    В режиме snapshot — из снимка без запроса к API (ветки, появившейся
+    после снимка, в нём нет — тогда обычный REST-запрос).
+
+    Args:
+        branch_name: название ветки
+
+    Returns:
+        dict: {"sha", "message", "time"} (time — aware datetime) или None
+    """
+    try:
+        if GITHUB_MONITOR_MODE == "snapshot":
+            head = _snapshot_branches().get(branch_name)
+            if head:
+                return head
+
+        commit = _cached_get(f"/repos/{REPO_NAME}/branches/{quote(branch_name)}")["commit"]
+        return {
+            "sha": commit["sha"],
+            "message": commit["commit"]["message"],
+            "time": _parse_date(commit["commit"]["author"]["date"])
+        }
+    except Exception as e:
+        _reset_on_error(e)
+        print(f"[GitHubMonitor] Error getting head of {branch_name}: {e}")
+        return None
+
+def find_completion_pattern(message, sha=None):
+    """
+    Найти в сообщении коммита признак завершения задачи (правило "complete")
+
+    Returns:
+        str: совпавший текст или None
+    """
+    event = parse_commit_message(message, sha)
+    if event and event["type"] == "complete":
+        return event["match"]
+    return None
+
 def check_branch_completed(branch_name):
     """
     Проверить завершена ли задача в ветке.
-    Проверяем ТОЛЬКО ПОСЛЕДНИЙ коммит на наличие паттернов завершения:
-    - "complete"
-    - "готов"
-    - "checkpoint 2" или выше
-    - "finished"
-    - "done"
+    Проверяем ТОЛЬКО ПОСЛЕДНИЙ коммит (правило "complete" из COMMIT_RULES).
     """
     try:
-        repo = _get_repo()
-        branch = repo.get_branch(branch_name)
-        last_commit = branch.commit
+        head = get_branch_head(branch_name)
+        if not head:
+            return False
 
         # Проверяем ТОЛЬКО последний коммит
-        message = last_commit.commit.message.lower()
-
-        # Паттерны завершения
-        completion_patterns = [
-            "complete",
-            "готов",
-            "finished",
-            "done"
-        ]
-
-        # Проверка базовых паттернов
-        for pattern in completion_patterns:
-            if pattern in message:
-                print(f"[GitHubMonitor] Branch {branch_name} is COMPLETED (found '{pattern}' in last commit)")
-                return True
+        pattern = find_completion_pattern(head["message"], head["sha"])
+        if pattern:
+            print(f"[GitHubMonitor] Branch {branch_name} is COMPLETED (found '{pattern}' in last commit)")
+            return True
 
         return False
 
     except Exception as e:
+        _reset_on_error(e)
         print(f"[GitHubMonitor] Error checking branch {branch_name}: {e}")
         return False
 
@@ -196,12 +529,12 @@ def get_last_commit_info(branch_name):
     Получить информацию о последнем коммите ветки.
     """
     try:
-        repo = _get_repo()
-        branch = repo.get_branch(branch_name)
-        commit = branch.commit
+        head = get_branch_head(branch_name)
+        if not head:
+            return None
 
         # Время коммита (aware datetime)
-        commit_time = commit.commit.author.date
+        commit_time = head["time"]
 
         # Текущее время тоже делаем aware (UTC)
         now = datetime.now(timezone.utc)
@@ -210,62 +543,107 @@ def get_last_commit_info(branch_name):
         minutes_ago = int((now - commit_time).total_seconds() / 60)
 
         return {
-            "message": commit.commit.message,
+            "message": head["message"],
             "time": commit_time,
             "minutes_ago": minutes_ago
         }
     except Exception as e:
+        _reset_on_error(e)
         print(f"[GitHubMonitor] Error getting last commit for {branch_name}: {e}")
         return None
 
-def find_branch_for_task(task_type, book, module, branches):
+# claude/add-<book>-module-<n>-<type>-<suffix>: книга — первое слово названия
+# (лишние слова допускаются), тип glossary/glossar или tests/test/qbank
+_BRANCH_RE = re.compile(
+    r"^claude/add-(?P<book>[a-z0-9]+)(?:-[a-z0-9]+)*?-module-?(?P<module>\d+)"
+    r"-(?P<type>glossary|glossar|tests|test|qbank)(?:-.*)?$",
+    re.IGNORECASE
+)
+
+# Индекс веток: разбирается только новая ветка, поиск задачи — один lookup
+_branch_index = {
+    "source": None,  # список веток, по которому построен индекс
+    "keys": {},      # branch -> (book, module, type) или None, если имя не по формату
+    "by_key": {},    # (book, module, type) -> {branch: None}, в порядке появления
+}
+_branch_index_lock = threading.Lock()  # поиск веток идёт из потоков modules/async_monitor.py
+
+def branch_key(branch_name):
     """
-    Найти подходящую ветку для задачи по гибким паттернам.
+    Разобрать имя ветки задачи
+
+    Returns:
+        tuple: (книга — первое слово, модуль, "glossary"/"tests") или None
+    """
+    match = _BRANCH_RE.match(branch_name)
+    if not match:
+        return None
+    task_type = "glossary" if match["type"].lower().startswith("glossar") else "tests"
+    return match["book"].lower(), int(match["module"]), task_type
+
+def task_key(task_type, book, module):
+    """Ключ задачи в формате branch_key"""
+    first_word = book.lower().split()[0] if book else ""
+    return first_word, int(module), task_type
+
+def update_branch_index(branches):
+    """
+    Привести индекс к списку веток: разбираются только появившиеся ветки,
+    исчезнувшие удаляются
+    """
+    with _branch_index_lock:
+        keys = _branch_index["keys"]
+        by_key = _branch_index["by_key"]
+        current = set(branches)
+
+        for branch in [b for b in keys if b not in current]:
+            key = keys.pop(branch)
+            if key:
+                by_key[key].pop(branch, None)
+                if not by_key[key]:
+                    del by_key[key]
+
+        for branch in branches:
+            if branch not in keys:
+                key = keys[branch] = branch_key(branch)
+                if key:
+                    by_key.setdefault(key, {})[branch] = None
+
+        _branch_index["source"] = branches
+
+def find_branch_for_task(task_type, book, module, branches, get_head=None):
+    """
+    Найти ветку задачи по точному ключу (книга, модуль, тип).
+    Если подходящих веток несколько — берётся ветка с самым свежим
+    последним коммитом (в режиме snapshot даты берутся из снимка).
 
     Args:
         task_type: тип задачи ("glossary" или "tests")
         book: название книги (например, "Financial Reporting", "Quantitative Methods")
         module: номер модуля
         branches: список веток для поиска
+        get_head: функция ветка -> {"sha", "message", "time"} (по умолчанию get_branch_head)
 
     Returns:
         str: название найденной ветки или None
     """
-    # Извлекаем первое слово книги (например, "financial" из "Financial Reporting")
-    first_word = book.lower().split()[0] if book else ""
-
-    module_str = str(module)
-
-    for branch in branches:
-        branch_lower = branch.lower()
-
-        # Проверка первого слова книги (например, "financial", "quantitative")
-        book_match = first_word in branch_lower if first_word else False
-
-        # Проверка номера модуля в разных форматах:
-        # - module-5
-        # - module5
-        # - -5-
-        # - заканчивается на -5
-        module_match = (
-            f"module-{module_str}" in branch_lower or
-            f"module{module_str}" in branch_lower or
-            f"-{module_str}-" in branch_lower or
-            branch_lower.endswith(f"-{module_str}")
-        )
-
-        # Проверка типа задачи
-        if task_type == "glossary":
-            # Ищем "glossary" или "glossar" (без y)
-            type_match = "glossar" in branch_lower
-        else:  # tests
-            # Ищем "test" или "qbank"
-            type_match = "test" in branch_lower or "qbank" in branch_lower
-
-        # Если все совпало - возвращаем ветку
-        if book_match and module_match and type_match:
-            print(f"[GitHubMonitor] Found branch for {book} Module {module} {task_type}: {branch}")
-            return branch
+    # Один и тот же список для всех задач цикла — индекс обновляется один раз
+    with _branch_index_lock:
+        outdated = branches is not _branch_index["source"]
+    if outdated:
+        update_branch_index(branches)
+
+    with _branch_index_lock:
+        candidates = list(_branch_index["by_key"].get(task_key(task_type, book, module), ()))
+    if candidates:
+        branch = candidates[0]
+        if len(candidates) > 1:
+            heads = {candidate: (get_head or get_branch_head)(candidate) for candidate in candidates}
+            dated = [candidate for candidate in candidates if heads[candidate]]
+            if dated:
+                branch = max(dated, key=lambda candidate: heads[candidate]["time"])
+        print(f"[GitHubMonitor] Found branch for {book} Module {module} {task_type}: {branch}")
+        return branch
 
     print(f"[GitHubMonitor] No branch found for {book} Module {module} {task_type}")
     return None
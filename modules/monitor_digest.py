@@ -0,0 +1,115 @@
+"""
+Сводка уведомлений фонового монитора (DIGEST_ENABLED в config.py)
+
+События копятся в течение DIGEST_WINDOW_SECONDS и уходят одним сообщением,
+сгруппированным по книгам и модулям. Если сводка не помещается в одно
+сообщение Telegram, она делится на несколько по модулям, а длинный
+раздел модуля — по строкам (заголовок модуля повторяется).
+"""
+
+import time
+
+MAX_MESSAGE_LENGTH = 4000  # лимит Telegram — 4096 символов
+
+_modules = {}     # (книга, модуль) -> [строки событий], в порядке поступления
+_branches = []    # новые ветки без задачи
+_state = {"since": None, "events": 0}
+
+
+def add(book, module, line):
+    """
+    Добавить событие модуля в сводку
+
+    Args:
+        book: название книги
+        module: номер модуля
+        line: строка события (например, "📖 Глоссарий: 🎯 Checkpoint Terms")
+    """
+    _modules.setdefault((book, module), []).append(line)
+    _touch()
+
+
+def add_branch(branch):
+    """Добавить в сводку новую ветку, ещё не привязанную к задаче"""
+    if branch not in _branches:
+        _branches.append(branch)
+        _touch()
+
+
+def _touch():
+    if _state["since"] is None:
+        _state["since"] = time.time()
+    _state["events"] += 1
+
+
+def is_empty():
+    return not _modules and not _branches
+
+
+def take_messages():
+    """
+    Забрать накопленные события и очистить сводку
+
+    Returns:
+        list: тексты сообщений (Markdown); пустой список — событий не было
+    """
+    if is_empty():
+        return []
+
+    minutes = max(1, round((time.time() - _state["since"]) / 60))
+    header = f"🗞 *Сводка за {minutes} мин* (событий: {_state['events']})"
+
+    sections = []
+    for (book, module), lines in sorted(_modules.items()):
+        sections.append(f"📚 *{book} Module {module}*\n" + "\n".join(lines))
+    if _branches:
+        sections.append("🌿 *Новые ветки*\n" + "\n".join(
+            f"`{branch.replace('claude/', '')}`" for branch in _branches
+        ))
+
+    _modules.clear()
+    _branches.clear()
+    _state.update(since=None, events=0)
+
+    messages = [header]
+    for section in sections:
+        for part in _split_section(section):
+            if len(messages[-1]) + len(part) + 2 > MAX_MESSAGE_LENGTH:
+                messages.append(part)
+            else:
+                messages[-1] += "\n\n" + part
+    return messages
+
+
+def _split_section(section):
+    """
+    Разделить раздел на части не длиннее MAX_MESSAGE_LENGTH по границам строк
+    (разметка строки не разрезается); каждая часть начинается с заголовка раздела
+    """
+    if len(section) <= MAX_MESSAGE_LENGTH:
+        return [section]
+
+    title, *lines = section.split("\n")
+    parts = []
+    part = title
+    for line in lines:
+        if len(part) + len(line) + 1 > MAX_MESSAGE_LENGTH and part != title:
+            parts.append(part)
+            part = title
+        # Строка длиннее сообщения (не бывает при обычных событиях) режется как есть
+        while len(title) + len(line) + 1 > MAX_MESSAGE_LENGTH:
+            cut = MAX_MESSAGE_LENGTH - len(title) - 1
+            parts.append(f"{title}\n{line[:cut]}")
+            line = line[cut:]
+        part += "\n" + line
+    parts.append(part)
+    return parts
+
+
+def get_stats():
+    """
+    Returns:
+        dict: {"events": накоплено событий, "modules": модулей в сводке,
+               "since": время первого события или None}
+    """
+    return {"events": _state["events"], "modules": len(_modules), "since": _state["since"]}
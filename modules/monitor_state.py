@@ -0,0 +1,131 @@
+"""
+Состояние уведомлений фонового монитора, переживающее перезапуск бота
+
+- отправленные уведомления (ключи вида "<task_id>_completed"), чтобы не слать их повторно;
+- известные ветки claude/*, чтобы после перезапуска заметить ветки, появившиеся без бота.
+
+Записи ограничены: не больше MAX_ENTRIES (вытесняются давно не использованные),
+не старше ENTRY_TTL_SECONDS, а записи задачи удаляются, когда она уходит
+из активных (merge, удаление). Снимок пишется в STATE_FILE.
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+
+STATE_FILE = "data/monitor_state.json"
+MAX_ENTRIES = 5000
+ENTRY_TTL_SECONDS = 14 * 24 * 3600
+
+_notified = {}          # ключ -> {"task": task_id, "time": отправлено}, давно использованные — первыми
+_known_branches = set()
+_state = {"loaded": False, "dirty": False}
+
+
+def load():
+    """Прочитать снимок (вызывается автоматически при первом обращении)"""
+    _state["loaded"] = True
+    path = Path(STATE_FILE)
+    if not path.exists():
+        return
+
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError) as e:
+        print(f"[MonitorState] Failed to read {STATE_FILE}: {e}")
+        return
+
+    now = time.time()
+    _notified.clear()
+    for key, entry in data.get("notified", {}).items():
+        if now - entry["time"] < ENTRY_TTL_SECONDS:
+            _notified[key] = entry
+    _known_branches.clear()
+    _known_branches.update(data.get("known_branches", []))
+    print(f"[MonitorState] Loaded {len(_notified)} notifications, {len(_known_branches)} known branches")
+
+
+def _ensure_loaded():
+    if not _state["loaded"]:
+        load()
+
+
+def save():
+    """Записать снимок, если что-то изменилось (атомарно: через временный файл)"""
+    if not _state["dirty"]:
+        return
+    path = Path(STATE_FILE)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps({
+        "notified": _notified,
+        "known_branches": sorted(_known_branches),
+        "saved": time.time(),
+    }, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, path)
+    _state["dirty"] = False
+
+
+def is_notified(key):
+    """Было ли уже уведомление с этим ключом"""
+    _ensure_loaded()
+    entry = _notified.pop(key, None)
+    if entry is None:
+        return False
+    if time.time() - entry["time"] >= ENTRY_TTL_SECONDS:
+        _state["dirty"] = True
+        return False
+    _notified[key] = entry  # недавно использованные — в конец
+    return True
+
+
+def mark_notified(key, task_id=None):
+    """
+    Запомнить отправленное уведомление
+
+    Args:
+        key: ключ уведомления
+        task_id: задача — её записи удалятся вместе с ней (retain_tasks)
+    """
+    _ensure_loaded()
+    _notified.pop(key, None)
+    _notified[key] = {"task": task_id, "time": time.time()}
+    while len(_notified) > MAX_ENTRIES:
+        del _notified[next(iter(_notified))]
+    _state["dirty"] = True
+
+
+def retain_tasks(task_ids):
+    """Удалить уведомления задач, которых нет среди task_ids (активных)"""
+    _ensure_loaded()
+    stale = [key for key, entry in _notified.items()
+             if entry["task"] is not None and entry["task"] not in task_ids]
+    for key in stale:
+        del _notified[key]
+    if stale:
+        _state["dirty"] = True
+
+
+def get_known_branches():
+    """Известные ветки (пустое множество — монитор ещё не видел список веток)"""
+    _ensure_loaded()
+    return set(_known_branches)
+
+
+def set_known_branches(branches):
+    _ensure_loaded()
+    branches = set(branches)
+    if branches != _known_branches:
+        _known_branches.clear()
+        _known_branches.update(branches)
+        _state["dirty"] = True
+
+
+def get_stats():
+    """
+    Returns:
+        dict: {"notifications": записей, "known_branches": веток}
+    """
+    _ensure_loaded()
+    return {"notifications": len(_notified), "known_branches": len(_known_branches)}
@@ -0,0 +1,174 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from enum import IntEnum
+
+
+class Priority(IntEnum):
+    """Кто расходует запросы к GitHub API (меньше — важнее)"""
+    MERGE = 0    # merge модуля по команде пользователя
+    STATUS = 1   # экран статуса / кнопка "Обновить"
+    MONITOR = 2  # фоновый мониторинг
+
+
+# Доля лимита, которую приоритет не может тратить — резерв для более важных
+RESERVE_SHARE = {
+    Priority.MERGE: 0.0,
+    Priority.STATUS: 0.05,
+    Priority.MONITOR: 0.15,
+}
+
+MAX_POLL_SECONDS = 900    # дольше фоновый опрос не растягивается
+COST_SMOOTHING = 0.3      # вес последнего цикла в средней цене цикла
+
+
+class RateLimitExceeded(Exception):
+    """Запрос не отправлен: для этого приоритета квота до сброса исчерпана"""
+
+
+_priority = contextvars.ContextVar("github_priority", default=Priority.MONITOR)
+_lock = threading.Lock()
+
+# resource ("core", "graphql") -> {"limit", "remaining", "reset", "updated"}
+_resources = {}
+# (priority, resource) -> отправлено запросов (ответы 304 не считаются)
+_spent = {}
+# Цена цикла мониторинга: resource -> {"mark": _spent на начало цикла, "cost": среднее}
+_cycle = {}
+_poll = {"interval": None}
+
+
+@contextmanager
+def caller(priority):
+    """
+    Пометить запросы внутри блока приоритетом (по умолчанию — MONITOR).
+
+    Пример:
+        with rate_limit.caller(rate_limit.Priority.STATUS):
+            github_monitor.get_claude_branches()
+    """
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def _reserve(state, priority):
+    return int(state["limit"] * RESERVE_SHARE[priority])
+
+
+def check(resource="core"):
+    """
+    Проверить перед запросом, что текущему приоритету хватает квоты.
+
+    Raises:
+        RateLimitExceeded: квота ниже резерва более важных вызовов
+    """
+    priority = _priority.get()
+    with _lock:
+        state = _resources.get(resource)
+        if not state or time.time() >= state["reset"]:
+            return  # ещё не знаем лимит или он уже сброшен
+        if state["remaining"] <= _reserve(state, priority):
+            reset_at = time.strftime("%H:%M", time.localtime(state["reset"]))
+            raise RateLimitExceeded(
+                f"{resource} quota {state['remaining']}/{state['limit']} is reserved, "
+                f"{priority.name} waits until {reset_at}"
+            )
+
+
+def record(headers, counted=True):
+    """
+    Учесть ответ GitHub: запомнить X-RateLimit-* и кто потратил запрос.
+
+    Args:
+        headers: заголовки ответа (ключи в нижнем регистре, как отдаёт PyGithub)
+        counted: False для ответов 304 — они не расходуют квоту
+    """
+    if "x-ratelimit-remaining" not in headers:
+        return
+
+    resource = headers.get("x-ratelimit-resource", "core")
+    with _lock:
+        _resources[resource] = {
+            "limit": int(headers.get("x-ratelimit-limit", 0)),
+            "remaining": int(headers["x-ratelimit-remaining"]),
+            "reset": int(headers.get("x-ratelimit-reset", 0)),
+            "updated": time.time(),
+        }
+        if counted:
+            key = (_priority.get(), resource)
+            _spent[key] = _spent.get(key, 0) + 1
+
+
+def next_poll_interval(base_seconds):
+    """
+    Пауза до следующего цикла мониторинга.
+
+    Цена цикла (запросов MONITOR с прошлого вызова) сглаживается; пауза
+    растягивается так, чтобы квоты за вычетом резерва хватило до сброса,
+    и возвращается к base_seconds, когда квоты снова достаточно.
+
+    Args:
+        base_seconds: обычная пауза между циклами
+
+    Returns:
+        float: пауза в секундах
+    """
+    now = time.time()
+    interval = base_seconds
+
+    with _lock:
+        for resource, state in _resources.items():
+            spent = _spent.get((Priority.MONITOR, resource), 0)
+            cycle = _cycle.setdefault(resource, {"mark": spent, "cost": None})
+            cost = spent - cycle["mark"]
+            cycle["mark"] = spent
+            if cycle["cost"] is not None:
+                cost = COST_SMOOTHING * cost + (1 - COST_SMOOTHING) * cycle["cost"]
+            cycle["cost"] = cost
+
+            seconds_left = state["reset"] - now
+            if seconds_left <= 0 or cost <= 0:
+                continue
+
+            available = state["remaining"] - _reserve(state, Priority.MONITOR)
+            if available <= 0:
+                needed = seconds_left
+            else:
+                needed = seconds_left / (available / cost)
+            interval = max(interval, min(needed, MAX_POLL_SECONDS))
+
+        changed = _poll["interval"] is not None and round(interval) != round(_poll["interval"])
+        _poll["interval"] = interval
+
+    if changed:
+        print(f"[RateLimit] Monitor polling interval is now {interval:.0f}s")
+    return interval
+
+
+def get_state():
+    """
+    Текущее состояние квоты (для экрана статуса)
+
+    Returns:
+        dict: {
+            "resources": {resource: {"limit", "remaining", "reset"}},
+            "spent": {priority name: запросов},
+            "poll_interval": текущая пауза мониторинга или None
+        }
+    """
+    with _lock:
+        spent = {}
+        for (priority, _), count in _spent.items():
+            spent[priority.name] = spent.get(priority.name, 0) + count
+        return {
+            "resources": {
+                resource: {key: state[key] for key in ("limit", "remaining", "reset")}
+                for resource, state in _resources.items()
+            },
+            "spent": spent,
+            "poll_interval": _poll["interval"],
+        }
@@ -1,26 +1,846 @@
+import functools
+import gzip
 import json
+import os
+import sqlite3
+import threading
+import time
 import uuid
-from datetime import datetime
+from contextlib import ExitStack, contextmanager
+from dataclasses import asdict, dataclass, field, replace
+from datetime import date, datetime
+from enum import Enum
 from pathlib import Path
 
-TASKS_FILE = "data/tasks.json"
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+TASKS_FILE = "data/tasks.json"  # Старый формат — только для миграции
+DB_FILE = "data/tasks.db"
+ARCHIVE_DIR = "data/archive"  # Завершённые задачи: tasks-YYYY-MM.jsonl.gz по месяцам
+
+# Размер журнала (в страницах по 4 КБ), после которого он сворачивается в базу
+JOURNAL_COMPACT_PAGES = 1000
+
+# Несколько процессов (бот, отдельный монитор, CLI) могут писать одновременно
+BUSY_TIMEOUT_SECONDS = 10    # сколько ждать блокировку базы
+WRITE_RETRIES = 5            # повторы записи при конфликте версий
+RETRY_DELAY_SECONDS = 0.05   # базовая пауза между повторами
+
+# Каждые N событий журнала сохраняется снимок агрегатов (для запросов "на дату")
+SNAPSHOT_EVERY_EVENTS = 500
+
+# Версия формата записей:
+# 1 — время строками "2026-01-21 16:52:16"
+# 2 — время целым числом секунд (unix epoch)
+SCHEMA_VERSION = 2
+
+# Версия структуры базы (PRAGMA user_version):
+# 2 — время в INTEGER-колонках
+# 3 — версия строки (tasks.version) и ревизия хранилища (meta.revision)
+# 4 — запись завершённой задачи в archive_index (data) и отметка записи в раздел (flushed)
+DB_VERSION = 4
+
+_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id          TEXT PRIMARY KEY,
+    type             TEXT NOT NULL,
+    book             TEXT NOT NULL,
+    module           INTEGER NOT NULL,
+    module_id        TEXT,
+    branch           TEXT,
+    status           TEXT NOT NULL,
+    started_at       INTEGER,
+    branch_linked_at INTEGER,
+    completed_at     INTEGER,
+    version          INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_branch ON tasks(branch);
+CREATE INDEX IF NOT EXISTS idx_tasks_module_id ON tasks(module_id);
+CREATE INDEX IF NOT EXISTS idx_tasks_book_module ON tasks(book, module);
+CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status, completed_at);
+
+CREATE TABLE IF NOT EXISTS checkpoints (
+    id      INTEGER PRIMARY KEY AUTOINCREMENT,
+    task_id TEXT NOT NULL,
+    name    TEXT NOT NULL,
+    time    INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_checkpoints_task ON checkpoints(task_id);
+
+-- Завершённые задачи для поиска по ID/module_id: запись задачи (JSON) и раздел архива.
+-- flushed = 0 — запись ещё не дописана в раздел (дописывается после коммита)
+CREATE TABLE IF NOT EXISTS archive_index (
+    task_id      TEXT PRIMARY KEY,
+    module_id    TEXT,
+    completed_on TEXT NOT NULL,
+    partition    TEXT NOT NULL,
+    data         TEXT,
+    flushed      INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS idx_archive_module_id ON archive_index(module_id);
+
+-- revision увеличивается каждой транзакцией записи (любого процесса)
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('revision', 0);
+
+-- Журнал событий жизненного цикла задач (только дописывается)
+CREATE TABLE IF NOT EXISTS events (
+    id      INTEGER PRIMARY KEY AUTOINCREMENT,
+    task_id TEXT NOT NULL,
+    event   TEXT NOT NULL,
+    book    TEXT,
+    module  INTEGER,
+    type    TEXT,
+    time    INTEGER NOT NULL,
+    data    TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_events_task ON events(task_id);
+
+-- Агрегаты длительностей по книгам, обновляются в транзакции события
+CREATE TABLE IF NOT EXISTS rollups (
+    book          TEXT NOT NULL,
+    metric        TEXT NOT NULL,
+    count         INTEGER NOT NULL,
+    total_seconds INTEGER NOT NULL,
+    PRIMARY KEY (book, metric)
+);
+
+-- Снимок rollups после события event_id (каждые SNAPSHOT_EVERY_EVENTS событий)
+CREATE TABLE IF NOT EXISTS snapshots (
+    event_id INTEGER PRIMARY KEY,
+    time     INTEGER NOT NULL,
+    rollups  TEXT NOT NULL
+);
+"""
+
+class TaskStatus(str, Enum):
+    """Статус задачи (str — можно сравнивать и со строками)"""
+    IN_PROGRESS = "in_progress"
+    READY_TO_MERGE = "ready_to_merge"
+    COMPLETED = "completed"
+
+class EventType(str, Enum):
+    """Событие жизненного цикла задачи"""
+    CREATED = "created"
+    BRANCH_LINKED = "branch_linked"
+    CHECKPOINT = "checkpoint"
+    STATUS_CHANGED = "status_changed"
+    READY_TO_MERGE = "ready_to_merge"
+    MERGED = "merged"
+    REMOVED = "removed"
+
+@dataclass(slots=True, frozen=True)
+class Checkpoint:
+    """Контрольная точка задачи"""
+    name: str
+    time: int  # unix epoch, секунды
+
+@dataclass(slots=True)
+class Task:
+    """Задача (glossary/tests) одного модуля книги"""
+    task_id: str
+    type: str
+    book: str
+    module: int
+    module_id: str = None
+    branch: str = None
+    status: TaskStatus = TaskStatus.IN_PROGRESS
+    checkpoints: list = field(default_factory=list)
+    started_at: int = None        # unix epoch, секунды
+    branch_linked_at: int = None  # unix epoch, секунды
+    completed_at: int = None      # unix epoch, секунды
+    version: int = 1              # версия строки в базе (для compare-and-swap)
+    schema: int = SCHEMA_VERSION
+
+    def copy(self):
+        """Копия задачи (checkpoint'ы неизменяемые, копируется только список)"""
+        return replace(self, checkpoints=list(self.checkpoints))
+
+    def to_dict(self):
+        """Представление для JSON (архив)"""
+        data = asdict(self)
+        data["status"] = self.status.value
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        """Собрать задачу из dict любой версии формата (старые записи обновляются)"""
+        data = _upgrade_record(dict(data))
+        data["status"] = TaskStatus(data.get("status") or TaskStatus.IN_PROGRESS)
+        data["checkpoints"] = [Checkpoint(c["name"], c["time"]) for c in data.get("checkpoints", [])]
+        return cls(**{name: data[name] for name in cls.__dataclass_fields__ if name in data})
+
+@dataclass(slots=True, frozen=True)
+class TaskEvent:
+    """Запись журнала событий"""
+    id: int
+    task_id: str
+    event: EventType
+    time: int  # unix epoch, секунды
+    book: str
+    module: int
+    type: str
+    data: dict
+
+def _to_epoch(value):
+    """Время из формата версии 1 ("2026-01-21 16:52:16") в epoch"""
+    if value is None or isinstance(value, int):
+        return value
+    return int(datetime.strptime(value, _TIME_FORMAT).timestamp())
+
+def _upgrade_record(data):
+    """Привести dict задачи к текущей версии формата"""
+    if data.get("schema", 1) < 2:
+        for name in ("started_at", "branch_linked_at", "completed_at"):
+            data[name] = _to_epoch(data.get(name))
+        data["checkpoints"] = [
+            {"name": c["name"], "time": _to_epoch(c["time"])} for c in data.get("checkpoints", [])
+        ]
+    data["schema"] = SCHEMA_VERSION
+    return data
+
+class StorageConflict(Exception):
+    """Задачу изменил другой процесс — операцию нужно повторить"""
+
+class _FileLock:
+    """
+    Advisory-блокировка файла между процессами (fcntl / msvcrt).
+    Реентерабельная в пределах процесса.
+    """
+
+    def __init__(self):
+        self.file = None
+        self.depth = 0
+
+    def __enter__(self):
+        if self.depth == 0:
+            path = Path(DB_FILE + ".lock")
+            path.parent.mkdir(parents=True, exist_ok=True)
+            file = open(path, 'a+')
+            try:
+                if fcntl:
+                    fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+                else:
+                    file.seek(0)
+                    msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+            except BaseException:
+                file.close()
+                raise
+            self.file = file
+        self.depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self.depth -= 1
+        if self.depth == 0:
+            if fcntl:
+                fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+            else:
+                self.file.seek(0)
+                msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)
+            self.file.close()
+            self.file = None
+
+_conn = None
+_lock = threading.RLock()
+_file_lock = _FileLock()
+_write_depth = 0  # > 0 — идёт применение batch(), коммит откладывается
+_revision = None      # ревизия хранилища, которой соответствует индекс
+_data_version = None  # PRAGMA data_version — меняется после коммита другого процесса
+
+# Индекс активных задач в памяти процесса — чтение никогда не идёт на диск
+_tasks = {}           # task_id -> Task
+_active = {}          # task_id -> None, в порядке создания
+_by_branch = {}       # branch -> task_id
+_by_module_id = {}    # module_id -> {task_id: None}
+_by_book_module = {}  # (book, module) -> {task_id: None}
+
+_pending_archive = []  # Завершённые задачи, которые допишутся в разделы архива после коммита
+_today = {"day": None, "tasks": []}  # Кэш задач, завершённых сегодня
+
+def _now():
+    return int(time.time())
+
+def _get_conn():
+    """Открыть (один раз) соединение с базой, подготовить схему и загрузить индекс"""
+    global _conn
+    with _lock:
+        if _conn is None:
+            Path(DB_FILE).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(DB_FILE, timeout=BUSY_TIMEOUT_SECONDS, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            # WAL = журнал изменений: каждая мутация дописывает несколько страниц
+            # в конец tasks.db-wal (с fsync), а не переписывает весь файл.
+            # Когда журнал дорастает до JOURNAL_COMPACT_PAGES страниц,
+            # SQLite сам сворачивает его в основной файл (checkpoint).
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=FULL")
+            conn.execute(f"PRAGMA wal_autocheckpoint={JOURNAL_COMPACT_PAGES}")
+            with _file_lock:
+                _upgrade_schema(conn)
+                conn.execute("BEGIN")
+                _create_schema(conn)
+                conn.execute(f"PRAGMA user_version={DB_VERSION}")
+                conn.commit()
+                _conn = conn
+                _archive_completed_rows(conn)
+                _load_index(conn)
+                _flush_unflushed(conn)
+                migrate_from_json()
+        return _conn
+
+def _create_schema(conn):
+    """
+    Выполнить _SCHEMA по одному выражению: в отличие от executescript(),
+    execute() не коммитит открытую транзакцию
+    """
+    statement = ""
+    for line in _SCHEMA.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            conn.execute(statement)
+            statement = ""
+
+def _upgrade_schema(conn):
+    """
+    Обновить базу старой версии до DB_VERSION.
+    Версия 1: время хранилось строками — таблицы пересоздаются с INTEGER-колонками.
+    Версия 2: нет версии строки — добавляется колонка tasks.version.
+    Версия 3: в archive_index добавляются колонки data и flushed (старые записи
+    уже в разделах архива, для них data пустая).
+    """
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    has_tables = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tasks'"
+    ).fetchone()
+    if not has_tables or version >= DB_VERSION:
+        return
+
+    if version in (2, 3):
+        has_archive = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'archive_index'"
+        ).fetchone()
+        conn.execute("BEGIN")
+        with conn:
+            if version == 2:
+                conn.execute("ALTER TABLE tasks ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+            if has_archive:
+                conn.execute("ALTER TABLE archive_index ADD COLUMN data TEXT")
+                conn.execute("ALTER TABLE archive_index ADD COLUMN flushed INTEGER NOT NULL DEFAULT 1")
+            conn.execute(f"PRAGMA user_version={DB_VERSION}")
+        print(f"[TaskStorage] Upgraded database schema {version} -> {DB_VERSION}")
+        return
+
+    tasks = conn.execute("SELECT * FROM tasks ORDER BY rowid").fetchall()
+    checkpoints = conn.execute("SELECT task_id, name, time FROM checkpoints ORDER BY id").fetchall()
+
+    # DDL не открывает транзакцию сам — без явного BEGIN таблицы
+    # удалились бы сразу, и сбой дальше оставил бы базу без них
+    conn.execute("BEGIN")
+    with conn:
+        conn.execute("DROP TABLE tasks")
+        conn.execute("DROP TABLE checkpoints")
+        _create_schema(conn)
+        conn.executemany(
+            "INSERT INTO tasks (task_id, type, book, module, module_id, branch, status, "
+            "started_at, branch_linked_at, completed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    row["task_id"], row["type"], row["book"], row["module"], row["module_id"],
+                    row["branch"], row["status"], _to_epoch(row["started_at"]),
+                    _to_epoch(row["branch_linked_at"]), _to_epoch(row["completed_at"])
+                )
+                for row in tasks
+            ]
+        )
+        conn.executemany(
+            "INSERT INTO checkpoints (task_id, name, time) VALUES (?, ?, ?)",
+            [(row["task_id"], row["name"], _to_epoch(row["time"])) for row in checkpoints]
+        )
+        conn.execute(f"PRAGMA user_version={DB_VERSION}")
+    print(f"[TaskStorage] Upgraded database schema {version} -> {DB_VERSION}")
+
+def close():
+    """Закрыть соединение с базой (следующий вызов откроет его и перечитает индекс)"""
+    global _conn
+    with _lock:
+        if _conn is not None:
+            _conn.close()
+            _conn = None
+        _reset_index()
+        _today["day"] = None
+
+def compact():
+    """Принудительно свернуть журнал (WAL) в основной файл базы"""
+    with _lock:
+        conn = _get_conn()
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    print("[TaskStorage] Journal compacted")
+
+def _reset_index():
+    _tasks.clear()
+    _active.clear()
+    _by_branch.clear()
+    _by_module_id.clear()
+    _by_book_module.clear()
+
+def _index_task(task):
+    """Добавить задачу во все индексы"""
+    task_id = task.task_id
+    _tasks[task_id] = task
+    _active[task_id] = None
+    if task.module_id:
+        _by_module_id.setdefault(task.module_id, {})[task_id] = None
+    _by_book_module.setdefault((task.book, task.module), {})[task_id] = None
+    if task.branch:
+        _by_branch[task.branch] = task_id
+
+def _forget(task):
+    """Убрать задачу из всех индексов"""
+    task_id = task.task_id
+    _tasks.pop(task_id, None)
+    _active.pop(task_id, None)
+
+    if task.branch and _by_branch.get(task.branch) == task_id:
+        del _by_branch[task.branch]
+
+    for index, key in ((_by_book_module, (task.book, task.module)),
+                       (_by_module_id, task.module_id)):
+        module_tasks = index.get(key, {})
+        module_tasks.pop(task_id, None)
+        if not module_tasks:
+            index.pop(key, None)
+
+def _read_tasks(conn, where="1", params=()):
+    """Прочитать задачи вместе с checkpoint'ами из базы"""
+    checkpoints = {}
+    for row in conn.execute("SELECT task_id, name, time FROM checkpoints ORDER BY id"):
+        checkpoints.setdefault(row["task_id"], []).append(Checkpoint(row["name"], row["time"]))
+
+    return [
+        _row_to_task(row, checkpoints.get(row["task_id"], []))
+        for row in conn.execute(f"SELECT * FROM tasks WHERE {where} ORDER BY rowid", params)
+    ]
+
+def _load_index(conn):
+    """Прочитать базу и построить индекс (при старте и после записи другим процессом)"""
+    global _revision, _data_version
+    _reset_index()
+    _pending_archive.clear()
+    _today["day"] = None
+    for task in _read_tasks(conn):
+        _index_task(task)
+    _revision = _read_revision(conn)
+    _data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+
+def _read_revision(conn):
+    row = conn.execute("SELECT value FROM meta WHERE key = 'revision'").fetchone()
+    return row[0] if row else 0
+
+def _sync(conn):
+    """
+    Перечитать индекс, если базу изменил другой процесс.
+    PRAGMA data_version не читает данные с диска — проверка почти бесплатная.
+    """
+    global _data_version
+    data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+    if data_version == _data_version:
+        return
+
+    _data_version = data_version
+    if _read_revision(conn) != _revision:
+        print("[TaskStorage] Storage changed by another process, reloading index")
+        _load_index(conn)
+
+def _refresh():
+    """Подготовить индекс к чтению (открыть базу, подтянуть чужие изменения)"""
+    conn = _get_conn()
+    _sync(conn)
+    return conn
+
+def get_revision():
+    """
+    Текущая ревизия хранилища (растёт с каждой транзакцией записи любого процесса)
+
+    Returns:
+        int: номер ревизии
+    """
+    with _lock:
+        _refresh()
+        return _revision
+
+def _row_to_task(row, checkpoints):
+    """Собрать Task из строки таблицы"""
+    return Task(
+        task_id=row["task_id"],
+        type=row["type"],
+        book=row["book"],
+        module=row["module"],
+        module_id=row["module_id"],
+        branch=row["branch"],
+        status=TaskStatus(row["status"]),
+        checkpoints=checkpoints,
+        started_at=row["started_at"],
+        branch_linked_at=row["branch_linked_at"],
+        completed_at=row["completed_at"],
+        version=row["version"]
+    )
+
+def _get_active(task_id):
+    """Найти активную задачу в индексе (или None)"""
+    _refresh()
+    if task_id not in _active:
+        return None
+    return _tasks[task_id]
+
+def _partition_path(day):
+    """Файл архива (раздел за месяц) для даты завершения"""
+    return Path(ARCHIVE_DIR) / f"tasks-{day:%Y-%m}.jsonl.gz"
+
+def _read_partition(path):
+    """Прочитать раздел архива (повторные записи одной задачи схлопываются)"""
+    tasks = {}
+    if not path.exists():
+        return []
 
-def _load_tasks():
-    """Загрузить задачи из файла"""
-    if not Path(TASKS_FILE).exists():
-        return {"active_tasks": [], "completed_tasks": []}
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    task = Task.from_dict(json.loads(line))
+                    tasks[task.task_id] = task
+    except (EOFError, OSError, json.JSONDecodeError) as e:
+        # Хвост последней записи мог не дописаться при падении
+        print(f"[TaskStorage] Archive {path.name} is truncated: {e}")
+
+    return list(tasks.values())
+
+def _archive(conn, task):
+    """
+    Перенести задачу из базы в архив: запись задачи — в archive_index
+    в той же транзакции, раздел архива дописывается после коммита
+    """
+    day = date.fromtimestamp(task.completed_at)
+    _delete(conn, task)
+    conn.execute(
+        "INSERT OR REPLACE INTO archive_index (task_id, module_id, completed_on, partition, data, flushed) "
+        "VALUES (?, ?, ?, ?, ?, 0)",
+        (task.task_id, task.module_id, day.isoformat(), _partition_path(day).name,
+         json.dumps(task.to_dict(), ensure_ascii=False))
+    )
+    _pending_archive.append(task)
+
+def _flush_archive(conn):
+    """
+    Дописать закоммиченные завершённые задачи в их разделы (append + fsync)
+    и отметить их в archive_index. Вызывается после коммита: откаченная
+    транзакция в разделы не попадает. При ошибке записи задачи остаются
+    с flushed = 0 и дописываются при следующем открытии базы
+    """
+    tasks = list(_pending_archive)
+    _pending_archive.clear()
+    if not tasks:
+        return
+
+    by_path = {}
+    for task in tasks:
+        by_path.setdefault(_partition_path(date.fromtimestamp(task.completed_at)), []).append(task)
 
     try:
-        with open(TASKS_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        for path, path_tasks in by_path.items():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Каждый append — отдельный gzip-member, gzip.open читает их подряд
+            with gzip.open(path, 'at', encoding='utf-8') as f:
+                for task in path_tasks:
+                    f.write(json.dumps(task.to_dict(), ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+        with conn:
+            conn.executemany("UPDATE archive_index SET flushed = 1 WHERE task_id = ?",
+                             [(task.task_id,) for task in tasks])
+    except (OSError, sqlite3.Error) as e:
+        print(f"[TaskStorage] Failed to write archive partitions, will retry on restart: {e}")
+
+    for task in tasks:
+        if _today["day"] == date.fromtimestamp(task.completed_at):
+            _today["tasks"].append(task)
+
+def _flush_unflushed(conn):
+    """Дописать в разделы задачи, закоммиченные без записи раздела (падение после коммита)"""
+    rows = conn.execute(
+        "SELECT data FROM archive_index WHERE flushed = 0 AND data IS NOT NULL"
+    ).fetchall()
+    if rows:
+        _pending_archive.extend(Task.from_dict(json.loads(row["data"])) for row in rows)
+        _flush_archive(conn)
+        print(f"[TaskStorage] Wrote {len(rows)} archived tasks to partitions")
+
+def _archive_completed_rows(conn):
+    """Перенести в архив завершённые задачи, оставшиеся в базе (старый формат)"""
+    tasks = _read_tasks(conn, "status = 'completed'")
+    if not tasks:
+        return
+
+    with _write() as conn:
+        for task in tasks:
+            task.completed_at = task.completed_at or task.started_at
+            _archive(conn, task)
+    print(f"[TaskStorage] Archived {len(tasks)} completed tasks")
+
+def _delete(conn, task):
+    """Удалить строку задачи, если её версия не изменилась (compare-and-swap)"""
+    cursor = conn.execute(
+        "DELETE FROM tasks WHERE task_id = ? AND version = ?", (task.task_id, task.version)
+    )
+    if cursor.rowcount == 0:
+        raise StorageConflict(f"task {task.task_id} changed by another process")
+    conn.execute("DELETE FROM checkpoints WHERE task_id = ?", (task.task_id,))
+
+def _insert_task(conn, task):
+    conn.execute(
+        "INSERT OR REPLACE INTO tasks (task_id, type, book, module, module_id, branch, status, "
+        "started_at, branch_linked_at, completed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            task.task_id, task.type, task.book, task.module, task.module_id, task.branch,
+            task.status.value, task.started_at, task.branch_linked_at, task.completed_at
+        )
+    )
+    for checkpoint in task.checkpoints:
+        conn.execute(
+            "INSERT INTO checkpoints (task_id, name, time) VALUES (?, ?, ?)",
+            (task.task_id, checkpoint.name, checkpoint.time)
+        )
+
+def _record(conn, event, task, durations=None, **data):
+    """
+    Дописать событие в журнал (в текущей транзакции записи).
+
+    durations — длительности этапов {метрика: секунды}; они же
+    прибавляются к агрегатам книги в rollups.
+    """
+    if durations:
+        data["durations"] = durations
+    cursor = conn.execute(
+        "INSERT INTO events (task_id, event, book, module, type, time, data) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (task.task_id, event.value, task.book, task.module, task.type, _now(),
+         json.dumps(data, ensure_ascii=False) if data else None)
+    )
+    for metric, seconds in (durations or {}).items():
+        conn.execute(
+            """INSERT INTO rollups (book, metric, count, total_seconds) VALUES (?, ?, 1, ?)
+               ON CONFLICT (book, metric) DO UPDATE
+               SET count = count + 1, total_seconds = total_seconds + excluded.total_seconds""",
+            (task.book, metric, seconds)
+        )
+    if cursor.lastrowid % SNAPSHOT_EVERY_EVENTS == 0:
+        _snapshot(conn, cursor.lastrowid)
+
+def _snapshot(conn, event_id):
+    """Сохранить снимок всех агрегатов после события event_id"""
+    rollups = {}
+    for row in conn.execute("SELECT book, metric, count, total_seconds FROM rollups"):
+        rollups.setdefault(row["book"], {})[row["metric"]] = [row["count"], row["total_seconds"]]
+    conn.execute(
+        "INSERT OR REPLACE INTO snapshots (event_id, time, rollups) VALUES (?, ?, ?)",
+        (event_id, _now(), json.dumps(rollups, ensure_ascii=False))
+    )
+
+def _since(start, end):
+    """Длительность этапа в секундах (None, если начало неизвестно)"""
+    if start is None:
+        return None
+    return max(end - start, 0)
+
+def _durations(**values):
+    return {metric: seconds for metric, seconds in values.items() if seconds is not None}
+
+def migrate_from_json(json_path=None):
+    """
+    Одноразовая миграция из старого data/tasks.json в SQLite.
+    После успешного импорта файл переименовывается в *.migrated
+
+    Args:
+        json_path: путь к JSON-файлу (по умолчанию TASKS_FILE)
+
+    Returns:
+        int: количество перенесённых задач
+    """
+    path = Path(json_path or TASKS_FILE)
+    if not path.exists():
+        return 0
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
     except (json.JSONDecodeError, FileNotFoundError):
-        return {"active_tasks": [], "completed_tasks": []}
+        print(f"[TaskStorage] Could not read {path}, migration skipped")
+        return 0
+
+    tasks = [
+        Task.from_dict(task)
+        for task in data.get("active_tasks", []) + data.get("completed_tasks", [])
+    ]
+
+    with _write() as conn:
+        for task in tasks:
+            conn.execute("DELETE FROM checkpoints WHERE task_id = ?", (task.task_id,))
+            _insert_task(conn, task)
+        _archive_completed_rows(conn)
+        _load_index(conn)
+
+    path.rename(path.with_name(path.name + ".migrated"))
+    print(f"[TaskStorage] Migrated {len(tasks)} tasks from {path} to {DB_FILE}")
+    return len(tasks)
+
+@contextmanager
+def _write():
+    """
+    Транзакция записи.
+
+    Внешний уровень берёт advisory-блокировку файла и BEGIN IMMEDIATE,
+    подтягивает изменения других процессов, а при коммите увеличивает
+    meta.revision. Внутри batch() вложенные вызовы не коммитят сами —
+    все изменения пачки уходят на диск одним коммитом.
+    При ошибке транзакция откатывается, индекс перечитывается из базы.
+    """
+    global _write_depth, _revision
+    with _lock:
+        conn = _get_conn()
+        outer = _write_depth == 0
+        with ExitStack() as stack:
+            # Блокировка снимается, только если была взята
+            if outer:
+                stack.enter_context(_file_lock)
+            _write_depth += 1
+            try:
+                if outer:
+                    conn.execute("BEGIN IMMEDIATE")
+                    _sync(conn)
+                    changes_before = conn.total_changes
+                yield conn
+                if outer:
+                    if conn.total_changes != changes_before:
+                        conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'revision'")
+                    conn.commit()
+                    _revision = _read_revision(conn)
+                    # Разделы архива — только после коммита (ошибки записи не откатывают его)
+                    _flush_archive(conn)
+            except BaseException:
+                if outer:
+                    conn.rollback()
+                    _load_index(conn)
+                raise
+            finally:
+                _write_depth -= 1
+
+def _retrying(func):
+    """
+    Повторять операцию записи при конфликте версий или занятой базе.
+    Внутри уже открытой транзакции (batch) повтор делает внешний вызов.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _write_depth:
+            return func(*args, **kwargs)
+
+        for attempt in range(1, WRITE_RETRIES + 1):
+            try:
+                return func(*args, **kwargs)
+            except (StorageConflict, sqlite3.OperationalError) as e:
+                if isinstance(e, sqlite3.OperationalError) and "locked" not in str(e):
+                    raise
+                if attempt == WRITE_RETRIES:
+                    raise
+                print(f"[TaskStorage] {func.__name__}: {e}, retry {attempt}/{WRITE_RETRIES - 1}")
+                time.sleep(RETRY_DELAY_SECONDS * attempt)
+    return wrapper
+
+class TaskBatch:
+    """
+    Пачка изменений, накопленная в памяти и записываемая одной транзакцией.
+    Методы повторяют одноимённые функции модуля.
+
+    Пример:
+        with task_storage.batch() as tx:
+            tx.update_task_branch(task_id, branch)
+            tx.mark_task_completed(other_id)
+    """
 
-def _save_tasks(data):
-    """Сохранить задачи в файл"""
-    Path(TASKS_FILE).parent.mkdir(parents=True, exist_ok=True)
-    with open(TASKS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    def __init__(self):
+        self.operations = []
+        self.results = []  # Результаты операций после commit() (в том же порядке)
+
+    def create_task(self, task_type, book, module, module_id=None):
+        task_id = str(uuid.uuid4())
+        self.operations.append((_create_task, (task_id, task_type, book, module, module_id)))
+        return task_id
+
+    def update_task_status(self, task_id, status):
+        self.operations.append((update_task_status, (task_id, status)))
+
+    def update_task_branch(self, task_id, branch):
+        self.operations.append((update_task_branch, (task_id, branch)))
+
+    def add_checkpoint(self, task_id, checkpoint_name):
+        self.operations.append((add_checkpoint, (task_id, checkpoint_name)))
+
+    def mark_task_completed(self, task_id):
+        self.operations.append((mark_task_completed, (task_id,)))
+
+    def complete_task(self, task_id):
+        self.operations.append((complete_task, (task_id,)))
+
+    def remove_task(self, task_id):
+        self.operations.append((remove_task, (task_id,)))
+
+    @_retrying
+    def commit(self):
+        """Применить все накопленные операции одной транзакцией"""
+        if not self.operations:
+            return
+
+        with _write():
+            self.results = [func(*args) for func, args in self.operations]
+
+        print(f"[TaskStorage] Batch committed: {len(self.operations)} operations")
+        self.operations = []
+
+@contextmanager
+def batch():
+    """
+    Собрать несколько изменений и записать их атомарно одним коммитом.
+    Если внутри блока возникло исключение — ничего не записывается.
+
+    Yields:
+        TaskBatch: накопитель операций
+    """
+    tx = TaskBatch()
+    yield tx
+    tx.commit()
+
+def _set_fields(task, **fields):
+    """Записать изменённые поля активной задачи в базу и в индекс"""
+    assignments = "".join(f"{name} = ?, " for name in fields)
+    values = [value.value if isinstance(value, TaskStatus) else value for value in fields.values()]
+    with _write() as conn:
+        cursor = conn.execute(
+            f"UPDATE tasks SET {assignments}version = version + 1 WHERE task_id = ? AND version = ?",
+            (*values, task.task_id, task.version)
+        )
+        if cursor.rowcount == 0:
+            raise StorageConflict(f"task {task.task_id} changed by another process")
+    for name, value in fields.items():
+        setattr(task, name, value)
+    task.version += 1
 
 def create_task(task_type, book, module, module_id=None):
     """
@@ -35,47 +855,54 @@ def create_task(task_type, book, module, module_id=None):
     Returns:
         task_id: уникальный идентификатор задачи
     """
-    data = _load_tasks()
-
-    task_id = str(uuid.uuid4())
-    task = {
-        "task_id": task_id,
-        "type": task_type,
-        "book": book,
-        "module": module,
-        "module_id": module_id,
-        "branch": None,
-        "status": "in_progress",
-        "checkpoints": [],
-        "started_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "completed_at": None
-    }
-
-    data["active_tasks"].append(task)
-    _save_tasks(data)
+    return _create_task(str(uuid.uuid4()), task_type, book, module, module_id)
+
+@_retrying
+def _create_task(task_id, task_type, book, module, module_id):
+    task = Task(
+        task_id=task_id,
+        type=task_type,
+        book=book,
+        module=module,
+        module_id=module_id,
+        started_at=_now()
+    )
+
+    with _write() as conn:
+        _insert_task(conn, task)
+        _record(conn, EventType.CREATED, task, module_id=module_id)
+        _index_task(task)
 
     print(f"[TaskStorage] Created task {task_id}: {task_type} {book} Module {module}")
     return task_id
 
+@_retrying
 def update_task_status(task_id, status):
     """
     Обновить статус задачи
 
     Args:
         task_id: ID задачи
-        status: новый статус (in_progress/completed)
+        status: новый статус (TaskStatus или строка in_progress/completed)
     """
-    data = _load_tasks()
+    status = TaskStatus(status)
 
-    for task in data["active_tasks"]:
-        if task["task_id"] == task_id:
-            task["status"] = status
-            _save_tasks(data)
-            print(f"[TaskStorage] Updated task {task_id} status to {status}")
-            return True
+    with _write():
+        task = _get_active(task_id)
+        if not task:
+            return False
 
-    return False
+        if status == TaskStatus.COMPLETED:
+            _complete(task)
+        else:
+            _set_fields(task, status=status)
+            with _write() as conn:
+                _record(conn, EventType.STATUS_CHANGED, task, status=status.value)
 
+    print(f"[TaskStorage] Updated task {task_id} status to {status.value}")
+    return True
+
+@_retrying
 def update_task_branch(task_id, branch):
     """
     Обновить ветку задачи
@@ -84,18 +911,27 @@ def update_task_branch(task_id, branch):
         task_id: ID задачи
         branch: название ветки GitHub
     """
-    data = _load_tasks()
-
-    for task in data["active_tasks"]:
-        if task["task_id"] == task_id:
-            task["branch"] = branch
-            task["branch_linked_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            _save_tasks(data)
-            print(f"[TaskStorage] Updated task {task_id} branch to {branch}")
-            return True
-
-    return False
-
+    with _write():
+        task = _get_active(task_id)
+        if not task:
+            return False
+
+        old_branch = task.branch
+        if old_branch and _by_branch.get(old_branch) == task_id:
+            del _by_branch[old_branch]
+
+        now = _now()
+        _set_fields(task, branch=branch, branch_linked_at=now)
+        _by_branch[branch] = task_id
+        with _write() as conn:
+            _record(conn, EventType.BRANCH_LINKED, task,
+                    _durations(start_to_link=_since(task.started_at, now)),
+                    branch=branch, old_branch=old_branch)
+
+    print(f"[TaskStorage] Updated task {task_id} branch to {branch}")
+    return True
+
+@_retrying
 def add_checkpoint(task_id, checkpoint_name):
     """
     Добавить контрольную точку к задаче
@@ -104,71 +940,132 @@ def add_checkpoint(task_id, checkpoint_name):
         task_id: ID задачи
         checkpoint_name: название контрольной точки
     """
-    data = _load_tasks()
-
-    for task in data["active_tasks"]:
-        if task["task_id"] == task_id:
-            checkpoint = {
-                "name": checkpoint_name,
-                "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            }
-            task["checkpoints"].append(checkpoint)
-            _save_tasks(data)
-            print(f"[TaskStorage] Added checkpoint '{checkpoint_name}' to task {task_id}")
-            return True
-
-    return False
-
+    with _write():
+        task = _get_active(task_id)
+        if not task:
+            return False
+
+        checkpoint = Checkpoint(checkpoint_name, _now())
+        _set_fields(task)
+        with _write() as conn:
+            conn.execute(
+                "INSERT INTO checkpoints (task_id, name, time) VALUES (?, ?, ?)",
+                (task_id, checkpoint.name, checkpoint.time)
+            )
+            _record(conn, EventType.CHECKPOINT, task, name=checkpoint_name)
+        task.checkpoints.append(checkpoint)
+
+    print(f"[TaskStorage] Added checkpoint '{checkpoint_name}' to task {task_id}")
+    return True
+
+def _complete(task):
+    """Перевести задачу в completed и перенести её в архив"""
+    completed = task.copy()
+    completed.status = TaskStatus.COMPLETED
+    completed.completed_at = _now()
+    ready_at = task.completed_at if task.status == TaskStatus.READY_TO_MERGE else None
+    with _write() as conn:
+        _archive(conn, completed)
+        _record(conn, EventType.MERGED, completed, _durations(
+            ready_to_merged=_since(ready_at, completed.completed_at),
+            start_to_merged=_since(task.started_at, completed.completed_at)
+        ))
+    _forget(task)
+
+@_retrying
 def complete_task(task_id):
     """
-    Завершить задачу (переместить в completed_tasks)
+    Завершить задачу (перенести в архив завершённых)
 
     Args:
         task_id: ID задачи
     """
-    data = _load_tasks()
-
-    for i, task in enumerate(data["active_tasks"]):
-        if task["task_id"] == task_id:
-            task["status"] = "completed"
-            task["completed_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    with _write():
+        task = _get_active(task_id)
+        if not task:
+            return False
 
-            # Переместить в completed_tasks
-            completed_task = data["active_tasks"].pop(i)
-            data["completed_tasks"].append(completed_task)
+        _complete(task)
 
-            _save_tasks(data)
-            print(f"[TaskStorage] Completed task {task_id}")
-            return True
-
-    return False
+    print(f"[TaskStorage] Completed task {task_id}")
+    return True
 
 def get_active_tasks():
     """
     Получить список активных задач
 
     Returns:
-        list: список активных задач
+        list[Task]: список активных задач
     """
-    data = _load_tasks()
-    return data["active_tasks"]
+    with _lock:
+        _refresh()
+        return [_tasks[task_id].copy() for task_id in _active]
 
 def get_completed_tasks_today():
     """
     Получить задачи завершенные сегодня
 
     Returns:
-        list: список задач завершенных сегодня
+        list[Task]: список задач завершенных сегодня
+    """
+    today = date.today()
+
+    with _lock:
+        _refresh()
+        if _today["day"] != today:
+            # Раз в сутки читаем текущий раздел, дальше кэш пополняется при завершении
+            _today["tasks"] = [
+                task for task in _read_partition(_partition_path(today))
+                if date.fromtimestamp(task.completed_at) == today
+            ]
+            _today["day"] = today
+        return [task.copy() for task in _today["tasks"]]
+
+def get_completed_tasks(start, end=None):
     """
-    data = _load_tasks()
-    today = datetime.now().strftime("%Y-%m-%d")
+    Получить задачи, завершённые за период (читаются только разделы нужных месяцев)
 
-    today_tasks = [
-        task for task in data["completed_tasks"]
-        if task["completed_at"] and task["completed_at"].startswith(today)
-    ]
+    Args:
+        start: первый день периода (date)
+        end: последний день периода включительно (date, по умолчанию сегодня)
+
+    Returns:
+        list[Task]: список завершённых задач в порядке завершения
+    """
+    end = end or date.today()
+    tasks = []
 
-    return today_tasks
+    month = date(start.year, start.month, 1)
+    while month <= end:
+        for task in _read_partition(_partition_path(month)):
+            if start <= date.fromtimestamp(task.completed_at) <= end:
+                tasks.append(task)
+        month = date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+    tasks.sort(key=lambda task: task.completed_at)
+    return tasks
+
+def _find_archived(where, params):
+    """
+    Найти завершённые задачи через archive_index: запись задачи берётся из индекса,
+    раздел архива читается только для записей старого формата (без data)
+    """
+    with _lock:
+        rows = _refresh().execute(
+            f"SELECT task_id, partition, data FROM archive_index WHERE {where}", params
+        ).fetchall()
+
+    tasks = []
+    by_partition = {}
+    for row in rows:
+        if row["data"]:
+            tasks.append(Task.from_dict(json.loads(row["data"])))
+        else:
+            by_partition.setdefault(row["partition"], set()).add(row["task_id"])
+
+    for partition, task_ids in by_partition.items():
+        tasks += [t for t in _read_partition(Path(ARCHIVE_DIR) / partition) if t.task_id in task_ids]
+    return tasks
 
 def get_task_by_id(task_id):
     """
@@ -178,19 +1075,16 @@ def get_task_by_id(task_id):
         task_id: ID задачи
 
     Returns:
-        dict: задача или None
+        Task: задача или None
     """
-    data = _load_tasks()
+    with _lock:
+        _refresh()
+        task = _tasks.get(task_id)
+        if task:
+            return task.copy()
 
-    for task in data["active_tasks"]:
-        if task["task_id"] == task_id:
-            return task
-
-    for task in data["completed_tasks"]:
-        if task["task_id"] == task_id:
-            return task
-
-    return None
+    archived = _find_archived("task_id = ?", (task_id,))
+    return archived[0] if archived else None
 
 def get_task_by_branch(branch):
     """
@@ -200,15 +1094,12 @@ def get_task_by_branch(branch):
         branch: название ветки GitHub
 
     Returns:
-        dict: задача или None
+        Task: задача или None
     """
-    data = _load_tasks()
-
-    for task in data["active_tasks"]:
-        if task["branch"] == branch:
-            return task
-
-    return None
+    with _lock:
+        _refresh()
+        task_id = _by_branch.get(branch)
+        return _tasks[task_id].copy() if task_id else None
 
 def create_module_tasks(book, module):
     """
@@ -224,11 +1115,13 @@ def create_module_tasks(book, module):
     # Создать общий module_id для связывания задач
     module_id = str(uuid.uuid4())
 
-    # Создать задачу glossary
-    glossary_id = create_task("glossary", book, module, module_id=module_id)
+    # Обе задачи пишутся одной транзакцией — модуль не останется «наполовину» созданным
+    with batch() as tx:
+        # Создать задачу glossary
+        glossary_id = tx.create_task("glossary", book, module, module_id=module_id)
 
-    # Создать задачу tests
-    tests_id = create_task("tests", book, module, module_id=module_id)
+        # Создать задачу tests
+        tests_id = tx.create_task("tests", book, module, module_id=module_id)
 
     print(f"[TaskStorage] Created module tasks for {book} Module {module}")
     print(f"[TaskStorage] Module ID: {module_id}")
@@ -249,21 +1142,15 @@ def get_tasks_by_module_id(module_id):
         module_id: ID модуля
 
     Returns:
-        list: список задач модуля
+        list[Task]: список задач модуля
     """
-    data = _load_tasks()
-    module_tasks = []
+    with _lock:
+        _refresh()
+        active = [_tasks[task_id].copy() for task_id in _by_module_id.get(module_id, {})]
 
-    for task in data["active_tasks"]:
-        if task.get("module_id") == module_id:
-            module_tasks.append(task)
-
-    for task in data["completed_tasks"]:
-        if task.get("module_id") == module_id:
-            module_tasks.append(task)
-
-    return module_tasks
+    return _find_archived("module_id = ?", (module_id,)) + active
 
+@_retrying
 def remove_task(task_id):
     """
     Удалить задачу по ID (если ветка была удалена вручную)
@@ -271,11 +1158,16 @@ def remove_task(task_id):
     Args:
         task_id: ID задачи
     """
-    data = _load_tasks()
-    data["active_tasks"] = [t for t in data["active_tasks"] if t["task_id"] != task_id]
-    _save_tasks(data)
+    with _write() as conn:
+        task = _get_active(task_id)
+        if task:
+            _delete(conn, task)
+            _record(conn, EventType.REMOVED, task, branch=task.branch)
+            _forget(task)
+
     print(f"[TaskStorage] Removed task {task_id}")
 
+@_retrying
 def mark_task_completed(task_id):
     """
     Пометить задачу как завершённую (готова к merge)
@@ -286,25 +1178,34 @@ def mark_task_completed(task_id):
     Returns:
         bool: True если задача найдена и обновлена
     """
-    data = _load_tasks()
-    for task in data["active_tasks"]:
-        if task["task_id"] == task_id:
-            task["status"] = "ready_to_merge"
-            task["completed_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            _save_tasks(data)
-            print(f"[TaskStorage] Task {task_id} marked as ready_to_merge")
-            return True
-    return False
+    with _write():
+        task = _get_active(task_id)
+        if not task:
+            return False
+        now = _now()
+        already_ready = task.status == TaskStatus.READY_TO_MERGE
+        _set_fields(task, status=TaskStatus.READY_TO_MERGE, completed_at=now)
+        if not already_ready:
+            with _write() as conn:
+                _record(conn, EventType.READY_TO_MERGE, task, _durations(
+                    link_to_ready=_since(task.branch_linked_at, now),
+                    start_to_ready=_since(task.started_at, now)
+                ))
+
+    print(f"[TaskStorage] Task {task_id} marked as ready_to_merge")
+    return True
 
 def get_ready_to_merge_tasks():
     """
     Получить задачи готовые к merge
 
     Returns:
-        list: список задач со статусом ready_to_merge
+        list[Task]: список задач со статусом ready_to_merge
     """
-    data = _load_tasks()
-    return [t for t in data["active_tasks"] if t.get("status") == "ready_to_merge"]
+    with _lock:
+        _refresh()
+        return [_tasks[task_id].copy() for task_id in _active
+                if _tasks[task_id].status == TaskStatus.READY_TO_MERGE]
 
 def get_module_tasks(book, module):
     """
@@ -315,11 +1216,11 @@ def get_module_tasks(book, module):
         module: номер модуля
 
     Returns:
-        list: список задач модуля
+        list[Task]: список задач модуля
     """
-    data = _load_tasks()
-    return [t for t in data["active_tasks"]
-            if t["book"] == book and t["module"] == module]
+    with _lock:
+        _refresh()
+        return [_tasks[task_id].copy() for task_id in _by_book_module.get((book, module), {})]
 
 def is_module_ready(book, module):
     """
@@ -335,10 +1236,119 @@ def is_module_ready(book, module):
     tasks = get_module_tasks(book, module)
     if len(tasks) < 2:
         return False
-    return all(t.get("status") == "ready_to_merge" for t in tasks)
+    return all(t.status == TaskStatus.READY_TO_MERGE for t in tasks)
 
+@_retrying
 def clear_all_tasks():
-    """Очистить все активные задачи"""
-    data = {"active_tasks": [], "completed_tasks": []}
-    _save_tasks(data)
+    """Очистить все активные задачи (архив завершённых не трогается)"""
+    with _write() as conn:
+        for task_id in _active:
+            _record(conn, EventType.REMOVED, _tasks[task_id], branch=_tasks[task_id].branch, cleared=True)
+        conn.execute("DELETE FROM checkpoints")
+        conn.execute("DELETE FROM tasks")
+        _reset_index()
     print("[TaskStorage] All tasks cleared")
+
+def get_task_history(task_id):
+    """
+    История задачи из журнала событий (в том числе уже завершённой или удалённой)
+
+    Args:
+        task_id: ID задачи
+
+    Returns:
+        list[TaskEvent]: события в порядке записи
+    """
+    with _lock:
+        rows = _refresh().execute(
+            "SELECT * FROM events WHERE task_id = ? ORDER BY id", (task_id,)
+        ).fetchall()
+
+    return [
+        TaskEvent(
+            id=row["id"],
+            task_id=row["task_id"],
+            event=EventType(row["event"]),
+            time=row["time"],
+            book=row["book"],
+            module=row["module"],
+            type=row["type"],
+            data=json.loads(row["data"]) if row["data"] else {}
+        )
+        for row in rows
+    ]
+
+def _rollups_at(conn, until):
+    """
+    Агрегаты на момент until: ближайший снимок до него
+    плюс события, записанные после снимка
+    """
+    rollups = {}
+    after_event = 0
+    snapshot = conn.execute(
+        "SELECT event_id, rollups FROM snapshots WHERE time <= ? ORDER BY event_id DESC LIMIT 1",
+        (until,)
+    ).fetchone()
+    if snapshot:
+        after_event = snapshot["event_id"]
+        rollups = json.loads(snapshot["rollups"])
+
+    rows = conn.execute(
+        "SELECT book, data FROM events WHERE id > ? AND time <= ? AND data LIKE '%durations%'",
+        (after_event, until)
+    )
+    for row in rows:
+        for metric, seconds in json.loads(row["data"]).get("durations", {}).items():
+            count, total = rollups.setdefault(row["book"], {}).get(metric, (0, 0))
+            rollups[row["book"]][metric] = [count + 1, total + seconds]
+    return rollups
+
+def get_lifecycle_stats(book=None, until=None):
+    """
+    Статистика длительностей этапов задач (по агрегатам, без пересчёта журнала)
+
+    Метрики: start_to_link, link_to_ready, start_to_ready,
+    ready_to_merged, start_to_merged.
+
+    Args:
+        book: книга (None — по всем книгам)
+        until: unix epoch — статистика на этот момент (None — текущая)
+
+    Returns:
+        dict: {метрика: {"count": int, "avg_seconds": float}}
+    """
+    with _lock:
+        conn = _refresh()
+        if until is None:
+            rollups = {}
+            for row in conn.execute("SELECT book, metric, count, total_seconds FROM rollups"):
+                rollups.setdefault(row["book"], {})[row["metric"]] = [row["count"], row["total_seconds"]]
+        else:
+            rollups = _rollups_at(conn, until)
+
+    totals = {}
+    for rollup_book, metrics in rollups.items():
+        if book is not None and rollup_book != book:
+            continue
+        for metric, (count, seconds) in metrics.items():
+            total = totals.setdefault(metric, [0, 0])
+            total[0] += count
+            total[1] += seconds
+
+    return {
+        metric: {"count": count, "avg_seconds": seconds / count}
+        for metric, (count, seconds) in totals.items() if count
+    }
+
+def get_average_completion_time(book=None):
+    """
+    Среднее время от привязки ветки до готовности к merge
+
+    Args:
+        book: книга (None — по всем книгам)
+
+    Returns:
+        float: секунды или None, если завершённых задач ещё не было
+    """
+    stats = get_lifecycle_stats(book).get("link_to_ready")
+    return stats["avg_seconds"] if stats else None
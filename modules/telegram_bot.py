@@ -1,3 +1,5 @@
+import asyncio
+import time
 from telegram import Update, ReplyKeyboardMarkup, KeyboardButton
 from telegram.ext import Application, CommandHandler, MessageHandler, ContextTypes, filters
 from config import TELEGRAM_BOT_TOKEN, TELEGRAM_ADMIN_ID
@@ -5,7 +7,10 @@ from projects.cfa.config import BOOKS
 from projects.cfa.prompts import generate_prompt
 from modules.pyautogui_actions import send_prompt_to_claude, launch_module_tasks, close_glossary_tab, close_tests_tab
 from modules import task_storage
-from modules.github_monitor import get_last_commit_info
+from modules.async_storage import store
+from modules import rate_limit
+from modules import background_monitor
+from modules.async_monitor import monitor
 
 # Состояние пользователя
 user_state = {}
@@ -259,7 +264,8 @@ async def execute_module_task(update: Update, user_id: int):
     tests_prompt = generate_prompt("tests", book_name, module_num)
 
     # Создаем парные задачи в системе мониторинга
-    module_tasks = task_storage.create_module_tasks(book_name, module_num)
+    module_tasks = await store.create_module_tasks(book_name, module_num)
+    background_monitor.wake_monitor()  # монитор начнёт искать ветки сразу
 
     # Отправить оба промпта в Claude Code через PyAutoGUI
     launch_module_tasks(glossary_prompt, tests_prompt)
@@ -275,56 +281,67 @@ async def execute_module_task(update: Update, user_id: int):
 
 async def refresh_and_show_status(update: Update, user_id: int):
     """Обновить статус — синхронизировать с GitHub"""
-    from modules.github_monitor import get_claude_branches, check_branch_completed, find_branch_for_task
-    from datetime import datetime
-
     try:
-        github_branches = get_claude_branches()
+        with rate_limit.caller(rate_limit.Priority.STATUS):
+            github_branches = await monitor.get_claude_branches()
         print(f"[Refresh] Found {len(github_branches)} GitHub branches")
     except Exception as e:
         print(f"[Refresh] GitHub error: {e}")
         github_branches = []
 
-    active_tasks = task_storage.get_active_tasks()
+    active_tasks = await store.get_active_tasks()
+
+    # Завершённость всех веток — параллельно, одним заходом до прохода по задачам
+    # (ветки, найденные ниже при привязке, проверяются там же)
+    to_check = [task.branch for task in active_tasks
+                if task.branch and task.status != task_storage.TaskStatus.READY_TO_MERGE]
+    with rate_limit.caller(rate_limit.Priority.STATUS):
+        completed_branches = await monitor.gather("check_branch_completed", to_check)
 
     removed_count = 0
     completed_count = 0
     linked_count = 0
 
-    for task in active_tasks[:]:
-        branch = task.get("branch")
-
-        # === Привязка веток к задачам без ветки ===
-        if not branch and github_branches:
-            found_branch = find_branch_for_task(
-                task["type"],
-                task["book"],
-                task["module"],
-                github_branches
-            )
-
-            if found_branch:
-                task_storage.update_task_branch(task["task_id"], found_branch)
-                branch = found_branch
-                linked_count += 1
-                print(f"[Refresh] Linked task {task['task_id'][:8]} to branch {found_branch}")
-
-        # Проверка: если ветка есть, но её нет в GitHub — удаляем задачу
-        if branch and github_branches and branch not in github_branches:
-            task_storage.remove_task(task["task_id"])
-            removed_count += 1
-            print(f"[Refresh] Removed task {task['task_id'][:8]} (branch {branch} deleted)")
-            continue
-
-        # Проверка завершения
-        if branch and task.get("status") != "ready_to_merge":
-            try:
-                if check_branch_completed(branch):
-                    task_storage.mark_task_completed(task["task_id"])
-                    completed_count += 1
-                    print(f"[Refresh] Task {task['task_id'][:8]} marked as completed")
-            except Exception as e:
-                print(f"[Refresh] Error checking {branch}: {e}")
+    # Все изменения прохода пишутся одной транзакцией
+    async with store.batch() as tx:
+        for task in active_tasks[:]:
+            branch = task.branch
+
+            # === Привязка веток к задачам без ветки ===
+            if not branch and github_branches:
+                found_branch = await monitor.find_branch_for_task(
+                    task.type,
+                    task.book,
+                    task.module,
+                    github_branches
+                )
+
+                if found_branch:
+                    tx.update_task_branch(task.task_id, found_branch)
+                    branch = found_branch
+                    linked_count += 1
+                    print(f"[Refresh] Linked task {task.task_id[:8]} to branch {found_branch}")
+
+            # Проверка: если ветка есть, но её нет в GitHub — удаляем задачу
+            if branch and github_branches and branch not in github_branches:
+                tx.remove_task(task.task_id)
+                removed_count += 1
+                print(f"[Refresh] Removed task {task.task_id[:8]} (branch {branch} deleted)")
+                continue
+
+            # Проверка завершения
+            if branch and task.status != task_storage.TaskStatus.READY_TO_MERGE:
+                try:
+                    completed = completed_branches.get(branch)
+                    if completed is None:
+                        with rate_limit.caller(rate_limit.Priority.STATUS):
+                            completed = await monitor.check_branch_completed(branch)
+                    if completed:
+                        tx.mark_task_completed(task.task_id)
+                        completed_count += 1
+                        print(f"[Refresh] Task {task.task_id[:8]} marked as completed")
+                except Exception as e:
+                    print(f"[Refresh] Error checking {branch}: {e}")
 
     # Формируем ответ
     messages = []
@@ -346,9 +363,9 @@ async def show_status(update: Update, user_id: int):
 
     user_state[user_id]["state"] = STATE_STATUS
 
-    active_tasks = task_storage.get_active_tasks()
-    ready_to_merge = task_storage.get_ready_to_merge_tasks()
-    completed_today = task_storage.get_completed_tasks_today()
+    active_tasks = await store.get_active_tasks()
+    ready_to_merge = await store.get_ready_to_merge_tasks()
+    completed_today = await store.get_completed_tasks_today()
 
     message = "📊 *Статус системы*\n\n"
     message += "🟢 Бот работает\n"
@@ -363,23 +380,28 @@ async def show_status(update: Update, user_id: int):
     # Активные задачи с индикаторами
     if active_tasks:
         message += "📋 *Активные задачи:*\n\n"
+        now = time.time()
+
+        # Последние коммиты всех веток — параллельно
+        with rate_limit.caller(rate_limit.Priority.STATUS):
+            last_commits = await monitor.gather(
+                "get_last_commit_info", [task.branch for task in active_tasks if task.branch]
+            )
 
         for task in active_tasks:
-            started = datetime.strptime(task["started_at"], "%Y-%m-%d %H:%M:%S")
-            started_time = task["started_at"].split()[1][:5]
-            minutes_since_start = (datetime.now() - started).total_seconds() / 60
+            started_time = datetime.fromtimestamp(task.started_at).strftime("%H:%M")
+            minutes_since_start = (now - task.started_at) / 60
 
-            branch = task.get("branch")
+            branch = task.branch
             last_commit = None
 
             if branch:
-                print(f"[Status] Getting commit info for task {task['task_id'][:8]} branch: {branch}")
-                last_commit = get_last_commit_info(branch)
+                last_commit = last_commits.get(branch)
                 if last_commit:
                     print(f"[Status] Last commit was {last_commit['minutes_ago']} minutes ago")
 
             # Определяем статус
-            if task.get("status") == "ready_to_merge":
+            if task.status == task_storage.TaskStatus.READY_TO_MERGE:
                 status_icon = "✅"
                 status_text = "Готов к merge"
             elif not branch:
@@ -408,10 +430,10 @@ async def show_status(update: Update, user_id: int):
                 status_icon = "🔵"
                 status_text = "Проверяю..."
 
-            type_emoji = "📖" if task["type"] == "glossary" else "📝"
-            type_name = "Глоссарий" if task["type"] == "glossary" else "Тесты"
+            type_emoji = "📖" if task.type == "glossary" else "📝"
+            type_name = "Глоссарий" if task.type == "glossary" else "Тесты"
 
-            message += f"{status_icon} {type_emoji} *{type_name}* {task['book']} Module {task['module']}\n"
+            message += f"{status_icon} {type_emoji} *{type_name}* {task.book} Module {task.module}\n"
             message += f"⏱ Начато: {started_time} | {status_text}\n"
 
             # Показываем ветку если есть
@@ -420,7 +442,7 @@ async def show_status(update: Update, user_id: int):
                 message += f"🌿 `{branch_short}`\n"
 
             # Показываем последний коммит если есть
-            if last_commit and task.get("status") != "ready_to_merge":
+            if last_commit and task.status != task_storage.TaskStatus.READY_TO_MERGE:
                 commit_msg = last_commit["message"].split("\n")[0][:40]  # первая строка, до 40 символов
                 message += f"💬 _{commit_msg}_\n"
 
@@ -437,10 +459,10 @@ async def show_status(update: Update, user_id: int):
     # Проверяем готовые модули
     modules_ready = {}
     for task in ready_to_merge:
-        key = f"{task['book']}_{task['module']}"
+        key = f"{task.book}_{task.module}"
         if key not in modules_ready:
             modules_ready[key] = []
-        modules_ready[key].append(task["type"])
+        modules_ready[key].append(task.type)
 
     for key, types in modules_ready.items():
         if len(types) == 2:  # glossary + tests
@@ -448,7 +470,10 @@ async def show_status(update: Update, user_id: int):
             message += f"🎉 _{book} Module {module} — полностью готов!_\n"
 
     message += "━━━━━━━━━━━━━━━\n"
-    message += f"📁 *Завершено сегодня:* {len(completed_today)}"
+    message += f"📁 *Завершено сегодня:* {len(completed_today)}\n"
+    message += "━━━━━━━━━━━━━━━\n"
+    message += format_github_quota()
+    message += "\n" + format_monitor_cycles()
 
     # Кнопки
     keyboard = [
@@ -460,16 +485,56 @@ async def show_status(update: Update, user_id: int):
     await update.message.reply_text(message, reply_markup=reply_markup, parse_mode="Markdown")
 
 
+def format_monitor_cycles():
+    """Длительность циклов фонового мониторинга для экрана статуса"""
+    stats = background_monitor.get_cycle_stats()
+    if not stats["cycles"]:
+        return "⏱ *Циклы мониторинга:* ещё не было"
+
+    line = (f"⏱ *Циклы мониторинга:* последний {stats['last']:.1f} с, "
+            f"медиана {stats['p50']:.1f} с, макс {stats['max']:.1f} с")
+    if stats["skipped"] or stats["timeouts"]:
+        line += f"\n  Пропущено циклов: {stats['skipped']}, таймаутов проверки: {stats['timeouts']}"
+    return line
+
+
+def format_github_quota():
+    """Состояние квоты GitHub API для экрана статуса"""
+    from datetime import datetime
+
+    state = rate_limit.get_state()
+    if not state["resources"]:
+        return "🐙 *GitHub API:* запросов ещё не было"
+
+    lines = ["🐙 *GitHub API:*"]
+    for resource, quota in state["resources"].items():
+        reset_time = datetime.fromtimestamp(quota["reset"]).strftime("%H:%M")
+        lines.append(f"  {resource}: {quota['remaining']}/{quota['limit']} (сброс в {reset_time})")
+
+    if state["poll_interval"]:
+        lines.append(f"  Опрос: каждые {state['poll_interval']:.0f} сек")
+
+    spent = state["spent"]
+    lines.append(
+        f"  Запросов: монитор {spent.get('MONITOR', 0)}, "
+        f"статус {spent.get('STATUS', 0)}, merge {spent.get('MERGE', 0)}"
+    )
+
+    cache = monitor.get_cache_stats()
+    lines.append(f"  Кэш: {cache['hits']} ответов 304, {cache['misses']} полных")
+    return "\n".join(lines)
+
+
 async def clear_all_tasks(update: Update, user_id: int):
     """Очистить все задачи"""
-    task_storage.clear_all_tasks()
+    await store.clear_all_tasks()
     await update.message.reply_text("🗑 Все задачи очищены!")
     await show_status(update, user_id)
 
 
 async def show_merge_module_menu(update: Update, user_id: int):
     """Показать модули готовые к merge"""
-    ready_tasks = task_storage.get_ready_to_merge_tasks()
+    ready_tasks = await store.get_ready_to_merge_tasks()
 
     if not ready_tasks:
         await update.message.reply_text(
@@ -482,9 +547,9 @@ async def show_merge_module_menu(update: Update, user_id: int):
     # Группируем по модулям
     modules = {}
     for task in ready_tasks:
-        key = f"{task['book']}_{task['module']}"
+        key = f"{task.book}_{task.module}"
         if key not in modules:
-            modules[key] = {"book": task["book"], "module": task["module"], "tasks": []}
+            modules[key] = {"book": task.book, "module": task.module, "tasks": []}
         modules[key]["tasks"].append(task)
 
     # Показываем только модули где готовы ОБА (glossary + tests)
@@ -514,8 +579,8 @@ async def show_merge_module_menu(update: Update, user_id: int):
     for key, data in complete_modules.items():
         message += f"📚 *{data['book']} Module {data['module']}*\n"
         for task in data["tasks"]:
-            type_emoji = "📖" if task["type"] == "glossary" else "📝"
-            message += f"  {type_emoji} {task['type']} ✅\n"
+            type_emoji = "📖" if task.type == "glossary" else "📝"
+            message += f"  {type_emoji} {task.type} ✅\n"
         message += "\n"
 
     await update.message.reply_text(message, reply_markup=reply_markup, parse_mode="Markdown")
@@ -542,8 +607,8 @@ async def execute_merge_module(update: Update, user_id: int, module_key: str, mo
     module = module_data["module"]
 
     # Находим задачи для этого модуля
-    ready_tasks = task_storage.get_ready_to_merge_tasks()
-    module_tasks = [t for t in ready_tasks if t["book"] == book and t["module"] == module]
+    ready_tasks = await store.get_ready_to_merge_tasks()
+    module_tasks = [t for t in ready_tasks if t.book == book and t.module == module]
 
     if len(module_tasks) != 2:
         await update.message.reply_text(f"❌ Ошибка: нужны обе задачи (glossary + tests) для merge")
@@ -554,10 +619,10 @@ async def execute_merge_module(update: Update, user_id: int, module_key: str, mo
     tests_branch = None
 
     for task in module_tasks:
-        if task["type"] == "glossary":
-            glossary_branch = task.get("branch")
+        if task.type == "glossary":
+            glossary_branch = task.branch
         else:
-            tests_branch = task.get("branch")
+            tests_branch = task.branch
 
     if not glossary_branch or not tests_branch:
         await update.message.reply_text(
@@ -570,16 +635,15 @@ async def execute_merge_module(update: Update, user_id: int, module_key: str, mo
     # Показываем процесс
     await update.message.reply_text(f"🔄 Выполняю merge {book} Module {module}...")
 
-    # Выполняем merge
-    result = merge_module_branches(glossary_branch, tests_branch)
+    # Выполняем merge (в потоке: может ждать fetch монитора веток в том же клоне)
+    result = await asyncio.to_thread(merge_module_branches, glossary_branch, tests_branch)
 
     # Возвращаемся в главное меню
     await show_main_menu(update, user_id)
 
     if result["success"]:
-        # Удаляем задачи из storage
-        for task in module_tasks:
-            task_storage.complete_task(task["task_id"])
+        # Удаляем задачи из storage (обе записи уйдут одной транзакцией)
+        await asyncio.gather(*(store.complete_task(task.task_id) for task in module_tasks))
 
         await update.message.reply_text(
             f"✅ Merge выполнен!\n\n"
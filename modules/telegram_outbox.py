@@ -0,0 +1,261 @@
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TelegramError
+
+OUTBOX_FILE = "data/outbox.json"   # неотправленные сообщения переживают перезапуск
+
+# Лимиты Telegram: ~30 сообщений в секунду на бота, ~1 в секунду в один чат
+GLOBAL_RATE = 25          # сообщений в секунду
+GLOBAL_BURST = 25
+CHAT_RATE = 1
+CHAT_BURST = 3
+
+COALESCE_SECONDS = 3      # уведомления одного модуля за это время склеиваются в одно
+MAX_BACKOFF_SECONDS = 60  # пауза между повторами при сетевых ошибках растёт до этой
+SAVE_DELAY_SECONDS = 1    # изменения очереди за это время сохраняются одной записью
+
+
+class TokenBucket:
+    """Ведро токенов: rate токенов в секунду, не больше capacity"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def wait_time(self):
+        """Сколько секунд ждать до следующего токена (0 — можно сейчас)"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return 0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+
+class TelegramOutbox:
+    """
+    Очередь исходящих уведомлений администратору.
+
+    - отправка с ограничением частоты (общее ведро токенов и ведро на чат);
+    - повтор при RetryAfter (ждём, сколько сказал Telegram) и сетевых ошибках
+      (пауза растёт до MAX_BACKOFF_SECONDS);
+    - неотправленные сообщения сохраняются в OUTBOX_FILE (не чаще раза
+      в SAVE_DELAY_SECONDS, запись — в пуле потоков) и уходят после перезапуска;
+    - уведомления с одним ключом (модуль), пришедшие в течение COALESCE_SECONDS,
+      уходят одним сообщением.
+
+    Пример:
+        outbox.send(bot, admin_id, "✅ *Задача завершена!*", key="Quantitative Methods_3")
+    """
+
+    def __init__(self):
+        self._bot = None
+        self._queue = []    # [{"chat_id", "text", "parse_mode", "key", "due", "attempts"}], по порядку
+        self._loaded = False
+        self._wakeup = asyncio.Event()
+        self._worker = None
+        self._dirty = False
+        self._saver = None
+        self._global_bucket = TokenBucket(GLOBAL_RATE, GLOBAL_BURST)
+        self._chat_buckets = {}
+        self._stats = {"queued": 0, "coalesced": 0, "sent": 0, "retries": 0, "dropped": 0}
+
+    def start(self, bot):
+        """Запустить отправку (и досылку сохранённых сообщений); вызывается внутри event loop"""
+        self._bot = bot
+        if not self._loaded:
+            self._load()
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+        self._wakeup.set()
+
+    def send(self, bot, chat_id, text, parse_mode="Markdown", key=None):
+        """
+        Поставить сообщение в очередь (сразу возвращается)
+
+        Args:
+            key: ключ склейки — сообщения с одним ключом за COALESCE_SECONDS
+                 отправляются одним сообщением; None — отправить как есть
+        """
+        self._stats["queued"] += 1
+        now = time.time()
+
+        if key is not None:
+            for entry in self._queue:
+                if entry["key"] == key and entry["chat_id"] == chat_id \
+                        and entry["parse_mode"] == parse_mode and not entry.get("sending") \
+                        and entry["due"] > now:
+                    entry["text"] += "\n\n" + text
+                    self._stats["coalesced"] += 1
+                    self._save()
+                    return
+
+        self._queue.append({
+            "chat_id": chat_id,
+            "text": text,
+            "parse_mode": parse_mode,
+            "key": key,
+            "due": now + (COALESCE_SECONDS if key is not None else 0),
+            "attempts": 0,
+        })
+        self._save()
+        self.start(bot)
+
+    def get_stats(self):
+        """
+        Returns:
+            dict: {"pending", "queued", "coalesced", "sent", "retries", "dropped"}
+        """
+        return {"pending": len(self._queue), **self._stats}
+
+    # === Отправка ===
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            now = time.time()
+            ready = [entry for entry in self._queue if entry["due"] <= now]
+            if not ready:
+                timeout = min((entry["due"] for entry in self._queue), default=None)
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), None if timeout is None else timeout - now)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            entry = min(ready, key=lambda entry: entry["due"])
+            entry["sending"] = True
+            try:
+                await self._acquire(entry["chat_id"])
+                await self._deliver(entry)
+            except Exception as e:
+                print(f"[Outbox] Unexpected error: {e}")
+                self._retry_later(entry, MAX_BACKOFF_SECONDS)
+            finally:
+                entry.pop("sending", None)
+                self._save()
+
+    async def _acquire(self, chat_id):
+        """Дождаться токена в общем ведре и в ведре чата"""
+        chat_bucket = self._chat_buckets.setdefault(chat_id, TokenBucket(CHAT_RATE, CHAT_BURST))
+        while True:
+            wait = max(self._global_bucket.wait_time(), chat_bucket.wait_time())
+            if not wait:
+                self._global_bucket.take()
+                chat_bucket.take()
+                return
+            await asyncio.sleep(wait)
+
+    async def _deliver(self, entry):
+        try:
+            await self._bot.send_message(chat_id=entry["chat_id"], text=entry["text"],
+                                         parse_mode=entry["parse_mode"])
+        except RetryAfter as e:
+            print(f"[Outbox] Flood limit, retrying in {e.retry_after}s")
+            self._retry_later(entry, e.retry_after)
+            return
+        except BadRequest as e:
+            if entry["parse_mode"]:
+                # Разметка не разобралась (например, "_" в имени ветки) — отправим текстом
+                print(f"[Outbox] {e}, resending without markup")
+                entry["parse_mode"] = None
+                self._retry_later(entry, 0)
+            else:
+                print(f"[Outbox] Dropped message: {e}")
+                self._drop(entry)
+            return
+        except Forbidden as e:
+            print(f"[Outbox] Dropped message, bot blocked: {e}")
+            self._drop(entry)
+            return
+        except NetworkError as e:
+            delay = min(2 ** entry["attempts"], MAX_BACKOFF_SECONDS)
+            print(f"[Outbox] Network error ({e}), retrying in {delay}s")
+            self._retry_later(entry, delay)
+            return
+        except TelegramError as e:
+            print(f"[Outbox] Dropped message: {e}")
+            self._drop(entry)
+            return
+
+        self._queue.remove(entry)
+        self._stats["sent"] += 1
+
+    def _retry_later(self, entry, delay):
+        entry["attempts"] += 1
+        entry["due"] = time.time() + delay
+        self._stats["retries"] += 1
+
+    def _drop(self, entry):
+        self._queue.remove(entry)
+        self._stats["dropped"] += 1
+
+    # === Сохранение ===
+
+    def _load(self):
+        self._loaded = True
+        path = Path(OUTBOX_FILE)
+        if not path.exists():
+            return
+        try:
+            saved = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            print(f"[Outbox] Failed to read {OUTBOX_FILE}: {e}")
+            return
+        self._queue = saved + self._queue
+        if saved:
+            print(f"[Outbox] {len(saved)} undelivered messages restored")
+
+    def _save(self):
+        """Отметить очередь изменённой; запись — отложенно, одна на SAVE_DELAY_SECONDS"""
+        if not self._loaded:
+            self._load()
+        self._dirty = True
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()  # вне event loop — сразу
+            return
+        if self._saver is None or self._saver.done():
+            self._saver = loop.create_task(self._save_later())
+
+    async def _save_later(self):
+        await asyncio.sleep(SAVE_DELAY_SECONDS)
+        while self._dirty:
+            self._dirty = False
+            data = self._dump()
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self._write, data)
+            except OSError as e:
+                print(f"[Outbox] Failed to save {OUTBOX_FILE}: {e}")
+
+    def flush(self):
+        """Записать очередь сейчас, если есть несохранённые изменения (при остановке бота)"""
+        if self._dirty:
+            self._dirty = False
+            self._write(self._dump())
+
+    def _dump(self):
+        return json.dumps(
+            [{key: value for key, value in entry.items() if key != "sending"} for entry in self._queue],
+            ensure_ascii=False
+        )
+
+    @staticmethod
+    def _write(data):
+        path = Path(OUTBOX_FILE)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(data, encoding="utf-8")
+        os.replace(tmp, path)
+
+
+# Общий экземпляр для фонового монитора и обработчиков webhook
+outbox = TelegramOutbox()
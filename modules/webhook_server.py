@@ -0,0 +1,257 @@
+"""
+Приёмник webhook'ов GitHub (push / create / delete)
+
+События приходят сразу после push'а, поэтому уведомления о новых ветках,
+checkpoint'ах и завершении задач не ждут следующего цикла опроса.
+Опрос GitHub остаётся как редкая сверка (WEBHOOK_FALLBACK_POLL_SECONDS).
+
+Повтор сохранённых событий (WEBHOOK_RECORD_DIR) на запущенный бот:
+    py -3.12 -m modules.webhook_server replay data/webhooks
+"""
+
+import argparse
+import asyncio
+import functools
+import hashlib
+import hmac
+import json
+import sys
+import time
+import urllib.request
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import parse_qs
+
+from config import (
+    WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_RECORD_DIR
+)
+from modules import background_monitor
+
+MAX_BODY_BYTES = 5 * 1024 * 1024
+READ_TIMEOUT_SECONDS = 10
+
+_REASONS = {202: "Accepted", 400: "Bad Request", 401: "Unauthorized",
+            404: "Not Found", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+def sign(secret, body):
+    """Подпись тела запроса в формате заголовка X-Hub-Signature-256"""
+    return "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def verify_signature(secret, body, signature):
+    """Проверить X-Hub-Signature-256 (сравнение за постоянное время)"""
+    if not secret or not signature:
+        return False
+    return hmac.compare_digest(sign(secret, body), signature)
+
+
+def _parse_time(value):
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def _push_commits(payload):
+    """Коммиты из события push в формате github_monitor (новые первыми)"""
+    commits = payload.get("commits") or ([payload["head_commit"]] if payload.get("head_commit") else [])
+    return [
+        {"sha": commit["id"], "message": commit["message"], "time": _parse_time(commit["timestamp"])}
+        for commit in reversed(commits)
+    ]
+
+
+async def dispatch(bot, admin_id, event, payload):
+    """
+    Передать событие GitHub обработчикам фонового монитора
+
+    Args:
+        event: значение X-GitHub-Event
+        payload: разобранное тело события
+
+    Returns:
+        str: "ok" или "ignored"
+    """
+    if event == "push":
+        ref = payload.get("ref", "")
+        if not ref.startswith("refs/heads/claude/") or payload.get("deleted"):
+            return "ignored"
+        branch = ref.removeprefix("refs/heads/")
+        await background_monitor.handle_push(bot, admin_id, branch, _push_commits(payload))
+        return "ok"
+
+    if event in ("create", "delete"):
+        branch = payload.get("ref", "")
+        if payload.get("ref_type") != "branch" or not branch.startswith("claude/"):
+            return "ignored"
+        if event == "create":
+            await background_monitor.handle_branch_created(bot, admin_id, branch)
+        else:
+            await background_monitor.handle_branch_deleted(branch)
+        return "ok"
+
+    return "ignored"
+
+
+def _record(event, delivery, payload):
+    """Сохранить событие для повтора (если задан WEBHOOK_RECORD_DIR)"""
+    if not WEBHOOK_RECORD_DIR:
+        return
+    path = Path(WEBHOOK_RECORD_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    name = f"{time.time():.3f}-{event}-{delivery or 'local'}.json"
+    (path / name).write_text(
+        json.dumps({"event": event, "delivery": delivery, "payload": payload}, ensure_ascii=False),
+        encoding="utf-8"
+    )
+
+
+async def _read_request(reader):
+    """Прочитать HTTP-запрос: (метод, путь, заголовки, тело)"""
+    request_line = await reader.readline()
+    method, path, _ = request_line.decode("latin-1").split(" ", 2)
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    length = int(headers.get("content-length", 0))
+    if length > MAX_BODY_BYTES:
+        raise OverflowError(length)
+    body = await reader.readexactly(length)
+    return method, path.split("?", 1)[0], headers, body
+
+
+def _parse_payload(headers, body):
+    """Тело события: application/json или form-urlencoded (payload=...)"""
+    if headers.get("content-type", "").startswith("application/x-www-form-urlencoded"):
+        body = parse_qs(body.decode())["payload"][0]
+    return json.loads(body)
+
+
+async def _handle_connection(reader, writer, queue):
+    status = 400
+    try:
+        method, path, headers, body = await asyncio.wait_for(_read_request(reader), READ_TIMEOUT_SECONDS)
+
+        if method != "POST" or path != WEBHOOK_PATH:
+            status = 404
+        elif not verify_signature(WEBHOOK_SECRET, body, headers.get("x-hub-signature-256")):
+            print("[Webhook] Rejected request with invalid signature")
+            status = 401
+        else:
+            event = headers.get("x-github-event", "")
+            delivery = headers.get("x-github-delivery")
+            payload = _parse_payload(headers, body)
+            if "x-webhook-replay" not in headers:
+                try:
+                    _record(event, delivery, payload)
+                except OSError as e:
+                    # Без записи для повтора событие всё равно обрабатывается
+                    print(f"[Webhook] Failed to record {event} {delivery or ''}: {e}")
+            # GitHub ждёт ответ не дольше 10 секунд — обработка идёт в очереди
+            queue.put_nowait((event, delivery, payload))
+            status = 202
+    except OverflowError:
+        status = 413
+    except (ValueError, KeyError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+        print(f"[Webhook] Bad request: {e!r}")
+    except Exception as e:
+        # Отправитель всегда получает ответ — иначе соединение висит до его таймаута
+        print(f"[Webhook] Error handling request: {e!r}")
+        status = 500
+
+    try:
+        writer.write(
+            f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+            f"Content-Length: 0\r\nConnection: close\r\n\r\n".encode()
+        )
+        await writer.drain()
+    except OSError as e:
+        print(f"[Webhook] Failed to send response: {e}")
+    finally:
+        writer.close()
+
+
+async def _process(queue, bot, admin_id):
+    """События обрабатываются строго по очереди — в порядке прихода"""
+    while True:
+        event, delivery, payload = await queue.get()
+        try:
+            result = await dispatch(bot, admin_id, event, payload)
+            print(f"[Webhook] {event} {delivery or ''}: {result}")
+        except Exception as e:
+            print(f"[Webhook] Error handling {event} {delivery or ''}: {e}")
+
+
+async def run_webhook_server(bot, admin_id):
+    """
+    Запустить приёмник webhook'ов (работает, пока работает бот)
+
+    Args:
+        bot: экземпляр Telegram Bot
+        admin_id: Telegram ID администратора для уведомлений
+    """
+    if not WEBHOOK_SECRET:
+        print("[Webhook] WEBHOOK_SECRET not set, webhook receiver disabled")
+        return
+
+    queue = asyncio.Queue()
+    worker = asyncio.create_task(_process(queue, bot, admin_id))
+    server = await asyncio.start_server(
+        functools.partial(_handle_connection, queue=queue), WEBHOOK_HOST, WEBHOOK_PORT
+    )
+    print(f"[Webhook] Listening on http://{WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        worker.cancel()
+
+
+# === Повтор сохранённых событий ===
+
+def replay(paths, url, secret=WEBHOOK_SECRET):
+    """
+    Отправить сохранённые события на приёмник (с правильной подписью)
+
+    Args:
+        paths: файлы событий или папки с ними (отправляются по порядку имён)
+        url: адрес приёмника
+    """
+    files = []
+    for path in map(Path, paths):
+        files += sorted(path.glob("*.json")) if path.is_dir() else [path]
+
+    for file in files:
+        record = json.loads(file.read_text(encoding="utf-8"))
+        body = json.dumps(record["payload"], ensure_ascii=False).encode()
+        request = urllib.request.Request(url, data=body, method="POST", headers={
+            "Content-Type": "application/json",
+            "X-GitHub-Event": record["event"],
+            "X-GitHub-Delivery": record.get("delivery") or file.stem,
+            "X-Hub-Signature-256": sign(secret, body),
+            "X-Webhook-Replay": "1",  # повторённое событие не сохраняется ещё раз
+        })
+        with urllib.request.urlopen(request, timeout=READ_TIMEOUT_SECONDS) as response:
+            print(f"[Webhook] Replayed {file.name}: {response.status}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Инструменты приёмника webhook'ов GitHub")
+    commands = parser.add_subparsers(dest="command", required=True)
+    replay_parser = commands.add_parser("replay", help="повторить сохранённые события")
+    replay_parser.add_argument("paths", nargs="+", help="файлы событий или папки с ними")
+    replay_parser.add_argument("--url", default=f"http://{WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+    args = parser.parse_args()
+
+    if not WEBHOOK_SECRET:
+        sys.exit("WEBHOOK_SECRET not set")
+    replay(args.paths, args.url)
+
+
+if __name__ == "__main__":
+    main()
@@ -54,4 +54,18 @@ BOOKS = {
         "folder": "book10_ethics",
         "modules": 6,
     },
-}
\ No newline at end of file
+}
+
+# === КЛАССИФИКАЦИЯ КОММИТОВ ===
+# (тип события, регулярное выражение) — проверяются по порядку,
+# побеждает первое совпавшее правило. Регистр не учитывается.
+# Первая группа в выражении checkpoint — номер checkpoint'а.
+# Можно добавлять свои типы — они придут в мониторинг как есть.
+# failure — только явный маркер в начале сообщения ("Failed: ...", "Ошибка: ...",
+# "Не удалось ..."): "Исправлена ошибка в тестах" — обычный коммит, а
+# "checkpoint 2: исправлена ошибка" — checkpoint
+COMMIT_RULES = [
+    ("complete", r"\bcomplete|\bготов|\bfinished\b|\bdone\b"),
+    ("checkpoint", r"\bcheckpoint\s+(\d+)"),
+    ("failure", r"^\s*(?:(?:failed|failure|error|ошибка)\s*:|не удалось\b)"),
+]